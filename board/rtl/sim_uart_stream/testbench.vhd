@@ -10,6 +10,7 @@
 library ieee;
 use ieee.std_logic_1164.all;
 use ieee.math_real.all;
+use ieee.numeric_std.all;
 
 use work.uart_sync_pkg.all;
 
@@ -90,6 +91,13 @@ architecture full of testbench is
 		( data => x"af", addr => x"ba0203")
 	);
 
+	-- Testing data for burst commands (data are written/read from the incremented address)
+	type burst_data_t is array (integer range <>) of std_logic_vector(7 downto 0);
+	constant test_burst_addr : std_logic_vector(23 downto 0) := x"0102fe";
+	constant test_burst_data : burst_data_t(0 to 7) := (
+		x"11", x"22", x"33", x"44", x"55", x"66", x"77", x"88"
+	);
+
 	-- Functions ----------------------
 
 	shared variable seed1	: positive;
@@ -260,6 +268,31 @@ begin
 			data_out := rx_dout;
 		end procedure;
 
+		-- This procedure sends the burst command header - command, address and the 16-bit length
+		procedure burst_header (cmd : in std_logic_vector; addr : in std_logic_vector; len : in integer) is
+			variable len_vec : std_logic_vector(15 downto 0);
+		begin
+			wait until rising_edge(CLK_RX);
+
+			rx_din 		<= cmd;
+			rx_din_vld	<= '1';
+			wait until rising_edge(CLK_RX);
+
+			-- Send three parts of the address (from LSB bits to MSB bits)
+			for j in 0 to 2 loop
+				rx_din		<= addr((j+1)*8-1 downto j*8);
+				wait until rising_edge(CLK_RX);
+			end loop;
+
+			-- Send the length (from LSB bits to MSB bits)
+			len_vec := std_logic_vector(to_unsigned(len,16));
+			for j in 0 to 1 loop
+				rx_din		<= len_vec((j+1)*8-1 downto j*8);
+				wait until rising_edge(CLK_RX);
+			end loop;
+			rx_din_vld <= '0';
+		end procedure;
+
 	begin
 		-- Initial values 
 		rx_din 				<= (others => '0');
@@ -299,6 +332,38 @@ begin
 
 		assert false report "tb_rx : Write tests are done!" severity note;
 
+		-- 3) Burst write test
+		burst_header(CMD_WRITE_BURST, test_burst_addr, test_burst_data'length);
+		rx_din_vld <= '1';
+		for i in 0 to test_burst_data'length-1 loop
+			rx_din		<= test_burst_data(i);
+			wait until rising_edge(CLK_RX);
+		end loop;
+		rx_din_vld <= '0';
+
+		-- Single ACK is returned after the last byte
+		wait until (rx_dout_vld = '1' and rx_dout_rdy = '1');
+		wait until rising_edge(CLK_RX);
+		assert rx_dout = CMD_ACK report
+			"tb_rx burst write: ACK wasn't received!"
+			severity error;
+
+		assert false report "tb_rx : Burst write tests are done!" severity note;
+
+		-- 4) Burst read test
+		burst_header(CMD_READ_BURST, test_burst_addr, test_burst_data'length);
+		for i in 0 to test_burst_data'length-1 loop
+			wait until (rx_dout_vld = '1' and rx_dout_rdy = '1');
+			wait until rising_edge(CLK_RX);
+			data_out := rx_dout;
+
+			assert test_burst_data(i) = data_out report
+				"tb_rx burst read ( i = " & integer'image(i) & "): Received (" & to_string(data_out) & ") data are not as expected data (" & to_string(test_burst_data(i)) & ")."
+				severity error;
+		end loop;
+
+		assert false report "tb_rx : Burst read tests are done!" severity note;
+
 		-- End the testbench
 		wait;
 	end process;
@@ -370,6 +435,46 @@ begin
 
 		assert false report "tb_tx : Write tests are done!" severity note;
 
+		-- 3) Burst write test - the address is incremented after each byte
+		for i in 0 to test_burst_data'length-1 loop
+			wait until tx_data_out_vld = '1' and tx_data_out_next = '1';
+			wait until rising_edge(CLK_TX);
+
+			assert unsigned(tx_addr_out) = unsigned(test_burst_addr) + i report
+				"tb_tx burst write (i = " & integer'image(i) & "): Received address (" & to_string(tx_addr_out) & ") doesn't match with the expected one."
+				severity error;
+
+			assert tx_data_write = '1' report
+				"tb_tx burst write (i = " & integer'image(i) & "): Read command is enabled in the write mode."
+				severity error;
+
+			assert tx_data_out = test_burst_data(i) report
+				"tb_tx burst write (i = " & integer'image(i) & "): Expected data (" & to_string(test_burst_data(i)) &  ") doesn't match with received data (" & to_string(tx_data_out) & ")."
+				severity error;
+
+			wait until rising_edge(CLK_TX);
+		end loop;
+
+		assert false report "tb_tx : Burst write tests are done!" severity note;
+
+		-- 4) Burst read test - we return data from the incremented address
+		for i in 0 to test_burst_data'length-1 loop
+			wait until tx_data_out_vld = '1';
+			wait until rising_edge(CLK_TX);
+
+			assert unsigned(tx_addr_out) = unsigned(test_burst_addr) + i report
+				"tb_tx burst read (i = " & integer'image(i) & "): Received address (" & to_string(tx_addr_out) & ") doesn't match with the expected one."
+				severity error;
+
+			tx_data_in 		<= test_burst_data(i);
+			tx_data_in_vld 	<= '1';
+			wait until tx_data_in_vld = '1' and tx_data_in_next = '1';
+			wait until rising_edge(CLK_TX);
+			tx_data_in_vld  <= '0';
+		end loop;
+
+		assert false report "tb_tx : Burst read tests are done!" severity note;
+
 		-- End the testbench
 		wait;
 	end process;
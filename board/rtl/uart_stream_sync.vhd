@@ -64,6 +64,8 @@ architecture full of uart_stream_sync is
   constant FIFO_ADDDR_WIDTH   : natural := 5;
     -- Last iteration of address write
   constant CNT_ADDR_MAX       : integer := 2;
+    -- Width of the burst length
+  constant BURST_LEN_WIDTH    : natural := 16;
 
   -- Registers  -----------------------
     -- Everything in the TX stage, register for storage of data and addresses
@@ -71,8 +73,18 @@ architecture full of uart_stream_sync is
   signal reg_data_en    : std_logic;
   signal reg_addr       : std_logic_vector(23 downto 0);
   signal reg_addr_en    : std_logic;
+  signal reg_addr_inc   : std_logic;
   signal write_en       : std_logic;
 
+    -- Burst flag and the number of remaining bytes of the burst
+  signal reg_burst      : std_logic;
+  signal reg_burst_en   : std_logic;
+  signal reg_len        : unsigned(BURST_LEN_WIDTH-1 downto 0);
+  signal reg_len_lsb_en : std_logic;
+  signal reg_len_msb_en : std_logic;
+  signal reg_len_dec    : std_logic;
+  signal burst_last     : std_logic;
+
   signal cnt_addr       : unsigned(1 downto 0);
   signal cnt_addr_en    : std_logic;
   signal cnt_addr_rst   : std_logic;
@@ -92,7 +104,8 @@ architecture full of uart_stream_sync is
    
   -- FSM ------------------------------
   type FSM_State_t is 
-    (INIT, READ_ADDR, READ_WAIT, READ_NOT_TAKEN, WRITE_ADDR, WRITE_DATA, WRITE_WAIT, WRITE_ACK);
+    (INIT, READ_ADDR, READ_LEN0, READ_LEN1, READ_WAIT, READ_NOT_TAKEN, WRITE_ADDR, WRITE_LEN0, WRITE_LEN1,
+     WRITE_DATA, WRITE_WAIT, WRITE_ACK);
 
   signal reg_state    : FSM_State_t; 
   signal next_state   : FSM_State_t;
@@ -166,6 +179,13 @@ begin
   -- After the written data are accepted, we will send the ACK (0x2) after the command was successfully submited
   -- to the system.
 
+  -- Burst reading & writing:
+  -- ========================
+  -- Burst commands (CMD_READ_BURST, CMD_WRITE_BURST) are followed by the address and the 16-bit length
+  -- (LSB first, the value 0 means 65536 bytes). The address is incremented after each transferred byte.
+  -- The read burst returns the given number of data bytes, the write burst is followed by data bytes and
+  -- the single ACK is sent after the last byte is accepted.
+
   -- Register for storage of the current state
   fsm_state_regp:process(TX_CLK)
   begin
@@ -190,10 +210,10 @@ begin
       when INIT =>
         -- First, we need to wait for incomming data and check the result
         if(data_din_rx_vld = '1')then
-          if(data_din_rx = CMD_READ)then
+          if(data_din_rx = CMD_READ or data_din_rx = CMD_READ_BURST)then
             -- Read command detected
             next_state <= READ_ADDR;
-          elsif(data_din_rx = CMD_WRITE)then
+          elsif(data_din_rx = CMD_WRITE or data_din_rx = CMD_WRITE_BURST)then
             -- Write command detected
             next_state <= WRITE_ADDR;
           else
@@ -205,6 +225,22 @@ begin
       when READ_ADDR => 
             -- We are waiting to 8 bit address which will come here
             if(data_din_rx_vld = '1' and cnt_addr = CNT_ADDR_MAX)then
+              if(reg_burst = '1')then
+                next_state <= READ_LEN0;
+              else
+                next_state <= READ_NOT_TAKEN;
+              end if;
+            end if;
+
+      when READ_LEN0 =>
+            -- We are waiting for the LSB of the burst length
+            if(data_din_rx_vld = '1')then
+              next_state <= READ_LEN1;
+            end if;
+
+      when READ_LEN1 =>
+            -- We are waiting for the MSB of the burst length
+            if(data_din_rx_vld = '1')then
               next_state <= READ_NOT_TAKEN;
             end if;
 
@@ -218,7 +254,12 @@ begin
              -- We are waiting on data which comes through the APP --> UART interface
              if(TX_DATA_IN_VLD = '1' and tx_data_in_next_out = '1')then 
                 if( data_dout_rx_full = '0')then
-                  next_state <= INIT;
+                  if(reg_burst = '1' and burst_last = '0')then
+                    -- Read the next byte of the burst
+                    next_state <= READ_NOT_TAKEN;
+                  else
+                    next_state <= INIT;
+                  end if;
                 end if;
              end if;
 
@@ -226,6 +267,22 @@ begin
             -- We are waiting to 8 bit address which will come here. We will go to the next
             -- state when we write the last address.
             if(data_din_rx_vld = '1' and cnt_addr = CNT_ADDR_MAX)then
+              if(reg_burst = '1')then
+                next_state <= WRITE_LEN0;
+              else
+                next_state <= WRITE_DATA;
+              end if;
+            end if;
+
+      when WRITE_LEN0 =>
+            -- We are waiting for the LSB of the burst length
+            if(data_din_rx_vld = '1')then
+              next_state <= WRITE_LEN1;
+            end if;
+
+      when WRITE_LEN1 =>
+            -- We are waiting for the MSB of the burst length
+            if(data_din_rx_vld = '1')then
               next_state <= WRITE_DATA;
             end if;
 
@@ -239,7 +296,12 @@ begin
             -- We are waiting here untill the data are taken by the component, after that
             -- we need to send the ACK command to the software
             if(TX_DATA_OUT_NEXT = '1' and tx_data_out_vld_out = '1')then
-                next_state <= WRITE_ACK;
+                if(reg_burst = '1' and burst_last = '0')then
+                  -- Wait for the next byte of the burst
+                  next_state <= WRITE_DATA;
+                else
+                  next_state <= WRITE_ACK;
+                end if;
             end if;
 
       when WRITE_ACK => 
@@ -262,6 +324,11 @@ begin
     data_dout_rx_vld        <= '0';
     reg_data_en             <= '0';
     reg_addr_en             <= '0';
+    reg_addr_inc            <= '0';
+    reg_burst_en            <= '0';
+    reg_len_lsb_en          <= '0';
+    reg_len_msb_en          <= '0';
+    reg_len_dec             <= '0';
     write_en                <= '0';
     cnt_addr_rst            <= '0';
     cnt_addr_en             <= '0';
@@ -270,9 +337,11 @@ begin
     case( reg_state ) is
 
       when INIT => 
-          -- We can prepare the address counter for address storage
+          -- We can prepare the address counter for address storage and remember the
+          -- type of the command (single byte or burst)
           cnt_addr_rst      <= '1';
           data_din_rx_rd    <= '1';
+          reg_burst_en      <= data_din_rx_vld;
         
       when READ_ADDR => 
           -- We are waiting to 8 bit address which will come here ... therefore, we need
@@ -284,6 +353,20 @@ begin
             data_din_rx_rd    <= '1';
           end if;
 
+      when READ_LEN0 =>
+          -- Store the LSB of the burst length
+          if(data_din_rx_vld = '1')then
+            reg_len_lsb_en    <= '1';
+            data_din_rx_rd    <= '1';
+          end if;
+
+      when READ_LEN1 =>
+          -- Store the MSB of the burst length
+          if(data_din_rx_vld = '1')then
+            reg_len_msb_en    <= '1';
+            data_din_rx_rd    <= '1';
+          end if;
+
       when READ_NOT_TAKEN => 
           -- Read reaquest is ready to be processed here.
           -- We are still waiting on the following unit if it takes the command. In such situation,
@@ -306,6 +389,12 @@ begin
           data_dout_rx          <= TX_DATA_IN;
           data_dout_rx_vld      <= TX_DATA_IN_VLD;
 
+          -- Move to the next byte of the burst when the data are sent
+          if(TX_DATA_IN_VLD = '1' and data_dout_rx_full = '0' and reg_burst = '1')then
+            reg_addr_inc          <= '1';
+            reg_len_dec           <= '1';
+          end if;
+
       when WRITE_ADDR => 
           -- We are waiting to 8 bit address which will come here ... therefore, we need
           -- to enable the address register to receive the data. We need to enable the counter to move to the 
@@ -317,6 +406,22 @@ begin
             data_din_rx_rd  <= '1';
           end if;
 
+      when WRITE_LEN0 =>
+          -- Store the LSB of the burst length
+          write_en <= '1';
+          if(data_din_rx_vld = '1')then
+            reg_len_lsb_en  <= '1';
+            data_din_rx_rd  <= '1';
+          end if;
+
+      when WRITE_LEN1 =>
+          -- Store the MSB of the burst length
+          write_en <= '1';
+          if(data_din_rx_vld = '1')then
+            reg_len_msb_en  <= '1';
+            data_din_rx_rd  <= '1';
+          end if;
+
       when WRITE_DATA => 
             -- We are waiting for data to write, in this state we are just enabling the 
             -- address register
@@ -332,6 +437,12 @@ begin
             write_en              <= '1';
             tx_data_out_vld_out   <= '1';
 
+            -- Move to the next byte of the burst when the data are taken
+            if(TX_DATA_OUT_NEXT = '1' and reg_burst = '1')then
+              reg_addr_inc          <= '1';
+              reg_len_dec           <= '1';
+            end if;
+
       when WRITE_ACK => 
             -- Now we need to send the write ACK command, the valid is active until the 
             -- sending signal is asserted. After that, we need to remove the valid signal
@@ -381,10 +492,43 @@ begin
           when "10" => reg_addr(23 downto 16) <= data_din_rx;
           when others => null;
         end case ;
+      elsif(reg_addr_inc = '1')then
+        reg_addr <= std_logic_vector(unsigned(reg_addr) + 1);
       end if;
     end if;
   end process ; -- addr_regp
 
+  burst_regp : process( TX_CLK )
+  begin
+    if(rising_edge(TX_CLK))then
+      if(TX_RESET = '1')then
+        reg_burst <= '0';
+      elsif(reg_burst_en = '1')then
+        if(data_din_rx = CMD_READ_BURST or data_din_rx = CMD_WRITE_BURST)then
+          reg_burst <= '1';
+        else
+          reg_burst <= '0';
+        end if;
+      end if;
+    end if;
+  end process ; -- burst_regp
+
+  len_regp : process( TX_CLK )
+  begin
+    if(rising_edge(TX_CLK))then
+      if(reg_len_lsb_en = '1')then
+        reg_len(7 downto 0)   <= unsigned(data_din_rx);
+      elsif(reg_len_msb_en = '1')then
+        reg_len(15 downto 8)  <= unsigned(data_din_rx);
+      elsif(reg_len_dec = '1')then
+        reg_len <= reg_len - 1;
+      end if;
+    end if;
+  end process ; -- len_regp
+
+  -- The last byte of the burst is processed (the value 0 means 65536 bytes)
+  burst_last <= '1' when reg_len = 1 else '0';
+
   -- Map registers to outputs
   TX_ADDR_OUT       <= reg_addr;
   TX_DATA_OUT       <= reg_data;
@@ -17,5 +17,9 @@ package uart_sync_pkg is
     constant CMD_READ   : std_logic_vector(7 downto 0) := x"01";
     -- Acknowledge of the asserted write command
     constant CMD_ACK    : std_logic_vector(7 downto 0) := x"02";
+    -- Burst write command (address, length and data bytes follow)
+    constant CMD_WRITE_BURST : std_logic_vector(7 downto 0) := x"03";
+    -- Burst read command (address and length follow)
+    constant CMD_READ_BURST  : std_logic_vector(7 downto 0) := x"04";
 
 end package ;
\ No newline at end of file
@@ -0,0 +1,3 @@
+// Loop idioms (translated with --rle --idioms) - clear, move and multiply loops
++++++[->+<]>[->++>+++<<]>.>.
+>++++++++[-]<<---[+>>+<<]>>.
@@ -49,11 +49,13 @@ def get_parser(args):
 
     # Remember the conversion function if you want to write integers as 0x or just like a literal
     int_conv = lambda x: int(x,0)
-    parser.add_argument('--device',type=str,nargs=1,help='Specify the path to the device.',default='/dev/ttyUSB0')
+    parser.add_argument('--device',type=str,help='Specify the path to the device.',default='/dev/ttyUSB0')
     parser.add_argument('--test',type=int,nargs=1,help='Run the infinite r/w test until the CTRL+C is fired. The passed argument is the address space bit width.')
     parser.add_argument("--max-test-addr",type=int_conv,nargs=1,help='Set the maximal tested address of passed address space. Default one is the maximal value.')
     parser.add_argument("--min-test-addr",type=int_conv,nargs=1,help='Set the minimal tested address of passed address space. Default one is the minimal value.')
     parser.add_argument("--ascii",action='store_true',help="Print the ASCII symbol instead of the hex value")
+    parser.add_argument("--no-burst",action='store_true',help="Write more bytes with single write frames instead of the burst command\n"
+        "(bitstreams without burst commands).")
     parser.add_argument('command',type=int_conv,nargs='*',help='There are two possible commands - read and write.'
     'Read is invoked iff only address is passed. Write is invoked iff we pass additonal value argument.')
 
@@ -180,7 +182,7 @@ def start_test(dev,awidth,min_value,max_value):
     print("Complete addres spaces: {}".format(succ_addrs))
     print("Runtime: {}h {}m {}s".format(int(hour),int(mins),int(sec)))
 
-def write(dev,addr,data):
+def write(dev,addr,data,burst=True):
     """
     Write data to FPGA
 
@@ -188,11 +190,15 @@ def write(dev,addr,data):
         - dev - device to work with
         - addr - address to write to
         - data - data to write 
+        - burst - write more bytes with the burst command
     """
-    tmp_addr = addr
-    for b in data:
-        dev.write(tmp_addr,b)
-        tmp_addr = tmp_addr + 1
+    if len(data) == 1 or not(burst):
+        for i,byte in enumerate(data):
+            dev.write(addr + i,byte)
+        return
+
+    # More bytes are written with the burst command
+    dev.write_block(addr,b"".join(data))
 
 def read(dev,addr):
     """
@@ -223,7 +229,7 @@ def process(args,dev):
         # Write command asserted
         addr = args.command[0]
         data = int_to_bytes(args.command[1])
-        write(dev,addr,data)
+        write(dev,addr,data,not(args.no_burst))
     else:
         print("Invalid command, see --help for more details.")
 
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import asyncio
+import os
+import struct
+from collections import deque
+import serial
+from .io import BrainfuckIO
+
+class BrainfuckAsyncIO(object):
+    """
+    Asyncio variant of the BrainfuckIO with the same protocol semantics. The file descriptor
+    of the serial line is registered with the event loop - one process (thread) can drive
+    many boards. Operations are coroutines:
+
+        * await read(addr) - read byte (bytes of length 1)
+        * await write(addr,data) - write one byte, the ACK is checked
+        * await read_block(addr,n) - read data from consecutive addresses (bytearray)
+        * await write_block(addr,data) - write data to consecutive addresses
+
+    Operations of more tasks are pipelined - frames are sent immediately and responses are
+    assigned to operations in the order of frames. Frames behind the read burst are sent
+    after the burst data are received (the input FIFO of the end-point is small).
+
+    Each operation has the timeout (the value from the initializer is used by default). The
+    stream of responses can't be synchronized after the timeout, therefore all pending
+    operations of the board fail and received data are dropped.
+
+    Brief usage (inside the coroutine):
+        * uart = BrainfuckAsyncIO("/dev/ttyUSB0",115200)
+        * data = await uart.read(addr), await uart.write(addr,data)
+        * flags = await asyncio.gather(*[board.read(0x8003) for board in boards])
+        * uart.close()
+    """
+
+    def __init__(self, port="/dev/ttyUSB0", baudrate=256000, timeout=10):
+        """
+        Initializer for the BrainfuckAsyncIO component, it has to be created inside the running
+        event loop
+
+        Parameters:
+            * port - port to open, the default value is /dev/ttyUSB0
+            * baudrate - used baudrate, the default value is 256000
+            * timeout - default timeout of one operation in seconds, default is 10
+        """
+        self.port       = port
+        self.baudrate   = baudrate
+        self.timeout    = timeout
+        self.loop       = asyncio.get_running_loop()
+        self.uart       = serial.Serial(port,baudrate,rtscts=False,dsrdtr=False,timeout=0)
+        self.fd         = self.uart.fileno()
+        # Bytes waiting for the write, received bytes and pending operations (tuples of the
+        # number of response bytes, the future and the address)
+        self.tx         = bytearray()
+        self.rx         = bytearray()
+        self.pending    = deque()
+        # Future of the last read burst (frames are sent after the burst is received)
+        self.barrier    = None
+        self.loop.add_reader(self.fd,self.__on_read)
+
+    def close(self):
+        """
+        Close the connection, pending operations are cancelled
+        """
+        if self.uart is None:
+            return
+
+        self.loop.remove_reader(self.fd)
+        self.loop.remove_writer(self.fd)
+        for _,fut,_ in self.pending:
+            if not fut.done():
+                fut.cancel()
+        self.pending.clear()
+        self.uart.close()
+        self.uart = None
+
+    async def read(self, addr, timeout=None):
+        """
+        Read data from given address.
+
+        Parameters:
+            * addr - address to read
+            * timeout - timeout of the operation in seconds (None means the default one)
+
+        Return: Read byte which is stored in the byte type
+        """
+        BrainfuckIO.check_address(addr)
+        frame = struct.pack(BrainfuckIO.FRAME_FORMAT,BrainfuckIO.CMD_READ,addr & 0xffff,addr >> 16)
+        fut = await self.__submit(frame,1,addr)
+        return bytes(await self.__wait(fut,addr,timeout))
+
+    async def write(self, addr, data, timeout=None):
+        """
+        Write data to given address.
+
+        Parameters:
+            * addr - integer, value between 0 and maximal address value
+            * data - should be of the type byte (length 1)
+            * timeout - timeout of the operation in seconds (None means the default one)
+        """
+        BrainfuckIO.check_address(addr)
+        if(len(data) > 1):
+            raise ValueError("Length of passed data is more than 1 byte")
+
+        frame = struct.pack(BrainfuckIO.FRAME_FORMAT,BrainfuckIO.CMD_WRITE,addr & 0xffff,addr >> 16) + bytes(data)
+        fut = await self.__submit(frame,1,addr)
+        self.__check_acks(await self.__wait(fut,addr,timeout),addr)
+
+    async def read_block(self, addr, n, timeout=None):
+        """
+        Read data from consecutive addresses with burst commands.
+
+        Parameters:
+            * addr - address of the first byte
+            * n - number of bytes to read
+            * timeout - timeout of one burst in seconds (None means the default one)
+
+        Return: Read data which are stored in the bytearray type
+        """
+        BrainfuckIO.check_block(addr,n)
+        ret = bytearray(n)
+        for off in range(0,n,BrainfuckIO.MAX_BURST):
+            cnt = min(BrainfuckIO.MAX_BURST,n - off)
+            frame = BrainfuckIO.burst_header(BrainfuckIO.CMD_READ_BURST,addr + off,cnt)
+            fut = await self.__submit(frame,cnt,addr + off)
+            self.barrier = fut
+            ret[off:off + cnt] = await self.__wait(fut,addr + off,timeout)
+        return ret
+
+    async def write_block(self, addr, data, timeout=None):
+        """
+        Write data to consecutive addresses with burst commands.
+
+        Parameters:
+            * addr - address of the first byte
+            * data - data to write (any object with the buffer protocol)
+            * timeout - timeout of the whole block in seconds (None means the default one)
+        """
+        view = memoryview(data).cast('B')
+        BrainfuckIO.check_block(addr,len(view))
+        futs = []
+        for off in range(0,len(view),BrainfuckIO.MAX_BURST):
+            burst = view[off:off + BrainfuckIO.MAX_BURST]
+            frame = BrainfuckIO.burst_header(BrainfuckIO.CMD_WRITE_BURST,addr + off,len(burst)) + burst
+            futs.append((await self.__submit(frame,1,addr + off),addr + off))
+        for fut,faddr in futs:
+            self.__check_acks(await self.__wait(fut,faddr,timeout),faddr)
+
+    async def __submit(self,frame,n,addr):
+        """
+        Send the frame and register the pending operation with n response bytes
+
+        Return: Future of the response
+        """
+        # Wait until the previous read burst is received
+        while self.barrier is not None and not(self.barrier.done()):
+            await asyncio.wait([self.barrier])
+        if self.uart is None:
+            raise RuntimeError("The connection is closed.")
+
+        fut = self.loop.create_future()
+        self.pending.append((n,fut,addr))
+        self.__send(frame)
+        return fut
+
+    async def __wait(self,fut,addr,timeout):
+        """
+        Wait for the response of the operation, the connection is reset after the timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut),timeout)
+        except asyncio.TimeoutError:
+            self.__reset(RuntimeError("Response wasn't received from the end-point (address 0x{:x}).".format(addr)))
+            raise
+
+    def __check_acks(self,acks,addr):
+        """
+        Check received ACK codes
+        """
+        if any(ack != BrainfuckIO.CMD_ACK for ack in acks):
+            raise RuntimeError("Invalid ACK code returned from the end-point (address 0x{:x}).".format(addr))
+
+    def __reset(self,err):
+        """
+        Fail all pending operations and drop received data
+        """
+        while len(self.pending) > 0:
+            _,fut,_ = self.pending.popleft()
+            if not fut.done():
+                fut.set_exception(err)
+                # Mark the exception as retrieved (the timed out operation doesn't wait for it)
+                fut.exception()
+        self.rx.clear()
+        if self.uart is not None:
+            self.uart.reset_input_buffer()
+
+    def __send(self,data):
+        """
+        Write data to the serial line, data which can't be written now are written
+        from the event loop
+        """
+        if len(self.tx) == 0:
+            try:
+                n = os.write(self.fd,data)
+            except BlockingIOError:
+                n = 0
+            if n == len(data):
+                return
+            self.loop.add_writer(self.fd,self.__on_write)
+            data = memoryview(data)[n:]
+        self.tx += data
+
+    def __on_write(self):
+        """
+        Event loop callback - the serial line is ready for the write
+        """
+        try:
+            n = os.write(self.fd,self.tx)
+        except BlockingIOError:
+            return
+        del self.tx[:n]
+        if len(self.tx) == 0:
+            self.loop.remove_writer(self.fd)
+
+    def __on_read(self):
+        """
+        Event loop callback - received data are assigned to pending operations
+        """
+        try:
+            data = os.read(self.fd,65536)
+        except BlockingIOError:
+            return
+        if len(self.pending) == 0:
+            # Unexpected data (e.g. late responses of failed operations) are dropped
+            return
+
+        rx = self.rx
+        rx += data
+        pos = 0
+        while len(self.pending) > 0 and len(rx) - pos >= self.pending[0][0]:
+            n,fut,_ = self.pending.popleft()
+            if not fut.done():
+                fut.set_result(rx[pos:pos + n])
+            pos = pos + n
+        del rx[:pos]
+
+    def __str__(self):
+        """
+        Convert the class to the string
+        """
+        return "BrainfuckAsyncIO: baudrate=" + str(self.baudrate) + ", " + str(self.port)
@@ -8,7 +8,12 @@
 #  WEBSITE: https://github.com/benycze/fpga-brainfuck/
 # -------------------------------------------------------------------------------
 
+import io
+import os
+import select
+import struct
 import serial
+from concurrent.futures import Future
 
 class BrainfuckIO(object):
     """
@@ -17,6 +22,10 @@ class BrainfuckIO(object):
     Brief usage:
         * Create the component  - uart = BrainfuckIO("/dev/ttyUSB0",115200) where 115200 is the baudrate
         * Use read/write as you need - data = uart.read(addr) or uart.write(addr,data).
+        * Write more bytes to consecutive addresses - uart.write_block(addr,data) (burst commands)
+            or uart.write_pipelined(addr,data) (single write frames)
+        * Read more bytes from consecutive addresses - data = uart.read_block(addr,n)
+        * Batch more operations into one transfer - see BrainfuckTransaction (uart.transaction())
         * Close the connection - uart.close()
 
         * Information about the object can be printed using the info() method
@@ -27,11 +36,26 @@ class BrainfuckIO(object):
     CMD_WRITE   = 0x00
     CMD_READ    = 0x01
     CMD_ACK     = 0x02
+    CMD_WRITE_BURST = 0x03
+    CMD_READ_BURST  = 0x04
+
+    # Maximal number of bytes in one burst (16-bit length, the value 0 means 65536 bytes)
+    MAX_BURST = 2**16
+
+    # Formats of the frame header (command, 24-bit address) and the burst header (command,
+    # 24-bit address, 16-bit length)
+    FRAME_FORMAT = "<BHB"
+    BURST_FORMAT = "<BHBH"
 
     # Maximal possible address
     MAX_ADDR = (2**24)-1
 
-    def __init__(self, port="/dev/ttyUSB0", baudrate=256000,timeout=10):
+    # Default number of write frames which are sent without the received ACK. The end-point
+    # processes frames faster than the line rate and ACKs are shorter than frames, so the
+    # window limits the number of bytes waiting for the ACK only.
+    WINDOW = 16
+
+    def __init__(self, port="/dev/ttyUSB0", baudrate=256000,timeout=10,window=WINDOW):
         """
         Initializer for the BrainfuckIO component
 
@@ -39,9 +63,11 @@ class BrainfuckIO(object):
             * port - port to open, the default value is /dev/ttyUSB0
             * baudrate - used baudrate, the default value is 256000
             * timeout - timeout in seconds for read/write operations, default is 10
+            * window - maximal number of write frames waiting for the ACK in pipelined writes
         """
         self.port       = port
         self.baudrate   = baudrate
+        self.window     = window
         self.uart       = serial.Serial(port,baudrate,rtscts=False,dsrdtr=False,timeout=timeout)
 
     def close(self):
@@ -59,25 +85,108 @@ class BrainfuckIO(object):
             - addr - integer, value between 0 and maximal address value
             - data - should be of the type byte (length 1)
         """
-        # 1) Send the CMD_WRITE command
-        cmd_to_write = BrainfuckIO.CMD_WRITE.to_bytes(1,byteorder='little')
-        self.uart.write(cmd_to_write)
-
-        # 2) Convert address to 24-bits, slice it on bytes and send it down
-        self.__check_and_send_address(addr)
-
-        # 3) Convert data to 8-bit 
+        # 1) Check the address and data
+        self.check_address(addr)
         if(len(data) > 1):
             raise ValueError("Length of passed data is more than 1 byte")
 
-        self.uart.write(data)
+        # 2) Send the CMD_WRITE command, address (24-bits, LSB first) and data in one frame
+        frame = struct.pack(BrainfuckIO.FRAME_FORMAT,BrainfuckIO.CMD_WRITE,addr & 0xffff,addr >> 16) + bytes(data)
 
-        # 4) Wait until CMD_ACK is received
-        read_val = self.uart.read()
+        # 3) Wait until CMD_ACK is received
+        read_val = self.transfer(frame,1)
         read_val_dec = int.from_bytes(read_val,byteorder='little')
         if(read_val_dec != BrainfuckIO.CMD_ACK):
             raise RuntimeError("Invalid ACK code returned from the end-point.")
 
+    def write_pipelined(self, addr, data, window=None):
+        """
+        Write data to consecutive addresses. Write frames are sent without waiting for the
+        ACK of the previous frame, up to window frames can wait for the ACK. Received ACKs
+        are checked in bulk.
+
+        Parameters:
+            - addr - address of the first byte
+            - data - data to write (bytes-like object)
+            - window - maximal number of frames waiting for the ACK (the value from the
+                initializer is used by default)
+        """
+        if window is None:
+            window = self.window
+        if window < 1:
+            raise ValueError("The window has to contain at least one frame")
+        self.check_block(addr,len(data))
+
+        cmd     = BrainfuckIO.CMD_WRITE.to_bytes(1,byteorder='little')
+        sent    = 0
+        acked   = 0
+        while acked < len(data):
+            # 1) Fill the window with write frames (one write call)
+            cnt = min(window - (sent - acked),len(data) - sent)
+            if cnt > 0:
+                frames = bytearray()
+                for i in range(sent,sent + cnt):
+                    frames += cmd
+                    frames += (addr + i).to_bytes(3,byteorder='little')
+                    frames.append(data[i])
+                self.uart.write(frames)
+                sent = sent + cnt
+
+            # 2) Read all received ACKs (at least one)
+            cnt = min(max(1,self.uart.in_waiting),sent - acked)
+            acks = self.uart.read(cnt)
+            for i,ack in enumerate(acks):
+                if ack != BrainfuckIO.CMD_ACK:
+                    raise RuntimeError("Invalid ACK code returned from the end-point (address 0x{:x}).".format(addr + acked + i))
+            acked = acked + len(acks)
+            if len(acks) < cnt:
+                raise RuntimeError("ACK wasn't received from the end-point (address 0x{:x}).".format(addr + acked))
+
+    def write_block(self, addr, data):
+        """
+        Write data to consecutive addresses with burst commands. Each burst (up to MAX_BURST
+        bytes) is sent as the header (command, address and length) followed by data and the
+        end-point returns one ACK after the last byte.
+
+        Parameters:
+            - addr - address of the first byte
+            - data - data to write (any object with the buffer protocol), data aren't copied
+        """
+        view = memoryview(data).cast('B')
+        self.check_block(addr,len(view))
+
+        for off in range(0,len(view),BrainfuckIO.MAX_BURST):
+            burst = view[off:off + BrainfuckIO.MAX_BURST]
+            self.uart.write(BrainfuckIO.burst_header(BrainfuckIO.CMD_WRITE_BURST,addr + off,len(burst)))
+            self.__write_view(burst)
+
+            read_val = self.uart.read()
+            if(len(read_val) == 0 or read_val[0] != BrainfuckIO.CMD_ACK):
+                raise RuntimeError("Invalid ACK code returned from the end-point (burst at address 0x{:x}).".format(addr + off))
+
+    def read_block(self, addr, n):
+        """
+        Read data from consecutive addresses with burst commands.
+
+        Parameters:
+            - addr - address of the first byte
+            - n - number of bytes to read
+
+        Return: Read data which are stored in the bytearray type
+        """
+        self.check_block(addr,n)
+
+        ret = bytearray(n)
+        for off in range(0,n,BrainfuckIO.MAX_BURST):
+            cnt = min(BrainfuckIO.MAX_BURST,n - off)
+            self.uart.write(BrainfuckIO.burst_header(BrainfuckIO.CMD_READ_BURST,addr + off,cnt))
+
+            read_val = self.uart.read(cnt)
+            if(len(read_val) < cnt):
+                raise RuntimeError("Data weren't received from the end-point (address 0x{:x}).".format(addr + off + len(read_val)))
+            ret[off:off + cnt] = read_val
+        return ret
+
     def read(self,addr):
         """
         Read data from given address.
@@ -87,29 +196,78 @@ class BrainfuckIO(object):
 
         Return: Read byte which is stored in the byte type
         """
-        # 1) Send the CMD_READ command
-        cmd_to_write = BrainfuckIO.CMD_READ.to_bytes(1,byteorder='little')
-        self.uart.write(cmd_to_write)
-
-        # 2) Send three 8-bít chunks
-        self.__check_and_send_address(addr)
+        # 1) Send the CMD_READ command and three 8-bit chunks of the address in one frame
+        self.check_address(addr)
+        frame = struct.pack(BrainfuckIO.FRAME_FORMAT,BrainfuckIO.CMD_READ,addr & 0xffff,addr >> 16)
 
-        # 3) Read data and return them 
-        read_val = self.uart.read()
-        return read_val
+        # 2) Read data and return them
+        return self.transfer(frame,1)
 
-    def __check_and_send_address(self,addr):
+    def transfer(self,data,n):
         """
-        Common method for sending of address to the endpoint
+        Send serialized frames in one write and read n bytes of responses in one read.
 
         Parameters:
-            * addr - address to write
+            * data - frames to send (any object with the buffer protocol)
+            * n - number of expected response bytes
+
+        Return: Received bytes (shorter than n if the timeout expired)
         """
-        if(addr > BrainfuckIO.MAX_ADDR):
+        self.__write_view(memoryview(data).cast('B'))
+        return self.uart.read(n)
+
+    def transaction(self):
+        """
+        Create the transaction which batches operations of this IO (see BrainfuckTransaction)
+        """
+        return BrainfuckTransaction(self)
+
+    @staticmethod
+    def burst_header(cmd,addr,n):
+        """
+        Return the header of the burst command (n is the number of bytes, up to MAX_BURST)
+        """
+        return struct.pack(BrainfuckIO.BURST_FORMAT,cmd,addr & 0xffff,addr >> 16,n % BrainfuckIO.MAX_BURST)
+
+    @staticmethod
+    def check_address(addr):
+        """
+        Check that the address fits into the address space
+        """
+        if(addr < 0 or addr > BrainfuckIO.MAX_ADDR):
             raise ValueError("Passed address is bigger than allowed one.")
 
-        addr_to_write = addr.to_bytes(3,byteorder='little')
-        self.uart.write(addr_to_write)
+    @staticmethod
+    def check_block(addr,n):
+        """
+        Check that the block of n bytes starting at the address fits into the address space
+        """
+        if n > 0 and addr + n - 1 > BrainfuckIO.MAX_ADDR:
+            raise ValueError("Passed address is bigger than allowed one.")
+
+    def __write_view(self,view):
+        """
+        Write the memoryview to the serial line. The view is written directly to the file
+        descriptor because pyserial converts passed data to bytes (the pyserial write is used
+        if the port doesn't have the file descriptor).
+
+        Parameters:
+            * view - memoryview with data to write
+        """
+        try:
+            fd = self.uart.fileno()
+        except (AttributeError,io.UnsupportedOperation):
+            self.uart.write(view)
+            return
+
+        while len(view) > 0:
+            _,ready,_ = select.select([],[fd],[],self.uart.write_timeout)
+            if len(ready) == 0:
+                raise serial.SerialTimeoutException("Write timeout")
+            try:
+                view = view[os.write(fd,view):]
+            except BlockingIOError:
+                continue
 
     def __str__(self):
         """
@@ -123,3 +281,224 @@ class BrainfuckIO(object):
         Print some info about the IO class
         """
         print(str(self))
+
+class BrainfuckTransaction(object):
+    """
+    Transaction which batches read and write operations of the BrainfuckIO. Operations are
+    queued and each of them returns the future (concurrent.futures.Future). The flush
+    serializes all frames into one preallocated buffer, sends them in one write and parses
+    all responses from one bulk read - the batch pays one system call and one round-trip
+    instead of one per operation. Futures are resolved in the order of operations:
+
+        * read - read byte (bytes of length 1, the same value as BrainfuckIO.read)
+        * write, write_block - None (the invalid ACK is reported as the RuntimeError)
+        * read_block - read data (bytearray)
+
+    The end-point has the small input FIFO and it doesn't read frames while it returns
+    data of the read burst. Frames behind the read_block are therefore sent in the next
+    write (after the burst data are received).
+
+    Brief usage:
+        * tr = uart.transaction()
+        * flags = tr.read(0x8003)
+        * tr.write(0x8000,b"\x01")
+        * cells = tr.read_block(0x0,16)
+        * tr.flush() - or use the "with uart.transaction() as tr:" block
+        * flags.result(), cells.result() ...
+    """
+
+    # Operation kinds
+    READ, WRITE, READ_BLOCK, WRITE_BLOCK = range(4)
+
+    # Sizes of the frame header and the burst header
+    FRAME_SIZE = struct.calcsize(BrainfuckIO.FRAME_FORMAT)
+    BURST_SIZE = struct.calcsize(BrainfuckIO.BURST_FORMAT)
+
+    def __init__(self,dev):
+        """
+        Initialization of the transaction
+
+        Parameters:
+            * dev - BrainfuckIO to work with
+        """
+        self.dev    = dev
+        self.ops    = []
+        # Serialization buffer is kept between flushes (it is enlarged if needed)
+        self.buffer = bytearray(256)
+
+    def __len__(self):
+        """
+        Return the number of queued operations
+        """
+        return len(self.ops)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        # Queued operations are sent if the block has finished without the exception
+        if exc_type is None:
+            self.flush()
+
+    def read(self,addr):
+        """
+        Queue the read of one byte
+
+        Return: Future of the read byte
+        """
+        self.dev.check_address(addr)
+        return self.__queue(BrainfuckTransaction.READ,addr,1,None)
+
+    def write(self,addr,data):
+        """
+        Queue the write of one byte (data - bytes-like object of length 1 or integer)
+
+        Return: Future which is resolved after the ACK is received
+        """
+        self.dev.check_address(addr)
+        if isinstance(data,int):
+            data = bytes([data])
+        if(len(data) != 1):
+            raise ValueError("Length of passed data has to be 1 byte")
+        return self.__queue(BrainfuckTransaction.WRITE,addr,1,data[0])
+
+    def read_block(self,addr,n):
+        """
+        Queue the read of n consecutive bytes (burst reads)
+
+        Return: Future of read data
+        """
+        self.dev.check_block(addr,n)
+        return self.__queue(BrainfuckTransaction.READ_BLOCK,addr,n,None)
+
+    def write_block(self,addr,data):
+        """
+        Queue the write of data to consecutive addresses (burst writes), data aren't copied
+        until the flush
+
+        Return: Future which is resolved after all ACKs are received
+        """
+        view = memoryview(data).cast('B')
+        self.dev.check_block(addr,len(view))
+        return self.__queue(BrainfuckTransaction.WRITE_BLOCK,addr,len(view),view)
+
+    def __queue(self,kind,addr,n,data):
+        """
+        Append the operation to the queue
+        """
+        fut = Future()
+        fut.set_running_or_notify_cancel()
+        self.ops.append((kind,addr,n,data,fut))
+        return fut
+
+    @staticmethod
+    def __sizes(kind,n):
+        """
+        Return the tuple (frame bytes, response bytes) of the operation
+        """
+        bursts = (n + BrainfuckIO.MAX_BURST - 1) // BrainfuckIO.MAX_BURST
+        if kind == BrainfuckTransaction.READ:
+            return (BrainfuckTransaction.FRAME_SIZE,1)
+        if kind == BrainfuckTransaction.WRITE:
+            return (BrainfuckTransaction.FRAME_SIZE + 1,1)
+        if kind == BrainfuckTransaction.READ_BLOCK:
+            return (bursts * BrainfuckTransaction.BURST_SIZE,n)
+        return (bursts * BrainfuckTransaction.BURST_SIZE + n,bursts)
+
+    def flush(self):
+        """
+        Send all queued operations and resolve their futures. The transaction is empty
+        after the flush and it can be used again.
+
+        Return: Number of processed operations
+        """
+        ops = self.ops
+        self.ops = []
+        start = 0
+        error = None
+        while start < len(ops):
+            # Operations up to (and including) the next read burst are sent together
+            end = start
+            while end < len(ops):
+                end = end + 1
+                if ops[end - 1][0] == BrainfuckTransaction.READ_BLOCK and ops[end - 1][2] > 0:
+                    break
+            err = self.__flush_ops(ops[start:end])
+            if error is None:
+                error = err
+            start = end
+
+        if error is not None:
+            raise error
+        return len(ops)
+
+    def __flush_ops(self,ops):
+        """
+        Serialize operations, send them in one write and resolve futures from one read
+
+        Return: The first detected error (None if all operations were successful)
+        """
+        pack_into = struct.pack_into
+        fsize = BrainfuckTransaction.FRAME_SIZE
+        bsize = BrainfuckTransaction.BURST_SIZE
+        total = 0
+        resp  = 0
+        for kind,addr,n,data,fut in ops:
+            f,r = BrainfuckTransaction.__sizes(kind,n)
+            total = total + f
+            resp  = resp + r
+        if len(self.buffer) < total:
+            self.buffer = bytearray(max(total,2 * len(self.buffer)))
+        buf = self.buffer
+
+        # 1) Serialize all frames into the buffer
+        pos = 0
+        for kind,addr,n,data,fut in ops:
+            if kind == BrainfuckTransaction.READ:
+                pack_into(BrainfuckIO.FRAME_FORMAT,buf,pos,BrainfuckIO.CMD_READ,addr & 0xffff,addr >> 16)
+                pos = pos + fsize
+            elif kind == BrainfuckTransaction.WRITE:
+                pack_into(BrainfuckIO.FRAME_FORMAT,buf,pos,BrainfuckIO.CMD_WRITE,addr & 0xffff,addr >> 16)
+                buf[pos + fsize] = data
+                pos = pos + fsize + 1
+            else:
+                cmd = BrainfuckIO.CMD_READ_BURST if kind == BrainfuckTransaction.READ_BLOCK else BrainfuckIO.CMD_WRITE_BURST
+                for off in range(0,n,BrainfuckIO.MAX_BURST):
+                    cnt = min(BrainfuckIO.MAX_BURST,n - off)
+                    pack_into(BrainfuckIO.BURST_FORMAT,buf,pos,cmd,(addr + off) & 0xffff,(addr + off) >> 16,cnt % BrainfuckIO.MAX_BURST)
+                    pos = pos + bsize
+                    if kind == BrainfuckTransaction.WRITE_BLOCK:
+                        buf[pos:pos + cnt] = data[off:off + cnt]
+                        pos = pos + cnt
+
+        # 2) Send frames in one write and read all responses in one read
+        try:
+            rx = self.dev.transfer(memoryview(buf)[:total],resp)
+        except Exception as e:
+            for op in ops:
+                op[4].set_exception(e)
+            return e
+
+        # 3) Resolve futures in the order of operations
+        error = None
+        pos = 0
+        for kind,addr,n,data,fut in ops:
+            _,r = BrainfuckTransaction.__sizes(kind,n)
+            val = rx[pos:pos + r]
+            err = None
+            if len(val) < r:
+                err = RuntimeError("Response wasn't received from the end-point (address 0x{:x}).".format(addr))
+            elif kind == BrainfuckTransaction.READ:
+                fut.set_result(val)
+            elif kind == BrainfuckTransaction.READ_BLOCK:
+                fut.set_result(bytearray(val))
+            elif any(ack != BrainfuckIO.CMD_ACK for ack in val):
+                err = RuntimeError("Invalid ACK code returned from the end-point (address 0x{:x}).".format(addr))
+            else:
+                fut.set_result(None)
+            if err is not None:
+                fut.set_exception(err)
+                if error is None:
+                    error = err
+            pos = pos + r
+        return error
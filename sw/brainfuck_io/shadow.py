@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+from .io import BrainfuckIO
+
+class BrainfuckShadowMemory(object):
+    """
+    Shadow of the BCPU memories (cell and instruction memory, 0x0 - 0x7FFF) above the
+    BrainfuckIO. Memories are cached in pages - the first access of the page reads it with
+    the burst read (consecutive missing pages are read at once), next reads don't cause
+    any UART traffic. Writes change the shadow only and they are written back by flush().
+
+    The shadow is the writable buffer - view() returns the memoryview and array() returns
+    the NumPy array of the cached range. Changes done through views are detected during the
+    flush (the shadow keeps the copy of data stored on the board) and only changed bytes of
+    dirty pages are written.
+
+    Registers (0x8000 and above) are passed to the BrainfuckIO. The write of the command
+    register which enables the BCPU (or executes one step) flushes dirty pages and drops
+    cell pages - the BCPU owns memories until it is disabled. Cached instruction pages stay
+    valid (the BCPU doesn't change them), pages which aren't cached can't be read while the
+    BCPU is enabled (the board returns zeros).
+
+    Brief usage:
+        * mem = BrainfuckShadowMemory(uart)
+        * val = mem[0x10], data = mem[0x4000:0x4010], mem[0x10] = 5
+        * cells = mem.array(0x0,0x100); cells[3] += 1
+        * mem.flush()
+        * mem.write(0x8000,b"\\x01") - dirty pages are written, cell pages are dropped
+    """
+
+    # Size of the memory address space and the cell memory
+    SIZE      = 0x8000
+    CELL_SIZE = 0x4000
+
+    # Default size of the page
+    PAGE_SIZE = 256
+
+    # Command register and bits which start the BCPU (enable and step)
+    REG_CMD   = 0x8000
+    CMD_RUN   = 0x3
+
+    # Bursts of written data are joined if the gap is shorter than the burst header
+    MERGE_GAP = 6
+
+    def __init__(self, dev, page_size=PAGE_SIZE):
+        """
+        Initialization of the shadow memory, the command register is read to find out if
+        the BCPU is enabled
+
+        Parameters:
+            * dev - BrainfuckIO to work with
+            * page_size - size of the page (it has to divide the size of the address space)
+        """
+        if page_size <= 0 or BrainfuckShadowMemory.SIZE % page_size != 0:
+            raise ValueError("Page size has to divide the memory size (0x{:x})".format(BrainfuckShadowMemory.SIZE))
+        self.dev        = dev
+        self.page_size  = page_size
+        self.pages      = BrainfuckShadowMemory.SIZE // page_size
+        # Cached data, data stored on the board, valid pages and pages which have to be
+        # written completely (they weren't read before the write)
+        self.data       = bytearray(BrainfuckShadowMemory.SIZE)
+        self.clean      = bytearray(BrainfuckShadowMemory.SIZE)
+        self.valid      = [False] * self.pages
+        self.forced     = [False] * self.pages
+        self.enabled    = (dev.read(BrainfuckShadowMemory.REG_CMD)[0] & 0x1) != 0
+        # Statistics - cache hits, loaded pages, written bytes and flushes
+        self.hits       = 0
+        self.loads      = 0
+        self.written    = 0
+        self.flushes    = 0
+
+    def __check(self,addr,n):
+        """
+        Check that the range is inside the memory address space
+        """
+        if addr < 0 or n < 0 or addr + n > BrainfuckShadowMemory.SIZE:
+            raise ValueError("Range 0x{:x} - 0x{:x} is outside of the memory address space".format(addr,addr + n))
+
+    def __page_range(self,addr,n):
+        """
+        Return the range of pages which contain the address range
+        """
+        if n == 0:
+            return range(0)
+        return range(addr // self.page_size,(addr + n - 1) // self.page_size + 1)
+
+    def load(self,addr,n):
+        """
+        Make pages of the address range valid (missing pages are read from the board)
+        """
+        self.__check(addr,n)
+        pages = self.__page_range(addr,n)
+        missing = [page for page in pages if not(self.valid[page])]
+        if len(missing) == 0:
+            self.hits = self.hits + 1
+            return
+        if self.enabled:
+            raise RuntimeError("Memory 0x{:x} can't be read while the BCPU is enabled".format(missing[0] * self.page_size))
+
+        # Consecutive missing pages are read with one burst
+        ps = self.page_size
+        start = 0
+        while start < len(missing):
+            end = start + 1
+            while end < len(missing) and missing[end] == missing[end - 1] + 1:
+                end = end + 1
+            base = missing[start] * ps
+            size = (end - start) * ps
+            data = self.dev.read_block(base,size)
+            self.data[base:base + size]  = data
+            self.clean[base:base + size] = data
+            for page in missing[start:end]:
+                self.valid[page]  = True
+                self.forced[page] = False
+            self.loads = self.loads + end - start
+            start = end
+
+    def read(self,addr):
+        """
+        Read one byte (registers are read from the board)
+
+        Return: Read byte which is stored in the byte type
+        """
+        if addr >= BrainfuckShadowMemory.SIZE:
+            return self.dev.read(addr)
+        self.load(addr,1)
+        return bytes(self.data[addr:addr + 1])
+
+    def read_block(self,addr,n):
+        """
+        Read data from consecutive addresses
+
+        Return: Read data which are stored in the bytearray type
+        """
+        if addr >= BrainfuckShadowMemory.SIZE:
+            return self.dev.read_block(addr,n)
+        self.load(addr,n)
+        return self.data[addr:addr + n]
+
+    def write(self,addr,data):
+        """
+        Write one byte (registers are written to the board). The write to the command
+        register which starts the BCPU flushes dirty pages and drops cell pages.
+        """
+        if addr < BrainfuckShadowMemory.SIZE:
+            self.write_block(addr,data)
+            return
+
+        if addr == BrainfuckShadowMemory.REG_CMD:
+            cmd = data[0]
+            if cmd & BrainfuckShadowMemory.CMD_RUN:
+                self.flush()
+                self.invalidate(0,BrainfuckShadowMemory.CELL_SIZE)
+            self.dev.write(addr,data)
+            self.enabled = (cmd & 0x1) != 0
+            return
+        self.dev.write(addr,data)
+
+    def write_block(self,addr,data):
+        """
+        Write data to consecutive addresses of the shadow (data are written by the flush)
+        """
+        view = memoryview(data).cast('B')
+        n = len(view)
+        self.__check(addr,n)
+        # Pages which are written completely don't have to be read
+        ps = self.page_size
+        for page in self.__page_range(addr,n):
+            if not(self.valid[page]) and addr <= page * ps and (page + 1) * ps <= addr + n:
+                self.valid[page]  = True
+                self.forced[page] = True
+        self.load(addr,n)
+        self.data[addr:addr + n] = view
+
+    def __getitem__(self,key):
+        """
+        Read the byte (integer index) or data (slice) from the shadow
+        """
+        if isinstance(key,slice):
+            start,stop,step = key.indices(BrainfuckShadowMemory.SIZE)
+            if step != 1:
+                raise ValueError("Slices with the step aren't supported")
+            return bytes(self.read_block(start,max(0,stop - start)))
+        return self.read(key)[0]
+
+    def __setitem__(self,key,value):
+        """
+        Write the byte (integer index) or data (slice) to the shadow
+        """
+        if isinstance(key,slice):
+            start,stop,step = key.indices(BrainfuckShadowMemory.SIZE)
+            if step != 1 or len(value) != stop - start:
+                raise ValueError("Slice assignments have to keep the length and the step 1")
+            self.write_block(start,value)
+            return
+        self.write_block(key,bytes([value]))
+
+    def view(self,addr=0,n=SIZE):
+        """
+        Return the writable memoryview of the address range (pages are loaded)
+        """
+        self.load(addr,n)
+        return memoryview(self.data)[addr:addr + n]
+
+    def array(self,addr=0,n=SIZE):
+        """
+        Return the writable NumPy array (uint8) of the address range (pages are loaded)
+        """
+        import numpy as np
+        self.load(addr,n)
+        return np.frombuffer(self.data,dtype=np.uint8,count=n,offset=addr)
+
+    def dirty_pages(self):
+        """
+        Return the list of dirty pages (indexes)
+        """
+        ps = self.page_size
+        return [page for page in range(self.pages) if self.valid[page] and
+            (self.forced[page] or self.data[page * ps:(page + 1) * ps] != self.clean[page * ps:(page + 1) * ps])]
+
+    def __dirty_spans(self):
+        """
+        Return the list of changed address ranges (start, end), close ranges are joined
+        """
+        ps    = self.page_size
+        data  = self.data
+        clean = self.clean
+        spans = []
+        for page in self.dirty_pages():
+            start = page * ps
+            end   = start + ps
+            if not(self.forced[page]):
+                while data[start] == clean[start]:
+                    start = start + 1
+                while data[end - 1] == clean[end - 1]:
+                    end = end - 1
+            if len(spans) > 0 and start - spans[-1][1] <= BrainfuckShadowMemory.MERGE_GAP:
+                spans[-1] = (spans[-1][0],end)
+            else:
+                spans.append((start,end))
+        return spans
+
+    def flush(self):
+        """
+        Write changed data of dirty pages to the board (in one transaction)
+
+        Return: Number of written bytes
+        """
+        spans = self.__dirty_spans()
+        if len(spans) == 0:
+            return 0
+        if self.enabled:
+            raise RuntimeError("Memory can't be written while the BCPU is enabled")
+
+        view = memoryview(self.data)
+        with self.dev.transaction() as tr:
+            for start,end in spans:
+                tr.write_block(start,view[start:end])
+
+        written = 0
+        for start,end in spans:
+            self.clean[start:end] = self.data[start:end]
+            written = written + end - start
+        for page in range(self.pages):
+            self.forced[page] = False
+        self.written = self.written + written
+        self.flushes = self.flushes + 1
+        return written
+
+    def invalidate(self,addr=0,n=SIZE):
+        """
+        Drop pages of the address range (data which weren't flushed are lost), the next
+        access reads them from the board
+        """
+        self.__check(addr,n)
+        for page in self.__page_range(addr,n):
+            self.valid[page]  = False
+            self.forced[page] = False
+
+    def report(self):
+        """
+        Return the list of lines with the shadow statistics
+        """
+        return ["Shadow memory summary: {} hits, {} loaded pages ({} B), {} written bytes in {} flushes".format(
+            self.hits,self.loads,self.loads * self.page_size,self.written,self.flushes)]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import argparse
+import sys
+import os
+import time
+import shlex
+import shutil
+import tempfile
+import subprocess
+from bench_lexer import generate_source, parse_size
+
+# Path to the compiler (next to this script)
+COMPILER = os.path.join(os.path.dirname(os.path.abspath(__file__)),"compiler.py")
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark of the batch mode - the wall-clock time of the batch translation '
+    'of generated programs is compared with the shell loop which runs the compiler for each program. Brief information '
+    'how to use the command: \n\n'
+    '   * 1000 programs of 2 kB - {0} \n'
+    '   * 200 programs of 16 kB with memory maps, 4 processes - {0} --count 200 --size 16K -j 4 --memory \n'.format(prgname),
+    formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument('--count',type=int,default=1000,help='Number of generated programs (default is 1000).')
+    parser.add_argument('--size',type=str,default="2K",help='Size of one program (K and M suffixes are allowed, default is 2K).')
+    parser.add_argument('-j','--jobs',type=int,default=os.cpu_count(),help='Number of processes of the batch mode (default is {}).'.format(os.cpu_count()))
+    parser.add_argument('--memory',action='store_true',help='Generate memory maps (the --memory argument of the compiler).')
+    parser.add_argument('--no-loop',action='store_true',help='Skip the shell loop (it is slow for many programs).')
+    parser.add_argument('--dir',type=str,default=None,help='Directory for generated programs and outputs (the temporary directory\n'
+        'is created and removed by default).')
+    return parser.parse_args(args)
+
+def generate_programs(path,count,size):
+    """
+    Generate programs to the directory (one seed per program)
+
+    Returns: List of program paths
+    """
+    sources = []
+    for i in range(count):
+        src = os.path.join(path,"prog{:05d}.b".format(i))
+        with open(src,'w') as f:
+            f.write(generate_source(size,80,False,i))
+        sources.append(src)
+    return sources
+
+def run_batch(path,jobs,memory):
+    """
+    Translate all programs in the batch mode
+
+    Returns: Wall-clock time in seconds
+    """
+    out_dir = os.path.join(path,"batch")
+    cmd = [sys.executable,COMPILER,"-j",str(jobs),"--output-dir",out_dir] + (["--memory"] if memory else [])
+    cmd.append(os.path.join(path,"*.b"))
+    start = time.perf_counter()
+    subprocess.run(cmd,check=True,stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def run_loop(path,memory):
+    """
+    Translate all programs with the shell loop (one compiler process per program)
+
+    Returns: Wall-clock time in seconds
+    """
+    out_dir = os.path.join(path,"loop")
+    os.makedirs(out_dir,exist_ok=True)
+    script = 'for f in {0}/*.b; do {1} {2} {3}--output {4}/$(basename "$f" .b) "$f" > /dev/null || exit 1; done'.format(
+        shlex.quote(path),shlex.quote(sys.executable),shlex.quote(COMPILER),"--memory " if memory else "",shlex.quote(out_dir))
+    start = time.perf_counter()
+    subprocess.run(["bash","-c",script],check=True)
+    return time.perf_counter() - start
+
+def check_outputs(path,sources):
+    """
+    Check that both runs generated the same binary images
+    """
+    for src in sources:
+        name = os.path.splitext(os.path.basename(src))[0]
+        with open(os.path.join(path,"batch",name),'rb') as f:
+            batch = f.read()
+        with open(os.path.join(path,"loop",name),'rb') as f:
+            loop = f.read()
+        if batch != loop:
+            raise RuntimeError("Outputs of {} are different.".format(src))
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+    path = args.dir if args.dir is not None else tempfile.mkdtemp(prefix="bench-batch-")
+    try:
+        os.makedirs(path,exist_ok=True)
+        sources = generate_programs(path,args.count,parse_size(args.size))
+        print("Generated {} programs of {} B in {}".format(len(sources),parse_size(args.size),path))
+
+        batch = run_batch(path,args.jobs,args.memory)
+        print("Batch mode ({} processes): {:.2f} s ({:.1f} programs/s)".format(args.jobs,batch,len(sources) / batch))
+        if not(args.no_loop):
+            loop = run_loop(path,args.memory)
+            print("Shell loop:                {:.2f} s ({:.1f} programs/s)".format(loop,len(sources) / loop))
+            check_outputs(path,sources)
+            print("Speedup: {:.1f}x, outputs are identical".format(loop / batch))
+    finally:
+        if args.dir is None:
+            shutil.rmtree(path,ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
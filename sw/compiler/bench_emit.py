@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import argparse
+import sys
+import os
+import io
+import time
+import lib.translate as translate
+from lib.emit import BEmitter
+from bench_lexer import generate_source, parse_size
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark of the emitter - generated programs are translated once and the time '
+    'of the output generation (binary image, MIF and hex memory maps) is measured for each address width. Brief information '
+    'how to use the command: \n\n'
+    '   * Default sizes and address widths - {0} \n'
+    '   * 4 MB program, address widths 14 and 24 - {0} --sizes 4M --addr-widths 14 24 \n'.format(prgname),
+    formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument('--sizes',nargs='+',default=["64K","1M","4M"],help='Sizes of generated sources (K and M suffixes are allowed,\n'
+        'default is 64K 1M 4M).')
+    parser.add_argument('--addr-widths',type=int,nargs='+',default=[14,20,24],help='Address widths of the hex memory map (default is 14 20 24).')
+    parser.add_argument('--repeat',type=int,default=1,help='Number of runs of each configuration, the best time is reported (default is 1).')
+    parser.add_argument('--output-dir',type=str,default=None,help='Write outputs to files in the directory (outputs are written\n'
+        'to {} by default).'.format(os.devnull))
+    return parser.parse_args(args)
+
+class BCountingWriter(object):
+    """
+    Writer which counts written characters (bytes) and passes data to the file
+    """
+
+    def __init__(self,out):
+        self.out     = out
+        self.written = 0
+
+    def write(self,data):
+        self.written = self.written + len(data)
+        return self.out.write(data)
+
+def run_emit(prog,addr_width,output_dir):
+    """
+    Emit all formats of the program (files are opened like in BTranslate.translate)
+
+    Returns: Tuple (time in seconds, number of written bytes)
+    """
+    names = ["bench.out","bench.out.mif","bench.out.hex"]
+    if output_dir is not None:
+        names = [os.path.join(output_dir,name) for name in names]
+    else:
+        names = [os.devnull] * 3
+
+    start = time.perf_counter()
+    with open(names[0],'wb',buffering=translate.BTranslate.WRITE_BUFFER) as bin_file, \
+         open(names[1],'w',buffering=translate.BTranslate.WRITE_BUFFER) as mif_file, \
+         open(names[2],'w',buffering=translate.BTranslate.WRITE_BUFFER) as hex_file:
+        writers = [BCountingWriter(out) for out in (bin_file,mif_file,hex_file)]
+        BEmitter("bench.out",addr_width).emit(prog,*writers)
+        written = sum([writer.written for writer in writers])
+    return (time.perf_counter() - start,written)
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir,exist_ok=True)
+
+    print("{:>10} {:>12} {:>10} {:>12} {:>10} {:>10}".format("size","instructions","addr width","written [B]","emit [s]","MB/s"))
+    for size in args.sizes:
+        bt = translate.BTranslate("bench.b",False,True,14,"bench.out")
+        prog = bt.compile(io.StringIO(generate_source(parse_size(size))))
+        for addr_width in args.addr_widths:
+            emit_time,written = min([run_emit(prog,addr_width,args.output_dir) for _ in range(args.repeat)])
+            print("{:>10} {:>12} {:>10} {:>12} {:>10.3f} {:>10.2f}".format(size,len(prog),addr_width,written,emit_time,written / 2**20 / emit_time))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import argparse
+import sys
+import os
+import io
+import time
+import random
+import lib.translate as translate
+from lib.lexer import BLexer
+from lib.emit import BEmitter
+from lib.error import BTranslationError
+
+# Size of the generated unit of the source code (the input is built from copies of units)
+UNIT_SIZE = 2**12
+
+# Maximal nesting depth of generated loops
+MAX_DEPTH = 8
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark of the lexer and the translation on generated sources. Brief '
+    'information how to use the command: \n\n'
+    '   * Default sizes (1, 4 and 16 MB) - {0} \n'
+    '   * Sources with 80 characters per line and comments - {0} --line-length 80 --comments 1M 4M \n'
+    '   * Deep nests through the whole pipeline - {0} --nest 341 2000 100000 \n'.format(prgname),
+    formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument('--line-length',type=int,default=0,help='Number of symbols per line, 0 generates one line (default is 0).')
+    parser.add_argument('--comments',action='store_true',help='Append the comment to each line.')
+    parser.add_argument('--no-translate',action='store_true',help='Run the lexer only.')
+    parser.add_argument('--repeat',type=int,default=1,help='Number of runs of each size, the best time is reported (default is 1).')
+    parser.add_argument('--seed',type=int,default=0,help='Seed of the source generator (default is 0).')
+    parser.add_argument('--nest',type=int,nargs='+',default=None,metavar='DEPTH',help='Run nests "+[[[...-]]]" of given depths through the whole\n'
+        'pipeline (lexer, translation, branch relaxation and outputs) instead of sizes.\n'
+        'Depths up to 341 are compiled, deeper nests are rejected with the\n'
+        'translation error (no place for the trampoline).')
+    parser.add_argument('sizes',nargs='*',default=["1M","4M","16M"],help='Sizes of generated sources (K and M suffixes are allowed).')
+    return parser.parse_args(args)
+
+def parse_size(size):
+    """
+    Convert the size with the optional K or M suffix to the number of bytes
+    """
+    mult = {"K" : 2**10, "M" : 2**20}
+    if size[-1:].upper() in mult:
+        return int(size[:-1],0) * mult[size[-1:].upper()]
+    return int(size,0)
+
+def generate_unit(rnd,size):
+    """
+    Generate the piece of the source code with balanced loops (the loop body is never
+    empty), the size of the unit is at least size symbols
+    """
+    syms  = []
+    depth = 0
+    while len(syms) < size or depth > 0:
+        r = rnd.random()
+        if r < 0.04 and depth < MAX_DEPTH and len(syms) < size:
+            syms.append("[")
+            depth = depth + 1
+        elif r < 0.08 and depth > 0 and syms[-1] != "[":
+            syms.append("]")
+            depth = depth - 1
+        else:
+            syms.append(rnd.choice("+-<>.,") * rnd.randint(1,6))
+    return "".join(syms)
+
+def generate_source(size,line_length=0,comments=False,seed=0):
+    """
+    Generate the valid Brainfuck source code of the given size (at least). The source is
+    built from copies of one generated unit which keeps loops balanced.
+
+    Parameters:
+        - size - minimal number of symbols
+        - line_length - number of symbols per line (0 means one line)
+        - comments - append the comment to each line (bool)
+        - seed - seed of the generator
+
+    Returns: Source code (string)
+    """
+    unit = generate_unit(random.Random(seed),UNIT_SIZE)
+    code = unit * ((size + len(unit) - 1) // len(unit))
+    if line_length <= 0:
+        return code + "\n"
+
+    comment = " // generated line\n" if comments else "\n"
+    return "".join([code[i:i + line_length] + comment for i in range(0,len(code),line_length)])
+
+def generate_nest(depth):
+    """
+    Generate the nest of loops of the given depth - "+[[[...-]]]". No inner loop is closed in
+    front of the innermost one, long ] jumps can't be relaxed therefore.
+    """
+    return "+" + "[" * depth + "-" + "]" * depth + "\n"
+
+def run_lexer(source):
+    """
+    Run the lexer over the source code
+
+    Returns: Tuple (time in seconds, number of symbols)
+    """
+    start = time.perf_counter()
+    count = 0
+    for _ in BLexer(io.StringIO(source),False).tokens():
+        count = count + 1
+    return (time.perf_counter() - start,count)
+
+def run_translate(source):
+    """
+    Translate the source code (no file is written)
+
+    Returns: Tuple (time in seconds, number of instructions)
+    """
+    bt = translate.BTranslate("bench.b",False,False,14,"bench.out")
+    start = time.perf_counter()
+    prog = bt.compile(io.StringIO(source))
+    return (time.perf_counter() - start,len(prog))
+
+def run_nest(depth):
+    """
+    Run the nest through the whole pipeline - lexer, translation, branch relaxation and the
+    output generation (the binary image and memory maps are written to os.devnull)
+
+    Returns: Tuple (time in seconds, number of instructions or None, error message or None)
+    """
+    bt = translate.BTranslate("bench.b",False,True,14,"bench.out")
+    start = time.perf_counter()
+    try:
+        prog = bt.compile(io.StringIO(generate_nest(depth)))
+        with open(os.devnull,'wb') as bin_file, open(os.devnull,'w') as mif_file, open(os.devnull,'w') as hex_file:
+            BEmitter("bench.out",14).emit(prog,bin_file,mif_file,hex_file)
+        return (time.perf_counter() - start,len(prog),None)
+    except BTranslationError as e:
+        return (time.perf_counter() - start,None,str(e))
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+    if args.nest is not None:
+        print("{:>10} {:>10} {}".format("depth","time [s]","result"))
+        for depth in args.nest:
+            elapsed,insts,msg = min([run_nest(depth) for _ in range(args.repeat)],key=lambda r: r[0])
+            print("{:>10} {:>10.3f} {}".format(depth,elapsed,"{} instructions".format(insts) if insts is not None else msg))
+        return
+
+    print("{:>10} {:>12} {:>10} {:>10} {:>12} {:>10} {:>10}".format("size","symbols","lexer [s]","MB/s","instructions","trans [s]","MB/s"))
+    for size in args.sizes:
+        source = generate_source(parse_size(size),args.line_length,args.comments,args.seed)
+        mbytes = len(source) / 2**20
+        lex_time,count = min([run_lexer(source) for _ in range(args.repeat)])
+        line = "{:>10} {:>12} {:>10.3f} {:>10.2f}".format(size,count,lex_time,mbytes / lex_time)
+        if not(args.no_translate):
+            trans_time,insts = min([run_translate(source) for _ in range(args.repeat)])
+            line = line + " {:>12} {:>10.3f} {:>10.2f}".format(insts,trans_time,mbytes / trans_time)
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,16 @@
 import argparse
 import sys
 import os
-import pdb
+import io
+import glob
+import time
+import contextlib
+import multiprocessing
 import lib.translate as translate
+import lib.optimize as optimize
+import lib.cache as cache
+import lib.model as model
+import lib.fastmodel as fastmodel
 
 def get_parser(args):
     """
@@ -31,31 +39,275 @@ def get_parser(args):
     # Remember the conversion function if you want to write integers as 0x or just like a literal
     parser.add_argument('--debug',action='store_true',help='Generate debug information')
     parser.add_argument('--memory',action='store_true',help='Store memory layout into the file. Output file name is the output name .mif and .hex.')
-    parser.add_argument('--addr-width',type=int,nargs=1,help='Address space width for generated hex file (number of lines,14 bits by default).',default=14)
-    parser.add_argument('--output',type=str,nargs=1,help='Name of the output file (default is a.out)',default='a.out')
-    parser.add_argument('input',nargs=1,help='Input file to translate')
+    parser.add_argument('--debug-info',action='store_true',help='Store the debug information (source positions of instructions and the loop table)\n'
+        'into the file. Output file name is the output name .dbg.')
+    parser.add_argument('--cost',action='store_true',help='Store the static cost estimate (cycles of blocks and loop iterations, warnings) into\n'
+        'the JSON file. Output file name is the output name .cost.json.')
+    parser.add_argument('--addr-width',type=int,help='Address space width for generated hex file (number of lines,14 bits by default).',default=14)
+    parser.add_argument('--output',type=str,help='Name of the output file (default is a.out)',default=None)
+    parser.add_argument('-O',dest='optimize',action='store_true',help='Enable all optimization passes ({}).'.format(', '.join(optimize.BOptimizer.PASSES)))
+    parser.add_argument('--passes',type=str,help='Comma separated list of enabled optimization passes (overrides the -O).')
+    parser.add_argument('--padding',type=str,choices=translate.BTranslate.PADDING_MODES,default='conservative',help='Jump padding mode - conservative pads every jump, hazard pads the jump iff\n'
+        'the cell register can be stale (default is conservative).')
+    parser.add_argument('--rle',action='store_true',help='Fold runs of pointer and data instructions to run-length encoded instructions\n'
+        '(requires the BCPU with the run-length support).')
+    parser.add_argument('--idioms',action='store_true',help='Lower simple loops (clear, move and multiply loops) to idiom instructions\n'
+        '(requires the BCPU with the idiom support).')
+    parser.add_argument('--verify',action='store_true',help='Run the source code and the translated program in the reference model and\n'
+        'compare results (programs which read the input stop on the first read).')
+    parser.add_argument('--cache',action='store_true',help='Enable the compilation cache.')
+    parser.add_argument('--cache-dir',type=str,help='Cache directory (enables the cache, default is {}).'.format(cache.BCache.default_dir()))
+    parser.add_argument('--cache-size',type=int,default=256,help='Maximal size of the cache in MiB (default is 256).')
+    parser.add_argument('--cache-mode',type=str,choices=cache.BCache.MODES,default='copy',help='Copy or hard-link cached files to outputs (default is copy).')
+    parser.add_argument('--cache-stats',action='store_true',help='Print cache statistics.')
+    parser.add_argument('--manifest',type=str,help='Batch mode - file with sources to translate (one "source [output]" pair per line,\n'
+        'relative paths are relative to the manifest file).')
+    parser.add_argument('--output-dir',type=str,help='Batch mode - directory for output files (the source directory by default).\n'
+        'The output name is the source name without the extension.')
+    parser.add_argument('-j','--jobs',type=int,default=os.cpu_count(),help='Batch mode - number of parallel processes (default is {}).'.format(os.cpu_count()))
+    parser.add_argument('input',nargs='*',help='Input files (or glob patterns) to translate, more files enable the batch mode')
     return parser.parse_args(args)
 
+def get_settings(args):
+    """
+    Return the dictionary of compiler settings shared by all translated files
+    """
+    passes = []
+    if args.optimize:
+        passes = optimize.BOptimizer.PASSES
+    if args.passes is not None:
+        passes = [p for p in args.passes.split(',') if p != '']
+
+    cache_dir = None
+    if args.cache or args.cache_dir is not None or args.cache_stats:
+        cache_dir = args.cache_dir if args.cache_dir is not None else cache.BCache.default_dir()
+
+    return {
+        "debug"      : args.debug,
+        "memory"     : args.memory,
+        "debug_info" : args.debug_info,
+        "cost"       : args.cost,
+        "addr_width" : args.addr_width,
+        "passes"     : passes,
+        "padding"    : args.padding,
+        "rle"        : args.rle,
+        "idioms"     : args.idioms,
+        "verify"     : args.verify,
+        "cache_dir"  : cache_dir,
+        "cache_size" : args.cache_size * 2**20,
+        "cache_mode" : args.cache_mode
+    }
+
+def get_cache(settings):
+    """
+    Return the compilation cache (None if the cache is disabled)
+    """
+    if settings["cache_dir"] is None:
+        return None
+    return cache.BCache(settings["cache_dir"],settings["cache_size"],settings["cache_mode"],settings["debug"])
+
+def compile_source(inf,output,settings):
+    """
+    Translate one source file (or take the result from the cache)
+
+    Parameters:
+        - inf - input file
+        - output - output file name
+        - settings - compiler settings (see get_settings)
+
+    Returns: True iff the translation was successful
+    """
+    memory = settings["memory"]
+    if not(os.path.exists(inf)):
+        print("Source file {} doesn't exists!".format(inf))
+    try:
+        bcache = get_cache(settings)
+        suffixes = ["",".mif",".hex"] if memory else [""]
+        if settings["debug_info"]:
+            suffixes.append(".dbg")
+        if settings["cost"]:
+            suffixes.append(".cost.json")
+        key = None
+        if bcache is not None:
+            # The output name is stored inside the MIF file
+            options = {
+                "version"    : translate.BTranslate.VERSION,
+                "memory"     : memory,
+                "debug_info" : settings["debug_info"],
+                "cost"       : settings["cost"],
+                "addr_width" : settings["addr_width"] if memory else None,
+                "output"     : output if memory else None,
+                "passes"     : sorted(settings["passes"]),
+                "padding"    : settings["padding"],
+                "rle"        : settings["rle"],
+                "idioms"     : settings["idioms"]
+            }
+            with open(inf,'rb') as f:
+                key = bcache.make_key(f.read(),options)
+
+        if key is not None and bcache.fetch(key,output,suffixes):
+            print("Cache hit, output files were taken from the cache.")
+            return verify_output(inf,output) if settings["verify"] else True
+
+        if bcache is not None:
+            bcache.release(output,suffixes)
+        bt = translate.BTranslate(inf,settings["debug"],memory,settings["addr_width"],output,settings["passes"],settings["padding"],
+            settings["debug_info"],settings["rle"],settings["idioms"],
+            settings["cost"])
+        success = bt.translate()
+        if success and key is not None:
+            bcache.store(key,output,suffixes)
+        if success and settings["verify"]:
+            success = verify_output(inf,output)
+        return success
+    except Exception as e:
+        print("Error detected during the translation: ",str(e))
+        return False
+
+def verify_output(inf,output):
+    """
+    Check that the translated program is equivalent to the source code (see model.check_equivalence)
+
+    Returns: True iff the check doesn't detect any difference
+    """
+    with open(output,'rb') as f:
+        bmodel = fastmodel.BFastModel.from_image(f.read())
+    with open(inf,'r') as f:
+        result,msg = model.check_equivalence(f,bmodel)
+
+    if result is None:
+        print("Verification skipped - {}.".format(msg))
+    else:
+        print("Verification {} - {}.".format("passed" if result else "FAILED",msg))
+    return result is not False
+
+def compile_job(job):
+    """
+    Batch worker - translate one source file and capture the printed output
+
+    Parameters:
+        - job - tuple (input file, output file, settings)
+
+    Returns: Tuple (input file, output file, success, captured output)
+    """
+    inf,output,settings = job
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        success = compile_source(inf,output,settings)
+    return (inf,output,success,log.getvalue())
+
+def get_batch_sources(args):
+    """
+    Return the list of (input file, output file) pairs for the batch mode. Glob patterns
+    are expanded, output names are derived from input names (if they are not defined
+    by the manifest).
+    """
+    sources = []
+    for pattern in args.input:
+        if glob.has_magic(pattern):
+            matched = sorted(glob.glob(pattern,recursive=True))
+            if len(matched) == 0:
+                print("No file matches the pattern {}.".format(pattern))
+            sources.extend((name,None) for name in matched)
+        else:
+            sources.append((pattern,None))
+
+    if args.manifest is not None:
+        base = os.path.dirname(args.manifest)
+        with open(args.manifest,'r') as f:
+            for line in f:
+                items = line.split('#',1)[0].split()
+                if len(items) == 0:
+                    continue
+                if len(items) > 2:
+                    raise ValueError("Invalid manifest line - {}".format(line.strip()))
+                inf = os.path.join(base,items[0])
+                output = os.path.join(base,items[1]) if len(items) == 2 else None
+                sources.append((inf,output))
+
+    ret = []
+    for inf,output in sources:
+        if output is None:
+            out_dir = args.output_dir if args.output_dir is not None else os.path.dirname(inf)
+            output = os.path.join(out_dir,os.path.splitext(os.path.basename(inf))[0])
+        ret.append((inf,output))
+    return ret
+
+def run_batch(args,settings):
+    """
+    Translate all sources in parallel
+
+    Returns: Number of failed translations
+    """
+    sources = get_batch_sources(args)
+    if args.output is not None:
+        raise ValueError("The --output can't be used in the batch mode, use --output-dir or the manifest.")
+
+    # Two sources can't be translated to the same output
+    outputs = {}
+    for inf,output in sources:
+        if output in outputs:
+            raise ValueError("Sources {} and {} have the same output {}.".format(outputs[output],inf,output))
+        outputs[output] = inf
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir,exist_ok=True)
+
+    jobs    = [(inf,output,settings) for inf,output in sources]
+    start   = time.time()
+    failed  = 0
+    workers = max(1,min(args.jobs,len(jobs)))
+    if workers == 1:
+        results = map(compile_job,jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(compile_job,jobs,chunksize=max(1,len(jobs) // (workers * 8)))
+
+    # Results are printed in the order of sources
+    for inf,output,success,log in results:
+        print("==> {} -> {}{}".format(inf,output,"" if success else " (FAILED)"))
+        sys.stdout.write(log)
+        if not(success):
+            failed = failed + 1
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    print("Batch done: {} files translated, {} failed ({} processes, {:.2f} s)".format(len(jobs),failed,workers,time.time() - start))
+    return failed
+
 def main():
     """
     Main entry function
     """
     args = get_parser(sys.argv) 
-    # Arguments parsed, check the validity
-    inf         = args.input[0]
-    debug       = args.debug
-    memory      = args.memory
-    addr_width  = args.addr_width   
-    output      = args.output[0]
+    settings = get_settings(args)
 
-    if not(os.path.exists(inf)):
-        print("Source file {} doesn't exists!".format(inf))
-    # Run the translation
+    failed = 0
     try:
-        bt = translate.BTranslate(inf,debug,memory,addr_width,output)
-        bt.translate()
+        if len(args.input) == 1 and args.manifest is None and args.output_dir is None:
+            # Translation of one file
+            output = args.output if args.output is not None else "a.out"
+            if not(compile_source(args.input[0],output,settings)):
+                failed = 1
+        elif len(args.input) == 0 and args.manifest is None:
+            print("No input file to translate!")
+            failed = 1
+        else:
+            failed = run_batch(args,settings)
+
+        bcache = get_cache(settings)
+        if bcache is not None and args.cache_stats:
+            for line in bcache.report():
+                print(line)
     except Exception as e:
         print("Error detected during the translation: ",str(e))
+        failed = 1
+
+    if failed > 0:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import io
+from .translate import BTranslate
+from .emit import BEmitter
+from .error import BTranslationError
+
+class BCompileResult(object):
+    """
+    Result of the in-memory compilation
+
+    Attributes:
+        - image - binary image of the program (memoryview of bytes, use the tobytes
+            method to obtain the bytes object)
+        - program - translated program (BProgram)
+        - mif - memory map in the MIF format (None if it wasn't requested)
+        - hex - memory map in the hexadecimal format (None if it wasn't requested)
+        - report - list of lines with the compilation summary
+        - debug_info - debug information (BDebugInfo, None if it wasn't requested)
+        - cost - cost estimate (dictionary, see BCostEstimator, None if it wasn't requested)
+    """
+
+    def __init__(self,program,image,mif,hex_map,report,debug_info,cost=None):
+        self.program = program
+        self.image   = image
+        self.mif     = mif
+        self.hex     = hex_map
+        self.report  = report
+        self.debug_info = debug_info
+        self.cost    = cost
+
+def compile_program(source,name="a.out",memory_map=False,addr_width=14,passes=[],padding="conservative",debug=False,debug_info=False,rle=False,idioms=False,cost=False):
+    """
+    Translate the Brainfuck source code in memory. The function doesn't touch the filesystem
+    and doesn't print anything (with the exception of debug messages), it is intended for
+    long-running processes which translate many programs.
+
+    Parameters:
+        - source - source code (str or UTF-8 encoded bytes)
+        - name - program name stored in the MIF header
+        - memory_map - generate memory maps in the MIF and hexadecimal format (bool)
+        - addr_width - address width of the hexadecimal memory map
+        - passes - list of enabled optimization passes (see BOptimizer.PASSES)
+        - padding - jump padding mode (see BTranslate.PADDING_MODES)
+        - debug - debug is enabled (bool)
+        - debug_info - generate the debug information (bool)
+        - rle - fold runs of pointer and data instructions (bool)
+        - idioms - lower simple loops to idiom instructions (bool)
+        - cost - estimate the cost of the program (bool)
+
+    Returns: BCompileResult
+
+    Raises: BTranslationError if the source code can't be translated (with the line and column
+    of the problem), ValueError if an option is invalid
+    """
+    if isinstance(source,(bytes,bytearray,memoryview)):
+        source = _decode(bytes(source))
+
+    bt = BTranslate(None,debug,memory_map,addr_width,name,passes,padding,debug_info,rle,idioms,cost)
+    prog = bt.compile(io.StringIO(source))
+
+    mif_out = None
+    hex_out = None
+    if memory_map:
+        mif_out = io.StringIO()
+        hex_out = io.StringIO()
+    BEmitter(name,addr_width).emit(prog,None,mif_out,hex_out)
+
+    return BCompileResult(prog,prog.image(),
+        mif_out.getvalue() if mif_out is not None else None,
+        hex_out.getvalue() if hex_out is not None else None,
+        bt.report(),bt.debug_info,bt.cost_est)
+
+def _decode(data):
+    """
+    Decode the UTF-8 source code, the invalid byte is reported as the translation error
+    """
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        line = data.count(b'\n',0,e.start) + 1
+        column = e.start - (data.rfind(b'\n',0,e.start) + 1) + 1
+        raise BTranslationError("Invalid UTF-8 byte in the source code",line,column)
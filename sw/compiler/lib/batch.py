@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import numpy as np
+from .isa import BIsa
+from .model import BModel
+from .fastmodel import BFastModel
+
+class BBatchModel(object):
+    """
+    Batched functional model of the BCPU - one program is executed by N instances with
+    different inputs in lockstep. Cell memories of all instances are stored in the 2-D
+    array (N x 16 KiB, the cell space 0x0 - 0x3FFF) and each instance has its own cell
+    pointer, program counter (index of the fused operation, see BFastModel) and multiplier.
+
+    Each step selects the instance group with the lowest program counter and executes
+    the fused operation for all instances of the group at once (NumPy operations over
+    the group). Instances which take a different branch leave the group and they are
+    joined again when the group reaches the same program counter (typically behind the
+    loop). Instances which wait for the input, terminated instances, instances which
+    detected the invalid instruction and instances which reached the step limit are
+    masked out (their states are the same as in BModel).
+
+    Brief usage:
+        * batch = BBatchModel.from_image(image,len(inputs))
+        * states = batch.run(inputs)
+        * batch.cells[i], batch.output(i), batch.ptr[i], batch.steps[i] ...
+    """
+
+    # Codes of instance states (index to STATES)
+    RUNNING, TERMINATED, INPUT, LIMIT, INVALID = range(5)
+    STATES = [None,BModel.TERMINATED,BModel.INPUT,BModel.LIMIT,BModel.INVALID]
+
+    # Initial capacity of output buffers (buffers are doubled if needed)
+    OUTPUT_SIZE = 64
+
+    def __init__(self,words,n,cells=BModel.CELLS):
+        """
+        Initialization of the model
+
+        Parameters:
+            - words - instruction words of the program (sequence of 16-bit integers)
+            - n - number of instances
+            - cells - size of the cell memory of one instance
+        """
+        prog = BFastModel(words,cells,codegen=False)
+        self.kinds  = prog.kinds
+        self.args   = prog.args
+        self.counts = prog.counts
+        self.starts = prog.starts
+        self.n      = n
+        self.cells  = np.zeros((n,cells),dtype=np.uint8)
+        self.ptr    = np.zeros(n,dtype=np.int64)
+        self.mul    = np.zeros(n,dtype=np.uint8)
+        self.pc     = np.zeros(n,dtype=np.int64)
+        self.steps  = np.zeros(n,dtype=np.int64)
+        self.state  = np.full(n,BBatchModel.RUNNING,dtype=np.int8)
+        self.out    = np.zeros((n,BBatchModel.OUTPUT_SIZE),dtype=np.uint8)
+        self.out_len = np.zeros(n,dtype=np.int64)
+        # Number of executed group operations
+        self.group_steps = 0
+
+    @classmethod
+    def from_image(cls,data,n,cells=BModel.CELLS):
+        """
+        Create the model of the binary image (big-endian instruction words)
+        """
+        return cls(BModel.from_image(data).words,n,cells)
+
+    def output(self,i):
+        """
+        Return output data of the instance i (bytes)
+        """
+        return self.out[i,:self.out_len[i]].tobytes()
+
+    def states(self):
+        """
+        Return the list of instance states (see BModel states)
+        """
+        return [BBatchModel.STATES[code] for code in self.state]
+
+    def run(self,inputs=None,max_steps=10**7):
+        """
+        Run all instances until they terminate, wait for the unavailable input, detect the
+        invalid instruction or reach the step limit (the limit is checked on jumps)
+
+        Parameters:
+            - inputs - list of N input data (bytes), None means no input for all instances
+            - max_steps - step limit of one instance
+
+        Returns: List of instance states (see BModel states)
+        """
+        n      = self.n
+        kinds  = self.kinds
+        args   = self.args
+        counts = self.counts
+        cells  = self.cells
+        ptr    = self.ptr
+        pc     = self.pc
+        steps  = self.steps
+        state  = self.state
+        mask   = cells.shape[1] - 1
+
+        # Input data of all instances are padded to the same length
+        if inputs is None:
+            inputs = [b""] * n
+        if len(inputs) != n:
+            raise ValueError("Expecting {} inputs, {} were passed".format(n,len(inputs)))
+        in_len  = np.array([len(inp) for inp in inputs],dtype=np.int64)
+        in_data = np.zeros((n,max(1,int(in_len.max()) if n > 0 else 1)),dtype=np.uint8)
+        for i,inp in enumerate(inputs):
+            in_data[i,:len(inp)] = np.frombuffer(bytes(inp),dtype=np.uint8)
+        in_pos = np.zeros(n,dtype=np.int64)
+
+        active = np.nonzero(state == BBatchModel.RUNNING)[0]
+        while active.size > 0:
+            # Select the group with the lowest program counter
+            apc = pc[active]
+            cur = int(apc.min())
+            sel = active if int(apc.max()) == cur else active[apc == cur]
+            kind = kinds[cur]
+            arg  = args[cur]
+            self.group_steps = self.group_steps + 1
+            done = False
+
+            if kind == BFastModel.MOVE:
+                ptr[sel] = (ptr[sel] + arg) & mask
+            elif kind == BFastModel.ADD:
+                sp = ptr[sel]
+                cells[sel,sp] = cells[sel,sp] + np.uint8(arg)
+            elif kind == BFastModel.JZ or kind == BFastModel.JNZ:
+                zero  = cells[sel,ptr[sel]] == 0
+                taken = zero if kind == BFastModel.JZ else ~zero
+                steps[sel] = steps[sel] + counts[cur]
+                pc[sel] = np.where(taken,arg,cur + 1)
+                limit = steps[sel] >= max_steps
+                if limit.any():
+                    state[sel[limit]] = BBatchModel.LIMIT
+                    active = active[state[active] == BBatchModel.RUNNING]
+                continue
+            elif kind == BFastModel.OUT:
+                self.__reserve_output()
+                cells_out = cells[sel,ptr[sel]]
+                self.out[sel,self.out_len[sel]] = cells_out
+                self.out_len[sel] = self.out_len[sel] + 1
+            elif kind == BFastModel.IN:
+                avail = in_pos[sel] < in_len[sel]
+                if not(avail.all()):
+                    state[sel[~avail]] = BBatchModel.INPUT
+                    sel = sel[avail]
+                    done = True
+                cells[sel,ptr[sel]] = in_data[sel,in_pos[sel]]
+                in_pos[sel] = in_pos[sel] + 1
+            elif kind == BFastModel.CLEAR:
+                cells[sel,ptr[sel]] = 0
+            elif kind == BFastModel.LOADMUL:
+                self.mul[sel] = cells[sel,ptr[sel]]
+            elif kind == BFastModel.MULADD:
+                sp = ptr[sel]
+                cells[sel,sp] = cells[sel,sp] + self.mul[sel] * np.uint8(arg & 0xff)
+            elif kind == BFastModel.END:
+                steps[sel] = steps[sel] + counts[cur]
+                state[sel] = BBatchModel.TERMINATED
+                active = active[state[active] == BBatchModel.RUNNING]
+                continue
+            elif kind == BFastModel.INVALID:
+                state[sel] = BBatchModel.INVALID
+                active = active[state[active] == BBatchModel.RUNNING]
+                continue
+
+            steps[sel] = steps[sel] + counts[cur]
+            pc[sel] = cur + 1
+            if done:
+                active = active[state[active] == BBatchModel.RUNNING]
+
+        return self.states()
+
+    def __reserve_output(self):
+        """
+        Double the capacity of output buffers if any of them is full
+        """
+        if int(self.out_len.max()) >= self.out.shape[1]:
+            self.out = np.concatenate((self.out,np.zeros_like(self.out)),axis=1)
+
+    def pcs(self):
+        """
+        Return addresses of instructions where instances stopped (the same value as the
+        pc attribute of BModel)
+        """
+        starts = np.array(self.starts,dtype=np.int64)
+        return starts[self.pc] * BIsa.INST_WIDTH
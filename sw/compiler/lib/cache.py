@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import os
+import glob
+import json
+import shutil
+import fcntl
+import hashlib
+import tempfile
+
+class BCache(object):
+    """
+    Content addressed on-disk cache of compiled artifacts.
+
+    The key is the hash of the source code, compiler options and the compiler version. Each
+    entry is a directory with artifacts (one file per output suffix). The cache size is
+    bounded, least recently used entries are removed first (the entry directory modification
+    time is updated on every hit). The limit is checked after each store and when the cache
+    is opened. Statistics are shared by all compiler runs.
+
+    Brief usage:
+        * cache = BCache(BCache.default_dir(),256*2**20,"copy",False)
+        * key = cache.make_key(source,options)
+        * if not cache.fetch(key,"a.out",suffixes): compile & cache.store(key,"a.out",suffixes)
+    """
+
+    # Cache modes - copy the stored artifact or create the hard link (falls back to the
+    # copy if the link can't be created)
+    MODES = ["copy","link"]
+
+    # Statistics and the lock file names
+    STATS_FILE = "stats.json"
+    LOCK_FILE  = "lock"
+
+    # Digest of the compiler source code (computed once)
+    source_digest = None
+
+    def __init__(self,path,max_size,mode,debug):
+        """
+        Initialization of the cache
+
+        Parameters:
+            - path - cache directory (created if it doesn't exist)
+            - max_size - maximal size of stored artifacts in bytes
+            - mode - hit mode (see MODES)
+            - debug - debug is enabled (bool)
+        """
+        if mode not in BCache.MODES:
+            raise ValueError("Unknown cache mode {} (available: {}).".format(mode,", ".join(BCache.MODES)))
+
+        self.path     = path
+        self.max_size = max_size
+        self.mode     = mode
+        self.debug    = debug
+        os.makedirs(self.path,exist_ok=True)
+        # The cache can be opened with the lower limit than it was filled with
+        if self.__update_stats(None,0)["size"] > self.max_size:
+            self.__evict()
+
+    @staticmethod
+    def default_dir():
+        """
+        Return the default cache directory - the BCOMPILER_CACHE_DIR environment variable
+        or the directory inside the user cache
+        """
+        if "BCOMPILER_CACHE_DIR" in os.environ:
+            return os.environ["BCOMPILER_CACHE_DIR"]
+        base = os.environ.get("XDG_CACHE_HOME",os.path.join(os.path.expanduser("~"),".cache"))
+        return os.path.join(base,"fpga-brainfuck","compiler")
+
+    @staticmethod
+    def compiler_digest():
+        """
+        Return the digest of the compiler source code. Any change of the compiler
+        invalidates cached artifacts even if the version wasn't updated.
+        """
+        if BCache.source_digest is None:
+            h = hashlib.sha256()
+            lib_dir = os.path.dirname(os.path.abspath(__file__))
+            for name in sorted(glob.glob(os.path.join(lib_dir,"*.py"))):
+                with open(name,'rb') as f:
+                    h.update(f.read())
+            BCache.source_digest = h.hexdigest()
+        return BCache.source_digest
+
+    @staticmethod
+    def make_key(source,options):
+        """
+        Return the cache key
+
+        Parameters:
+            - source - source code (bytes)
+            - options - dictionary of options which change the output (including the compiler version)
+        """
+        h = hashlib.sha256()
+        h.update(json.dumps(options,sort_keys=True).encode())
+        h.update(BCache.compiler_digest().encode())
+        h.update(source)
+        return h.hexdigest()
+
+    def __entry(self,key):
+        """
+        Return the path of the cache entry
+        """
+        return os.path.join(self.path,key[:2],key)
+
+    def fetch(self,key,outfile,suffixes):
+        """
+        Copy (or link) cached artifacts to output files. The output file name is outfile + suffix.
+
+        Returns: True iff the entry was found (cache hit)
+        """
+        entry = self.__entry(key)
+        hit = all(os.path.isfile(os.path.join(entry,"a" + s)) for s in suffixes)
+        if hit:
+            for s in suffixes:
+                self.__put(os.path.join(entry,"a" + s),outfile + s)
+            # Mark the entry as recently used
+            try:
+                os.utime(entry)
+            except OSError:
+                pass
+
+        if self.debug:
+            print("Cache {} for the key {}".format("hit" if hit else "miss",key))
+        self.__update_stats("hits" if hit else "misses",0)
+        return hit
+
+    def release(self,outfile,suffixes):
+        """
+        Remove output files before they are rewritten by the compiler. Outputs can be
+        hard links to cache entries, the in-place rewrite would change the cached artifact.
+        """
+        if self.mode != "link":
+            return
+        for s in suffixes:
+            if os.path.isfile(outfile + s):
+                os.remove(outfile + s)
+
+    def store(self,key,outfile,suffixes):
+        """
+        Store output files into the cache and evict old entries if the cache is full
+        """
+        entry = self.__entry(key)
+        if os.path.isdir(entry):
+            return
+
+        # Artifacts which are larger than the whole cache are not stored
+        size = sum(os.path.getsize(outfile + s) for s in suffixes)
+        if size > self.max_size:
+            if self.debug:
+                print("Artifacts are larger than the cache ({} B), skipping the store".format(size))
+            return
+
+        # Prepare the entry in the temporary directory and move it at once, parallel
+        # compiler runs can store the same entry
+        os.makedirs(os.path.dirname(entry),exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(entry),prefix=".tmp-")
+        for s in suffixes:
+            shutil.copyfile(outfile + s,os.path.join(tmp,"a" + s))
+
+        try:
+            os.rename(tmp,entry)
+        except OSError:
+            # The entry was stored by somebody else
+            shutil.rmtree(tmp,ignore_errors=True)
+            return
+
+        if self.debug:
+            print("Storing {} B to the cache entry {}".format(size,key))
+        stats = self.__update_stats("stores",size)
+        if stats["size"] > self.max_size:
+            self.__evict()
+
+    def report(self):
+        """
+        Return the list of lines with cache statistics
+        """
+        stats = self.__update_stats(None,0)
+        total = stats["hits"] + stats["misses"]
+        ratio = 100.0 * stats["hits"] / total if total > 0 else 0.0
+        return [
+            "Cache statistics ({}):".format(self.path),
+            " * hits - {} ({:.1f} %)".format(stats["hits"],ratio),
+            " * misses - {}".format(stats["misses"]),
+            " * stored entries - {}, evicted entries - {}".format(stats["stores"],stats["evictions"]),
+            " * size - {} B of {} B".format(stats["size"],self.max_size)
+        ]
+
+    def __put(self,src,dst):
+        """
+        Create the output file from the cached artifact
+        """
+        if os.path.lexists(dst):
+            os.remove(dst)
+
+        if self.mode == "link":
+            try:
+                os.link(src,dst)
+                return
+            except OSError:
+                pass
+
+        shutil.copyfile(src,dst)
+
+    def __lock(self):
+        """
+        Return the opened and locked lock file (closing the file releases the lock)
+        """
+        f = open(os.path.join(self.path,BCache.LOCK_FILE),'a')
+        fcntl.flock(f,fcntl.LOCK_EX)
+        return f
+
+    def __read_stats(self):
+        """
+        Read statistics, the lock has to be held
+        """
+        stats = { "hits" : 0, "misses" : 0, "stores" : 0, "evictions" : 0, "size" : 0 }
+        try:
+            with open(os.path.join(self.path,BCache.STATS_FILE),'r') as f:
+                stats.update(json.load(f))
+        except (IOError,ValueError):
+            pass
+        return stats
+
+    def __write_stats(self,stats):
+        """
+        Write statistics, the lock has to be held
+        """
+        name = os.path.join(self.path,BCache.STATS_FILE)
+        with open(name + ".tmp",'w') as f:
+            json.dump(stats,f)
+        os.replace(name + ".tmp",name)
+
+    def __update_stats(self,counter,size):
+        """
+        Increment the statistics counter (if it is not None) and add the size
+
+        Returns: Updated statistics
+        """
+        lock = self.__lock()
+        try:
+            stats = self.__read_stats()
+            if counter is not None:
+                stats[counter] = stats[counter] + 1
+                stats["size"]  = stats["size"] + size
+                self.__write_stats(stats)
+        finally:
+            lock.close()
+        return stats
+
+    def __evict(self):
+        """
+        Remove least recently used entries until the cache size is lower than the limit
+        """
+        lock = self.__lock()
+        try:
+            entries = []
+            for entry in glob.glob(os.path.join(self.path,"??","*")):
+                if os.path.basename(entry).startswith("."):
+                    continue
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry,n)) for n in os.listdir(entry))
+                    entries.append((os.path.getmtime(entry),size,entry))
+                except OSError:
+                    continue
+
+            # Size is computed again, it also fixes the drift caused by entries
+            # removed by hand
+            total = sum(e[1] for e in entries)
+            stats = self.__read_stats()
+            for _,size,entry in sorted(entries):
+                if total <= self.max_size:
+                    break
+                shutil.rmtree(entry,ignore_errors=True)
+                total = total - size
+                stats["evictions"] = stats["evictions"] + 1
+                if self.debug:
+                    print("Evicting the cache entry {}".format(entry))
+
+            stats["size"] = total
+            self.__write_stats(stats)
+        finally:
+            lock.close()
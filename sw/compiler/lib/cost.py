@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import json
+from .isa import BIsa
+
+class BCostEstimator(object):
+    """
+    Static cost estimator of the translated program. The estimate uses the cost model
+    of the BCPU pipeline (see BIsa.inst_cycles) and it doesn't execute the program:
+
+        * blocks - straight-line sequences of instructions between jumps, the cost is the
+            number of cycles of one pass through the block
+        * loops - the cost of one iteration (from the instruction behind [ to the taken ]),
+            inner loops are counted as skipped (the padding and the taken [). The padding is
+            the jump padding (&; in front of the jump) inside the iteration.
+
+    Loops which are nested deeper than max_depth or which spend more than max_padding of
+    the iteration in the jump padding are flagged with warnings.
+
+    Brief usage:
+        * est = BCostEstimator().estimate(prog,loops)
+        * BCostEstimator.to_json(est)
+    """
+
+    # Default limits for warnings - nesting depth and the ratio of padding cycles
+    MAX_DEPTH   = 4
+    MAX_PADDING = 0.5
+
+    def __init__(self,max_depth=MAX_DEPTH,max_padding=MAX_PADDING):
+        """
+        Initialization of the estimator
+
+        Parameters:
+            - max_depth - maximal nesting depth of loops without the warning
+            - max_padding - maximal ratio of padding cycles in the loop iteration without the warning
+        """
+        self.max_depth   = max_depth
+        self.max_padding = max_padding
+
+    @staticmethod
+    def padding_mask(prog):
+        """
+        Return the list of flags - the instruction is a part of the jump padding (& and ;
+        directly in front of the jump)
+        """
+        syms = [prog.symbol(idx) for idx in range(len(prog))]
+        mask = [False] * len(syms)
+        for idx,sym in enumerate(syms):
+            if BIsa.is_jump_instruction(sym) and idx >= 2 and syms[idx-2] == "&" and syms[idx-1] == ";":
+                mask[idx-2] = True
+                mask[idx-1] = True
+        return mask
+
+    def estimate(self,prog,loops):
+        """
+        Estimate the cost of the program
+
+        Parameters:
+            - prog - translated program (BProgram)
+            - loops - list of (index of [, index of ]) pairs of the program
+
+        Returns: Dictionary with the program summary, blocks, loops and warnings (the format
+        is the same as the JSON output)
+        """
+        syms    = [prog.symbol(idx) for idx in range(len(prog))]
+        padding = BCostEstimator.padding_mask(prog)
+        cycles  = [BIsa.inst_cycles(sym) for sym in syms]
+
+        # Straight-line blocks, jumps are not part of any block
+        blocks = []
+        start  = 0
+        for idx in range(len(syms) + 1):
+            if idx < len(syms) and not(BIsa.is_jump_instruction(syms[idx])):
+                continue
+            if idx > start:
+                blocks.append({
+                    "address"   : prog.address(start),
+                    "instructions" : idx - start,
+                    "cycles"    : sum(cycles[start:idx]),
+                    "padding"   : sum(cycles[i] for i in range(start,idx) if padding[i])
+                })
+            start = idx + 1
+
+        # Loops - compute nesting depths and costs of one iteration
+        ends   = dict(loops)
+        order  = sorted(loops)
+        stack  = []
+        depths = {}
+        for b,e in order:
+            while len(stack) > 0 and stack[-1] < b:
+                stack.pop()
+            stack.append(e)
+            depths[b] = len(stack)
+
+        ret_loops = []
+        warnings  = []
+        for b,e in order:
+            iter_cycles = 0
+            pad_cycles  = 0
+            inner       = 0
+            idx = b + 1
+            while idx <= e:
+                sym = syms[idx]
+                taken = idx == e or (BIsa.is_bjump(sym) and idx in ends)
+                cost  = BIsa.inst_cycles(sym,taken)
+                iter_cycles = iter_cycles + cost
+                if padding[idx]:
+                    pad_cycles = pad_cycles + cost
+                if idx != e and idx in ends:
+                    # The inner loop is skipped
+                    inner = inner + 1
+                    idx = ends[idx] + 1
+                    continue
+                idx = idx + 1
+
+            loop = {
+                "begin"     : prog.address(b),
+                "end"       : prog.address(e),
+                "depth"     : depths[b],
+                "instructions" : e - b + 1,
+                "inner_loops"  : inner,
+                "iteration_cycles" : iter_cycles,
+                "padding_cycles"   : pad_cycles
+            }
+            ret_loops.append(loop)
+
+            if depths[b] > self.max_depth:
+                warnings.append("Loop at 0x{:x} is nested too deeply ({} > {})".format(loop["begin"],depths[b],self.max_depth))
+            if iter_cycles > 0 and pad_cycles > self.max_padding * iter_cycles:
+                warnings.append("Loop at 0x{:x} spends {:.0f} % of the iteration in the jump padding ({} of {} cycles)".format(
+                    loop["begin"],100.0 * pad_cycles / iter_cycles,pad_cycles,iter_cycles))
+
+        pad_inst = sum(1 for flag in padding if flag)
+        return {
+            "program" : {
+                "instructions"         : len(syms),
+                "size"                 : prog.size(),
+                "padding_instructions" : pad_inst,
+                "straight_cycles"      : sum(cycles),
+                "padding_cycles"       : sum(cycles[i] for i in range(len(syms)) if padding[i]),
+                "loops"                : len(loops),
+                "max_depth"            : max(depths.values()) if len(depths) > 0 else 0
+            },
+            "blocks"   : blocks,
+            "loops"    : ret_loops,
+            "warnings" : warnings
+        }
+
+    @staticmethod
+    def to_json(est):
+        """
+        Return the estimate as the JSON string
+        """
+        return json.dumps(est,indent=1)
+
+    @staticmethod
+    def report(est):
+        """
+        Return the list of lines with the summary of the estimate
+        """
+        prog = est["program"]
+        ret = ["Cost summary: ~{} cycles of the straight-line code ({} of {} instructions are the padding, ~{} cycles), {} loops (max depth {})".format(
+            prog["straight_cycles"],prog["padding_instructions"],prog["instructions"],prog["padding_cycles"],prog["loops"],prog["max_depth"])]
+        ret.extend(" * warning - {}".format(w) for w in est["warnings"])
+        return ret
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import sys
+import struct
+from array import array
+from bisect import bisect_right
+from .isa import BIsa
+
+class BDebugInfo(object):
+    """
+    Debug information of the translated program - source position and the kind of each
+    instruction and the table of loops. It allows to map the program counter back to the
+    source code without parsing it again.
+
+    The binary format (all values are little-endian):
+        * header - magic "BFDI", version (u16), reserved (u16), number of instructions N (u32)
+            and number of loops L (u32)
+        * N source lines (u32), N source columns (u32) and N instruction kinds (u8)
+        * L addresses of [ (u32), L addresses of ] (u32) and L nesting depths (u32)
+
+    Lines and columns are indexed from 1, generated instructions without the source position
+    have the line and column 0. Loops are sorted by the address of [, the outermost loop has
+    the depth 1.
+
+    Brief usage:
+        * info = BDebugInfo()
+        * info.append(line,col,BDebugInfo.SOURCE) - for each emitted instruction
+        * info.set_loops(loops) - after the program layout is final
+        * info.write(f) / info = BDebugInfo.load(data)
+    """
+
+    # File identification and the format version
+    MAGIC   = b"BFDI"
+    VERSION = 1
+    HEADER  = struct.Struct("<4sHHII")
+
+    # Kinds of instructions - instruction from the source code, jump padding (& and ;),
+    # generated instruction (final no-op and the program end) and relaxation trampoline
+    SOURCE     = 0
+    PADDING    = 1
+    GENERATED  = 2
+    TRAMPOLINE = 3
+    KIND_NAMES = ["source","padding","generated","trampoline"]
+
+    def __init__(self):
+        """
+        Initialization of the empty debug information
+        """
+        self.lines  = array('I')
+        self.cols   = array('I')
+        self.kinds  = array('B')
+        self.begins = array('I')
+        self.ends   = array('I')
+        self.depths = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self,line,col,kind):
+        """
+        Append the record of the next instruction
+        """
+        self.lines.append(line)
+        self.cols.append(col)
+        self.kinds.append(kind)
+
+    def set_loops(self,loops):
+        """
+        Set the loop table
+
+        Parameters:
+            - loops - iterable of (address of [, address of ]) pairs
+        """
+        self.begins = array('I')
+        self.ends   = array('I')
+        self.depths = array('I')
+        # Loops are properly nested, the depth is the number of opened loops
+        stack = []
+        for b,e in sorted(loops):
+            while len(stack) > 0 and stack[-1] < b:
+                stack.pop()
+            stack.append(e)
+            self.begins.append(b)
+            self.ends.append(e)
+            self.depths.append(len(stack))
+
+    def lookup(self,addr):
+        """
+        Return the debug record of the instruction on the given address
+
+        Returns: Tuple (line, column, kind name, depth of the innermost loop)
+        """
+        idx = addr // BIsa.INST_WIDTH
+        if idx < 0 or idx >= len(self.kinds):
+            raise IndexError("Address 0x{:x} is out of the program".format(addr))
+
+        # The innermost loop is the last opened loop which contains the address
+        depth = 0
+        n = bisect_right(self.begins,addr)
+        while n > 0:
+            n = n - 1
+            if self.ends[n] >= addr:
+                depth = self.depths[n]
+                break
+            # Skip all loops which are nested into the closed one
+            if self.depths[n] == 1:
+                break
+        return (self.lines[idx],self.cols[idx],BDebugInfo.KIND_NAMES[self.kinds[idx]],depth)
+
+    @staticmethod
+    def __le_bytes(arr):
+        """
+        Return bytes of the array in the little-endian byte order
+        """
+        if sys.byteorder == 'little':
+            return arr.tobytes()
+        swapped = array(arr.typecode,arr)
+        swapped.byteswap()
+        return swapped.tobytes()
+
+    def tobytes(self):
+        """
+        Return the debug information in the binary format
+        """
+        parts = [BDebugInfo.HEADER.pack(BDebugInfo.MAGIC,BDebugInfo.VERSION,0,len(self.kinds),len(self.begins))]
+        for arr in [self.lines,self.cols,self.kinds,self.begins,self.ends,self.depths]:
+            parts.append(BDebugInfo.__le_bytes(arr))
+        return b"".join(parts)
+
+    def write(self,out):
+        """
+        Write the debug information to the opened binary file
+        """
+        out.write(self.tobytes())
+
+    @staticmethod
+    def load(data):
+        """
+        Create the debug information from the binary format
+
+        Parameters:
+            - data - bytes-like object with the content of the debug information file
+        """
+        data = memoryview(data).cast('B')
+        if len(data) < BDebugInfo.HEADER.size:
+            raise ValueError("Debug information is truncated")
+        magic,version,_,n,l = BDebugInfo.HEADER.unpack_from(data,0)
+        if magic != BDebugInfo.MAGIC or version != BDebugInfo.VERSION:
+            raise ValueError("Unsupported debug information format")
+
+        info = BDebugInfo()
+        pos  = BDebugInfo.HEADER.size
+        for name,typecode,count in [("lines",'I',n),("cols",'I',n),("kinds",'B',n),("begins",'I',l),("ends",'I',l),("depths",'I',l)]:
+            arr  = array(typecode)
+            size = count * arr.itemsize
+            if pos + size > len(data):
+                raise ValueError("Debug information is truncated")
+            arr.frombytes(data[pos:pos + size])
+            if sys.byteorder != 'little':
+                arr.byteswap()
+            setattr(info,name,arr)
+            pos = pos + size
+        return info
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+from .isa import BIsa
+from .template import *
+
+class BEmitter(object):
+    """
+    Emitter of output formats - binary image, memory map in the MIF format and the memory
+    map in the hexadecimal format (one line per 2 bytes).
+
+    All requested formats are generated in one pass over the program. The program is
+    processed in chunks, each chunk is formatted to one string and passed to the writer
+    (any object with the write method - opened file, io.StringIO, ...). Instruction words
+    are formatted just once (programs contain a small number of different words), the zero
+    padding of the hexadecimal format is written in large blocks.
+
+    Brief usage:
+        * em = BEmitter("a.out",14)
+        * em.emit(prog,bin_file,mif_file,hex_file) - None disables the format
+    """
+
+    # Number of instructions processed at once
+    CHUNK_SIZE = 2**14
+
+    # Number of zero lines written at once
+    PAD_BLOCK = 2**16
+
+    def __init__(self,name,addr_width):
+        """
+        Initialization of the emitter
+
+        Parameters:
+            - name - program name (stored in the MIF header)
+            - addr_width - address width of the hexadecimal format, the memory
+                has 2**addr_width bytes
+        """
+        self.name       = name
+        self.addr_width = addr_width
+
+    def emit(self,prog,bin_out=None,mif_out=None,hex_out=None):
+        """
+        Write the program to all passed writers
+
+        Parameters:
+            - prog - translated program (BProgram)
+            - bin_out - writer of the binary image (bytes)
+            - mif_out - writer of the MIF memory map (string)
+            - hex_out - writer of the hexadecimal memory map (string)
+        """
+        words = prog.words
+        image = prog.image() if bin_out is not None else None
+
+        # Formatted parts of the instruction word - MIF comment, MIF data bytes and the hex line
+        mif_cache = {}
+        hex_cache = {}
+        uniq = set(words)
+        if mif_out is not None:
+            for word in uniq:
+                mif_cache[word] = ("-- Translated instruction ==> {} (parameter = 0x{} )\n".format(BIsa.get_symbol(word),BIsa.get_word_argument(word)),
+                    "{:x};\n".format(word >> 8),"{:x};\n".format(word & 0xff))
+            mif_out.write(mif_hdr_template.format(self.name,prog.size(),8))
+        if hex_out is not None:
+            for word in uniq:
+                hex_cache[word] = hex_line_template.format(word >> 8,word & 0xff)
+
+        width = BIsa.INST_WIDTH
+        for start in range(0,len(words),BEmitter.CHUNK_SIZE):
+            chunk = words[start:start + BEmitter.CHUNK_SIZE]
+            if bin_out is not None:
+                bin_out.write(image[start*width:(start + len(chunk))*width])
+
+            if mif_out is not None:
+                # Two lines per instruction (MSB first), the address is the only
+                # formatted value
+                addr = start * width
+                mif_out.write("".join([
+                    "%s%x : %s%x : %s" % (mif_cache[word][0],a,mif_cache[word][1],a + 1,mif_cache[word][2])
+                    for a,word in zip(range(addr,addr + len(chunk)*width,width),chunk)]))
+
+            if hex_out is not None:
+                hex_out.write("".join([hex_cache[word] for word in chunk]))
+
+        if mif_out is not None:
+            mif_out.write(mif_end_template)
+
+        if hex_out is not None:
+            self.__pad_hex(prog,hex_out)
+
+    def __pad_hex(self,prog,hex_out):
+        """
+        Fill the rest of the hexadecimal memory map with zeros, the total number
+        of bytes is 2**addr_width
+        """
+        remaining = 2**self.addr_width - prog.size()
+        if remaining <= 0:
+            return
+
+        # One line per 2 bytes, the last line is written also for the odd remaining byte
+        lines = (remaining + 1) // 2
+        zero  = hex_line_template.format(0,0)
+        block = zero * min(lines,BEmitter.PAD_BLOCK)
+        while lines >= BEmitter.PAD_BLOCK:
+            hex_out.write(block)
+            lines = lines - BEmitter.PAD_BLOCK
+        if lines > 0:
+            hex_out.write(zero * lines)
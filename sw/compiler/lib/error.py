@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+class BTranslationError(Exception):
+    """
+    Error during the translation was detected. The position in the source code
+    is stored in the line and column attributes, the reason attribute holds the
+    message without the position.
+    """
+    def __init__(self,message,line,column):
+        self.line = line
+        self.column = column
+        self.reason = message
+        self.message = "Error {}:{} - {}".format(line,column,message)
+        super().__init__(self.message)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+from .isa import BIsa
+from .model import BModel
+
+class BFastModel(BModel):
+    """
+    Fast functional model of the BCPU with the same interface and results as BModel. The
+    program is decoded once to the array of fused operations:
+
+        * runs of pointer (data) instructions are fused to one pointer (data) operation
+        * NOP and preload instructions (; and &) are removed - they are counted as steps
+            of the previous operation
+        * relative jumps are replaced by indexes of target operations
+
+    Programs with structured jumps (each [ jumps behind its ] and vice versa) are translated
+    to the Python function with while loops - pointer moves are tracked statically inside
+    straight-line code and cells are accessed with offsets. Other programs (or programs with
+    too deeply nested loops) are executed in the tight loop over fused operations.
+
+    The step limit is checked on each fused operation (each loop iteration in the generated
+    code), the run can therefore stop a few steps behind the limit. Jumps outside of the image
+    and the end of the image are reported as the invalid instruction.
+
+    Brief usage:
+        * model = BFastModel.from_image(image)
+        * state = model.run(b"input data")
+        * model.cells, model.output, model.ptr, model.steps ...
+    """
+
+    # Kinds of fused operations
+    NOP, MOVE, ADD, OUT, IN, JZ, JNZ, END, CLEAR, LOADMUL, MULADD, INVALID = range(12)
+
+    # Maximal depth of loops in the generated code (Python limits the number of nested blocks)
+    MAX_DEPTH = 16
+
+    def __init__(self,words,cells=BModel.CELLS,codegen=True):
+        """
+        Initialization of the model
+
+        Parameters:
+            - words - instruction words of the program (sequence of 16-bit integers)
+            - cells - size of the cell memory
+            - codegen - translate programs with structured jumps to Python functions (bool)
+        """
+        BModel.__init__(self,words,cells)
+        self.codegen = codegen
+        self.__decode()
+        self.func = None
+
+    def __decode(self):
+        """
+        Decode the program to fused operations - lists kinds, args (the pointer move, the data
+        change, the multiply-add factor or the index of the jump target), counts (number of
+        instructions) and starts (index of the first instruction). The operation starts on
+        each jump target and input instruction (the run can be resumed there).
+        """
+        words = self.words
+        size  = len(words)
+        leaders = set([0,size])
+        for idx,word in enumerate(words):
+            op  = word >> BIsa.ARG_WIDTH
+            arg = (word & BIsa.ARG_MAX) // BIsa.INST_WIDTH
+            if op == 0x7:
+                leaders.update((idx + arg,idx + 1))
+            elif op == 0x8:
+                leaders.update((idx - arg,idx + 1))
+            elif op == 0x6 or op == 0x9 or op > 0xd:
+                leaders.add(idx)
+
+        kinds  = []
+        args   = []
+        counts = []
+        starts = []
+        for idx,word in enumerate(words):
+            op  = word >> BIsa.ARG_WIDTH
+            arg = word & BIsa.ARG_MAX
+            run = arg if arg != 0 else 1
+            lead = idx in leaders or len(kinds) == 0
+            if op == 0x0 or op == 0xa:
+                if not(lead):
+                    counts[-1] = counts[-1] + 1
+                    continue
+                kind,val = BFastModel.NOP,0
+            elif op == 0x1 or op == 0x2:
+                val = run if op == 0x1 else -run
+                if not(lead) and kinds[-1] == BFastModel.MOVE:
+                    args[-1] = args[-1] + val
+                    counts[-1] = counts[-1] + 1
+                    continue
+                kind = BFastModel.MOVE
+            elif op == 0x3 or op == 0x4:
+                val = run if op == 0x3 else -run
+                if not(lead) and kinds[-1] == BFastModel.ADD:
+                    args[-1] = (args[-1] + val) & 0xff
+                    counts[-1] = counts[-1] + 1
+                    continue
+                kind,val = BFastModel.ADD,val & 0xff
+            elif op == 0x5:
+                kind,val = BFastModel.OUT,0
+            elif op == 0x6:
+                kind,val = BFastModel.IN,0
+            elif op == 0x7:
+                kind,val = BFastModel.JZ,idx + arg // BIsa.INST_WIDTH
+            elif op == 0x8:
+                kind,val = BFastModel.JNZ,idx - arg // BIsa.INST_WIDTH
+            elif op == 0x9:
+                kind,val = BFastModel.END,0
+            elif op == 0xb:
+                kind,val = BFastModel.CLEAR,0
+            elif op == 0xc:
+                kind,val = BFastModel.LOADMUL,0
+            elif op == 0xd:
+                kind,val = BFastModel.MULADD,run
+            else:
+                kind,val = BFastModel.INVALID,0
+            kinds.append(kind)
+            args.append(val)
+            counts.append(1)
+            starts.append(idx)
+
+        # The end of the image (and jumps outside of the image) stops the run
+        kinds.append(BFastModel.INVALID)
+        args.append(0)
+        counts.append(0)
+        starts.append(size)
+
+        index = { start : i for i,start in enumerate(starts) }
+        for i,kind in enumerate(kinds):
+            if kind == BFastModel.JZ or kind == BFastModel.JNZ:
+                args[i] = index.get(args[i],len(kinds) - 1)
+
+        self.kinds  = kinds
+        self.args   = args
+        self.counts = counts
+        self.starts = starts
+        self.index  = index
+
+    def __loops(self):
+        """
+        Check that jumps are structured and nested at most MAX_DEPTH levels
+
+        Returns: Dictionary which maps the index of [ to the index of ] (None if jumps
+        aren't structured)
+        """
+        kinds = self.kinds
+        args  = self.args
+        loops = {}
+        stack = []
+        for i,kind in enumerate(kinds):
+            if kind == BFastModel.JZ:
+                stack.append(i)
+                if len(stack) > BFastModel.MAX_DEPTH:
+                    return None
+            elif kind == BFastModel.JNZ:
+                if len(stack) == 0:
+                    return None
+                b = stack.pop()
+                if args[b] != i + 1 or args[i] != b + 1:
+                    return None
+                loops[b] = i
+        if len(stack) > 0:
+            return None
+        return loops
+
+    def __generate(self):
+        """
+        Translate the program to the Python function run(cells,input iterator,output,ptr,mul,limit)
+        which returns the tuple (state,ptr,mul,steps,pc)
+
+        Returns: Generated function (None if jumps aren't structured)
+        """
+        loops = self.__loops()
+        if loops is None:
+            return None
+        lines = ["def run(c,it,o,p,mul,limit):","    steps = 0"]
+        self.__emit(0,len(self.kinds),loops,lines,"    ")
+        src = "\n".join(lines) + "\n"
+        ns = { "nxt" : next }
+        exec(compile(src,"<bfast>","exec"),ns)
+        return ns["run"]
+
+    def __emit(self,begin,end,loops,lines,ind):
+        """
+        Append lines of fused operations in the range [begin,end) to the list of lines
+
+        Returns: Tuple (pointer offset, steps) which wasn't written to p and steps variables
+        """
+        kinds  = self.kinds
+        args   = self.args
+        counts = self.counts
+        mask   = len(self.cells) - 1
+        off = 0
+        cnt = 0
+        i = begin
+        while i < end:
+            kind = kinds[i]
+            arg  = args[i]
+            pc   = self.starts[i] * BIsa.INST_WIDTH
+            ptr  = "p" if off == 0 else "(p{:+d})&{}".format(off,mask)
+            cell = "c[{}]".format(ptr)
+            if kind == BFastModel.MOVE:
+                off = off + arg
+            elif kind == BFastModel.ADD:
+                lines.append("{}{} = ({} + {}) & 255".format(ind,cell,cell,arg))
+            elif kind == BFastModel.OUT:
+                lines.append("{}o.append({})".format(ind,cell))
+            elif kind == BFastModel.IN:
+                lines.append("{}v = nxt(it,None)".format(ind))
+                lines.append("{}if v is None: return ({!r},{},mul,steps+{},{})".format(ind,BModel.INPUT,ptr,cnt,pc))
+                lines.append("{}{} = v".format(ind,cell))
+            elif kind == BFastModel.CLEAR:
+                lines.append("{}{} = 0".format(ind,cell))
+            elif kind == BFastModel.LOADMUL:
+                lines.append("{}mul = {}".format(ind,cell))
+            elif kind == BFastModel.MULADD:
+                lines.append("{}{} = ({} + mul * {}) & 255".format(ind,cell,cell,arg))
+            elif kind == BFastModel.END:
+                lines.append("{}return ({!r},{},mul,steps+{},{})".format(ind,BModel.TERMINATED,ptr,cnt + counts[i],pc))
+            elif kind == BFastModel.INVALID:
+                lines.append("{}return ({!r},{},mul,steps+{},{})".format(ind,BModel.INVALID,ptr,cnt,pc))
+            elif kind == BFastModel.JZ:
+                # The [ is executed once, the ] in each iteration, the limit is checked on the
+                # iteration end (the run can be resumed behind the [)
+                e = loops[i]
+                self.__flush(off,cnt + counts[i],lines,ind)
+                lines.append("{}while c[p]:".format(ind))
+                boff,bcnt = self.__emit(i + 1,e,loops,lines,ind + "    ")
+                self.__flush(boff,bcnt + counts[e],lines,ind + "    ")
+                lines.append("{}    if steps >= limit: return ({!r},p,mul,steps,{})".format(ind,BModel.LIMIT,self.starts[i + 1] * BIsa.INST_WIDTH))
+                off = 0
+                cnt = 0
+                i = e + 1
+                continue
+            cnt = cnt + counts[i]
+            i = i + 1
+        return (off,cnt)
+
+    def __flush(self,off,cnt,lines,ind):
+        """
+        Write the pointer offset and steps to p and steps variables
+        """
+        if off != 0:
+            lines.append("{}p = (p{:+d}) & {}".format(ind,off,len(self.cells) - 1))
+        lines.append("{}steps = steps + {}".format(ind,cnt))
+
+    def run(self,inp=b"",max_steps=10**7):
+        """
+        Run the program until it terminates, waits for the unavailable input or the
+        step limit is reached (see BModel.run). The generated function is used on the
+        start of the program, the resumed run is executed over fused operations.
+
+        Returns: Final state (see BModel states)
+        """
+        if self.codegen and self.pc == 0 and self.steps == 0:
+            if self.func is None:
+                self.func = self.__generate()
+                self.codegen = self.func is not None
+            if self.func is not None:
+                state,self.ptr,self.mul,steps,self.pc = self.func(self.cells,iter(inp),self.output,self.ptr,self.mul,max_steps)
+                self.steps = self.steps + steps
+                return state
+
+        kinds  = self.kinds
+        args   = self.args
+        counts = self.counts
+        cells  = self.cells
+        out    = self.output
+        mask   = len(cells) - 1
+        inp    = iter(inp)
+        ptr    = self.ptr
+        mul    = self.mul
+        i      = self.index.get(self.pc // BIsa.INST_WIDTH,len(kinds) - 1)
+        steps  = 0
+        state  = BModel.LIMIT
+        while steps < max_steps:
+            kind = kinds[i]
+            if kind == BFastModel.MOVE:
+                ptr = (ptr + args[i]) & mask
+            elif kind == BFastModel.ADD:
+                cells[ptr] = (cells[ptr] + args[i]) & 0xff
+            elif kind == BFastModel.JNZ:
+                if cells[ptr] != 0:
+                    steps = steps + counts[i]
+                    i = args[i]
+                    continue
+            elif kind == BFastModel.JZ:
+                if cells[ptr] == 0:
+                    steps = steps + counts[i]
+                    i = args[i]
+                    continue
+            elif kind == BFastModel.OUT:
+                out.append(cells[ptr])
+            elif kind == BFastModel.IN:
+                val = next(inp,None)
+                if val is None:
+                    state = BModel.INPUT
+                    break
+                cells[ptr] = val
+            elif kind == BFastModel.CLEAR:
+                cells[ptr] = 0
+            elif kind == BFastModel.LOADMUL:
+                mul = cells[ptr]
+            elif kind == BFastModel.MULADD:
+                cells[ptr] = (cells[ptr] + mul * args[i]) & 0xff
+            elif kind == BFastModel.END:
+                steps = steps + counts[i]
+                state = BModel.TERMINATED
+                break
+            elif kind == BFastModel.INVALID:
+                state = BModel.INVALID
+                break
+            steps = steps + counts[i]
+            i = i + 1
+
+        self.ptr   = ptr
+        self.mul   = mul
+        self.pc    = self.starts[i] * BIsa.INST_WIDTH
+        self.steps = self.steps + steps
+        return state
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+from .isa import BIsa
+
+class BIdioms(object):
+    """
+    Recognition of simple loop idioms in the stream of symbols (tuples (symbol, line, column)
+    as they are returned from the lexer). The simple loop contains pointer and data symbols
+    only, the pointer is the same at the start and the end of the body and the current cell
+    is changed by one in each iteration. Such loop is lowered to idiom instructions (see
+    BIsa.IDIOM_INSTRUCTIONS) which run in the constant time:
+
+        * clear - [-] is lowered to z
+        * move - [->+<] is lowered to m>*<z
+        * multiply - [->++>+++<<] is lowered to m>**>***<<z (the * is the factor of the
+            multiply-add, runs are encoded to one instruction)
+
+    The multiplier register is loaded with the current cell value and multiply-add
+    instructions are executed on target cells. The result is the same if the current
+    cell is zero (the loop isn't executed). Other loops are left without changes.
+
+    Brief usage:
+        * idioms = BIdioms(False)
+        * tokens = idioms.run(tokens)
+        * for line in idioms.report(): print(line)
+    """
+
+    # Recognized idioms
+    KINDS = ["clear","move","multiply"]
+
+    # Symbols which are allowed inside the body of the simple loop
+    BODY_SYMS = ["+","-",">","<"]
+
+    # Width of the cell (multiply-add factors are computed modulo the cell size)
+    CELL_SIZE = 2**8
+
+    def __init__(self,debug):
+        """
+        Initialization of the idiom recognition
+
+        Parameters:
+            - debug - debug is enabled (bool)
+        """
+        self.debug = debug
+        # Statistics - number of lowered loops of each kind, number of symbols of
+        # lowered loops and number of generated symbols
+        self.stats = { kind : 0 for kind in BIdioms.KINDS }
+        self.loop_syms = 0
+        self.idiom_syms = 0
+
+    def run(self,tokens):
+        """
+        Generator which lowers simple loops in the stream of tokens. Tokens of the loop
+        body are buffered until the loop is closed or the symbol which isn't allowed in
+        the simple loop is detected.
+        """
+        pending = None
+        for tok in tokens:
+            sym = tok[0]
+            if pending is not None:
+                if sym in BIdioms.BODY_SYMS:
+                    pending.append(tok)
+                    continue
+
+                lowered = self.__lower(pending) if BIsa.is_ejump(sym) else None
+                if lowered is not None:
+                    self.loop_syms  = self.loop_syms + len(pending) + 1
+                    self.idiom_syms = self.idiom_syms + len(lowered)
+                    for ltok in lowered:
+                        yield ltok
+                    pending = None
+                    continue
+
+                # The loop isn't simple, the current symbol is processed as usual
+                for ptok in pending:
+                    yield ptok
+                pending = None
+
+            if BIsa.is_bjump(sym):
+                pending = [tok]
+                continue
+
+            yield tok
+
+        if pending is not None:
+            for ptok in pending:
+                yield ptok
+
+    def __lower(self,loop):
+        """
+        Lower the simple loop to idiom instructions. The loop is the list of tokens
+        of the [ and the loop body. Generated tokens have the position of the [.
+
+        Returns: List of generated tokens (None if the loop isn't the idiom)
+        """
+        # Compute the change of each cell (relative to the current cell) in one iteration
+        ptr   = 0
+        delta = {}
+        for sym,_,_ in loop[1:]:
+            if sym == ">":
+                ptr = ptr + 1
+            elif sym == "<":
+                ptr = ptr - 1
+            elif sym == "+":
+                delta[ptr] = delta.get(ptr,0) + 1
+            else:
+                delta[ptr] = delta.get(ptr,0) - 1
+
+        if ptr != 0:
+            return None
+
+        # The loop is executed cell times if the current cell is decremented, 256 - cell
+        # times if it is incremented (factors are negated)
+        step = delta.get(0,0) % BIdioms.CELL_SIZE
+        if step == BIdioms.CELL_SIZE - 1:
+            sign = 1
+        elif step == 1:
+            sign = -1
+        else:
+            return None
+
+        factors = {}
+        for off,val in delta.items():
+            factor = (sign * val) % BIdioms.CELL_SIZE
+            if off != 0 and factor != 0:
+                factors[off] = factor
+
+        # Visit targets on the left side (from the nearest one) and then targets on the right side
+        _,line,col = loop[0]
+        ret = []
+        ptr = 0
+        targets = sorted((off for off in factors if off < 0),reverse=True) + sorted(off for off in factors if off > 0)
+        if len(targets) > 0:
+            ret.append(("m",line,col))
+        for off in targets:
+            ret.extend(self.__move(off - ptr,line,col))
+            ret.append(("*" * factors[off],line,col))
+            ptr = off
+        ret.extend(self.__move(-ptr,line,col))
+        ret.append(("z",line,col))
+
+        if len(factors) == 0:
+            kind = "clear"
+        elif all(factor == 1 for factor in factors.values()):
+            kind = "move"
+        else:
+            kind = "multiply"
+        self.stats[kind] = self.stats[kind] + 1
+        if self.debug:
+            print("Idioms: {} loop at line {}, column {} lowered to {}".format(kind,line,col,"".join(t[0] for t in ret)))
+
+        return ret
+
+    @staticmethod
+    def __move(dist,line,col):
+        """
+        Return the list of pointer symbols which move the pointer by dist cells
+        """
+        sym = ">" if dist > 0 else "<"
+        return [(sym,line,col)] * abs(dist)
+
+    def report(self):
+        """
+        Return the list of lines with the idiom statistics
+        """
+        loops = ", ".join("{} {}".format(self.stats[kind],kind) for kind in BIdioms.KINDS)
+        return ["Idiom summary: lowered loops - {} ({} loop symbols replaced by {} symbols)".format(loops,self.loop_syms,self.idiom_syms)]
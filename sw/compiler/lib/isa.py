@@ -8,8 +8,6 @@
 #  WEBSITE: https://github.com/benycze/fpga-brainfuck/
 # -------------------------------------------------------------------------------
 
-import pdb
-
 class BIsa(object):
     """
     Object with better work with BCPU ISA
@@ -33,8 +31,62 @@ class BIsa(object):
         "]" : (0x8)  << 12,     # 0x8000
         "x" : (0x9)  << 12,     # 0x9000
         "&" : (0xa)  << 12,     # 0xA000 
+        "z" : (0xb)  << 12,     # 0xB000
+        "m" : (0xc)  << 12,     # 0xC000
+        "*" : (0xd)  << 12,     # 0xD000
     }
 
+    # Reverse table - translation of the opcode (4 MSB bits of the
+    # instruction) back to the symbol
+    OPCODE_TABLE = { (code >> 12) : sym for sym,code in ISA_TABLE.items() }
+
+    # Width of the instruction argument (jump value) in bits and
+    # the maximal argument value
+    ARG_WIDTH   = 12
+    ARG_MAX     = 2**ARG_WIDTH - 1
+
+    # Run-length encoded instructions - the argument holds the number of operations (the
+    # zero argument is one operation, the plain encoding is therefore still valid)
+    RUN_INSTRUCTIONS = ["+","-",">","<"]
+
+    # Loop idiom instructions - clear of the cell (z), load of the multiplier register from
+    # the cell (m) and multiply-add of the multiplier to the cell (*). The argument of the
+    # multiply-add is the factor (computed modulo the cell width, zero is the factor one).
+    # Instructions are generated by the compiler only, they are not allowed in the source code.
+    IDIOM_INSTRUCTIONS = ["z","m","*"]
+
+    # Instructions with the count (run length or factor) in the argument
+    COUNT_INSTRUCTIONS = RUN_INSTRUCTIONS + ["*"]
+
+    # Static cost model of the BCPU pipeline (used for estimates only). Every instruction
+    # takes one cycle in the execution stage. Instructions which redirect the PC from the
+    # stage 3 (pointer change, preload, I/O and taken jumps) flush the pipeline, the next
+    # instruction needs to be fetched again - instruction memory read (2 cycles), I/O barrier,
+    # decode & cell memory read (2 cycles) and the execution stage.
+    FLUSH_PENALTY = 7
+
+    # Instructions which always flush the pipeline (jumps flush it iff they are taken)
+    FLUSH_INSTRUCTIONS = [">","<",".",",","&"]
+
+    # Hazard model of the cell register (regCellData in the BCPU core). Jumps are evaluated in
+    # the stage 3 and they are safe iff the cell register holds a valid value of the current cell.
+    # The register is valid after instructions which write it (data change, input, preload, clear
+    # and multiply-add), it is invalidated by the write-back during the pointer change. Other
+    # instructions (no-op, output, multiplier load and jumps) keep the register untouched.
+    CELL_REG_VALID   = ["+","-",",","&","z","*"]
+    CELL_REG_INVALID = [">","<"]
+
+    @staticmethod
+    def inst_cycles(sym,taken=False):
+        """
+        Return the estimated number of cycles of one executed instruction. The taken
+        parameter is used for jump instructions only.
+        """
+        if sym in BIsa.FLUSH_INSTRUCTIONS or (taken and BIsa.is_jump_instruction(sym)):
+            return 1 + BIsa.FLUSH_PENALTY
+
+        return 1
+
     @staticmethod
     def contains(sym):
         """
@@ -59,21 +111,21 @@ class BIsa(object):
         """
         The jump is the  [
         """
-        return sym is "["
+        return sym == "["
 
     @staticmethod
     def is_ejump(sym):
         """
         The jump is "]"
         """
-        return sym is "]"
+        return sym == "]"
 
     @staticmethod
     def is_body_instruction(sym):
         """
         Returns true iff we are working with a body instructino
         """
-        if sym in [";",">","<","+","-",".",",","x","&"]:
+        if sym in [";",">","<","+","-",".",",","x","&","z","m","*"]:
             return True
             
         return False
@@ -87,34 +139,85 @@ class BIsa(object):
         return ret
 
     @staticmethod
-    def translate_inst(sym):
+    def encode_inst(sym):
         """
-        Translate the non-jump instruction
+        Encode the non-jump instruction to the 16-bit instruction word
         """
         # Check the instruction
         if not(BIsa.is_body_instruction(sym)):
-            raise ValueError("Invalid body instruction - {} was received".foramt(sym))
-        # Return the translated instruction
-        inst = BIsa.ISA_TABLE[sym]
-        return BIsa.__dump_to_bytes(inst)
+            raise ValueError("Invalid body instruction - {} was received".format(sym))
+        return BIsa.ISA_TABLE[sym]
 
     @staticmethod
-    def translate_jump(sym,val):
+    def encode_jump(sym,val):
         """
-        Translate the jump instruction with a given
-        jump value.
+        Encode the jump instruction with a given jump value to the 
+        16-bit instruction word
         """
         # Check the instruction 
         if not(BIsa.is_jump_instruction(sym)):
             raise ValueError("Invalid jump instruction - {} was received.".format(sym))
 
-        # The jump value is one byte
-        if val < 0 or val > (2**12 - 1):
+        # The jump value is 12 bits
+        if val < 0 or val > BIsa.ARG_MAX:
             raise ValueError("Bad jump value insturction")
-        
-        # Prepare the jump - convert to bytes
-        inst = BIsa.ISA_TABLE[sym] | val
-        return BIsa.__dump_to_bytes(inst)
+
+        return BIsa.ISA_TABLE[sym] | val
+
+    @staticmethod
+    def encode_run(sym,count):
+        """
+        Encode the run of count pointer or data instructions (or the multiply-add with
+        the factor count) to the 16-bit instruction word (the run of one instruction has
+        the plain encoding)
+        """
+        if sym not in BIsa.COUNT_INSTRUCTIONS:
+            raise ValueError("Invalid run-length instruction - {} was received".format(sym))
+
+        if count < 1 or count > BIsa.ARG_MAX:
+            raise ValueError("Bad run length of the instruction")
+
+        if count == 1:
+            return BIsa.ISA_TABLE[sym]
+        return BIsa.ISA_TABLE[sym] | count
+
+    @staticmethod
+    def get_run_length(word):
+        """
+        Return the number of operations of the pointer or data instruction word (or the
+        factor of the multiply-add)
+        """
+        return max(1,word & BIsa.ARG_MAX)
+
+    @staticmethod
+    def translate_inst(sym):
+        """
+        Translate the non-jump instruction
+        """
+        return BIsa.__dump_to_bytes(BIsa.encode_inst(sym))
+
+    @staticmethod
+    def translate_jump(sym,val):
+        """
+        Translate the jump instruction with a given
+        jump value.
+        """
+        return BIsa.__dump_to_bytes(BIsa.encode_jump(sym,val))
+
+    @staticmethod
+    def get_symbol(word):
+        """
+        Return the symbol of the 16-bit instruction word (None
+        if the opcode is unknown)
+        """
+        return BIsa.OPCODE_TABLE.get(word >> BIsa.ARG_WIDTH)
+
+    @staticmethod
+    def get_word_argument(word):
+        """
+        Return the argument value of the 16-bit instruction word
+        """
+        return word & BIsa.ARG_MAX
 
     @staticmethod
     def get_instruction_argument(inst):
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import re
+from .isa import BIsa
+from .error import BTranslationError
+
+class BLexer(object):
+    """
+    Streaming lexer of the Brainfuck source code.
+
+    The input is read in large blocks and each block is processed line by line
+    using the string methods (which are implemented in C) instead of the char by
+    char processing. Lines (and comments) are allowed to cross the block boundary,
+    the lexer remembers the state between two blocks. The time of the lexing is
+    therefore linear to the size of the input, even for megabytes of code
+    on a single line.
+
+    Brief usage:
+        * lex = BLexer(open("file.b"),False)
+        * for sym,line,column in lex.tokens(): ...
+    """
+
+    # Number of characters read from the input at once
+    BLOCK_SIZE = 2**16
+
+    # Any character which is not a white space nor the translatable symbol
+    # is an error (idiom instructions are generated by the compiler only). The
+    # comment start symbol / is handled separately.
+    INVALID_RE = re.compile(r"[^\s" + re.escape("".join(sym for sym in BIsa.ISA_TABLE.keys()
+        if sym not in BIsa.IDIOM_INSTRUCTIONS)) + r"]")
+
+    # Non-white characters - used for the column computation if
+    # the code segment contains any white space
+    SYMBOL_RE = re.compile(r"\S")
+
+    def __init__(self,inf,debug,block_size=BLOCK_SIZE):
+        """
+        Initialization of the lexer
+
+        Parameters:
+            - inf - opened input (any object with the read(size) method returning a string)
+            - debug - debug is enabled (bool)
+            - block_size - number of characters read at once
+        """
+        self.inf        = inf
+        self.debug      = debug
+        self.block_size = block_size
+        # Current line and number of processed characters on the line
+        self.line       = 1
+        self.column     = 0
+        # Cross-block state - comment is being processed, column of the
+        # first comment slash which is waiting for the second one
+        self.in_comment = False
+        self.slash_col  = None
+        self.comment    = []
+
+    def tokens(self):
+        """
+        Generator of symbols from the input, comments and white spaces
+        are skipped.
+
+        Returns: Tuples (symbol, line, column), the column is indexed from 1
+        """
+        while True:
+            block = self.inf.read(self.block_size)
+            if block == '':
+                break
+
+            # Process the block line by line, the last segment doesn't have
+            # to be terminated by the new line (it continues in the next block)
+            start = 0
+            while True:
+                nl = block.find('\n',start)
+                end = len(block) if nl < 0 else nl
+                syms,cols = self.__lex_segment(block[start:end])
+                line = self.line
+                for sym,col in zip(syms,cols):
+                    if self.debug:
+                        print("Lexer: Parser symbol => {}".format(sym))
+                    yield (sym,line,col)
+
+                if nl < 0:
+                    break
+
+                self.__new_line()
+                start = nl + 1
+
+        # We are done, check that nothing is left
+        self.__new_line()
+
+    def __new_line(self):
+        """
+        Finish the current line and move to the next one
+        """
+        if self.slash_col is not None:
+            raise BTranslationError("Expecting / symbol",self.line,self.slash_col + 1)
+
+        if self.in_comment:
+            if self.debug:
+                print("Lexer: Parsed comment => {}".format("".join(self.comment)))
+            self.in_comment = False
+            self.comment    = []
+
+        self.line   = self.line + 1
+        self.column = 0
+
+    def __lex_segment(self,seg):
+        """
+        Process the part of the line (without the new line character)
+
+        Returns: Tuple (symbols, columns) where symbols is a string of detected
+        symbols and columns is the sequence of their columns
+        """
+        col_base    = self.column
+        self.column = self.column + len(seg)
+        pos         = 0
+
+        # The comment start was splitted between two blocks
+        if self.slash_col is not None:
+            if seg[:1] != '/':
+                raise BTranslationError("Expecting / symbol",self.line,col_base + 1)
+            self.slash_col  = None
+            self.in_comment = True
+            pos = 1
+
+        # We are inside the comment which ends on the end of line
+        if self.in_comment:
+            if self.debug:
+                self.comment.append(seg[pos:])
+            return ('',())
+
+        # Split the segment to the code and (possible) comment part
+        cmt_idx = seg.find('/',pos)
+        code = seg[pos:] if cmt_idx < 0 else seg[pos:cmt_idx]
+        code_base = col_base + pos
+
+        # Check that we have allowed symbols only
+        invalid = BLexer.INVALID_RE.search(code)
+        if invalid is not None:
+            raise BTranslationError("Uknown symbol was detected",self.line,code_base + invalid.start() + 1)
+
+        # Filter out all white spaces, the column is computed from the position inside
+        # the segment. We don't need to search for symbols if there is no white space.
+        syms = "".join(code.split())
+        if len(syms) == len(code):
+            cols = range(code_base + 1, code_base + len(code) + 1)
+        else:
+            cols = [code_base + m.start() + 1 for m in BLexer.SYMBOL_RE.finditer(code)]
+
+        # Start the comment processing if it was detected
+        if cmt_idx >= 0:
+            if cmt_idx + 1 == len(seg):
+                # The second slash can be in the next block
+                self.slash_col = col_base + cmt_idx + 1
+            elif seg[cmt_idx + 1] != '/':
+                raise BTranslationError("Expecting / symbol",self.line,col_base + cmt_idx + 2)
+            else:
+                self.in_comment = True
+                if self.debug:
+                    self.comment.append(seg[cmt_idx+2:])
+
+        return (syms,cols)
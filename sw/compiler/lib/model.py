@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import sys
+from array import array
+from .isa import BIsa
+from .lexer import BLexer
+
+class BModel(object):
+    """
+    Functional (instruction level) reference model of the BCPU. The model executes
+    instruction words of the translated program with the same semantics as the BCPU
+    core - run-length encoded pointer and data instructions, idiom instructions (clear,
+    multiplier load and multiply-add), relative jumps, the cell pointer wraps inside the
+    cell memory and cells are 8-bit values.
+
+    Brief usage:
+        * model = BModel(prog.words)
+        * state = model.run(b"input data")
+        * model.cells, model.output, model.ptr ...
+    """
+
+    # Size of the cell memory (14-bit cell address)
+    CELLS = 2**14
+
+    # Final states of the run - the program end was reached (x), the input is required
+    # but no input is available, the step limit was reached, unknown instruction was detected
+    TERMINATED = "terminated"
+    INPUT      = "input"
+    LIMIT      = "limit"
+    INVALID    = "invalid"
+
+    def __init__(self,words,cells=CELLS):
+        """
+        Initialization of the model
+
+        Parameters:
+            - words - instruction words of the program (sequence of 16-bit integers)
+            - cells - size of the cell memory
+        """
+        self.words  = words
+        self.cells  = bytearray(cells)
+        self.ptr    = 0
+        self.pc     = 0
+        self.mul    = 0
+        self.steps  = 0
+        self.output = bytearray()
+
+    @classmethod
+    def from_image(cls,data,cells=CELLS):
+        """
+        Create the model of the binary image (big-endian instruction words)
+        """
+        words = array('H')
+        words.frombytes(bytes(data))
+        if sys.byteorder == 'little':
+            words.byteswap()
+        return cls(words,cells)
+
+    def run(self,inp=b"",max_steps=10**7):
+        """
+        Run the program until it terminates, waits for the unavailable input or the
+        step limit (number of executed instructions) is reached
+
+        Returns: Final state (see TERMINATED, INPUT, LIMIT and INVALID)
+        """
+        words = self.words
+        cells = self.cells
+        mask  = len(cells) - 1
+        inp   = iter(inp)
+        ptr   = self.ptr
+        mul   = self.mul
+        idx   = self.pc // BIsa.INST_WIDTH
+        steps = 0
+        state = BModel.LIMIT
+        while steps < max_steps:
+            word = words[idx]
+            op   = word >> BIsa.ARG_WIDTH
+            arg  = word & BIsa.ARG_MAX
+            steps = steps + 1
+            if op == 0x1:
+                ptr = (ptr + max(1,arg)) & mask
+            elif op == 0x2:
+                ptr = (ptr - max(1,arg)) & mask
+            elif op == 0x3:
+                cells[ptr] = (cells[ptr] + max(1,arg)) & 0xff
+            elif op == 0x4:
+                cells[ptr] = (cells[ptr] - max(1,arg)) & 0xff
+            elif op == 0x5:
+                self.output.append(cells[ptr])
+            elif op == 0x6:
+                val = next(inp,None)
+                if val is None:
+                    steps = steps - 1
+                    state = BModel.INPUT
+                    break
+                cells[ptr] = val
+            elif op == 0x7:
+                if cells[ptr] == 0:
+                    idx = idx + arg // BIsa.INST_WIDTH
+                    continue
+            elif op == 0x8:
+                if cells[ptr] != 0:
+                    idx = idx - arg // BIsa.INST_WIDTH
+                    continue
+            elif op == 0x9:
+                state = BModel.TERMINATED
+                break
+            elif op == 0xb:
+                cells[ptr] = 0
+            elif op == 0xc:
+                mul = cells[ptr]
+            elif op == 0xd:
+                cells[ptr] = (cells[ptr] + mul * max(1,arg)) & 0xff
+            elif op > 0xd:
+                steps = steps - 1
+                state = BModel.INVALID
+                break
+            idx = idx + 1
+
+        self.ptr   = ptr
+        self.mul   = mul
+        self.pc    = idx * BIsa.INST_WIDTH
+        self.steps = self.steps + steps
+        return state
+
+class BSourceModel(object):
+    """
+    Reference interpreter of the Brainfuck source code with the BCPU memory model
+    (used to check the translated program against its source)
+
+    Brief usage:
+        * model = BSourceModel(open("file.b"))
+        * state = model.run(b"input data") - states are the same as in BModel
+    """
+
+    def __init__(self,inf,cells=BModel.CELLS):
+        """
+        Initialization of the model
+
+        Parameters:
+            - inf - opened input (any object with the read(size) method returning a string)
+            - cells - size of the cell memory
+        """
+        self.code   = "".join(sym for sym,_,_ in BLexer(inf,False).tokens())
+        self.cells  = bytearray(cells)
+        self.ptr    = 0
+        self.pc     = 0
+        self.steps  = 0
+        self.output = bytearray()
+        # Jump table - index of the corresponding bracket
+        self.jumps  = [0] * len(self.code)
+        stack = []
+        for i,sym in enumerate(self.code):
+            if sym == "[":
+                stack.append(i)
+            elif sym == "]":
+                j = stack.pop()
+                self.jumps[i] = j
+                self.jumps[j] = i
+
+    def run(self,inp=b"",max_steps=10**7):
+        """
+        Run the program (see BModel.run), the step is one source symbol
+
+        Returns: Final state (see BModel states)
+        """
+        code  = self.code
+        jumps = self.jumps
+        cells = self.cells
+        mask  = len(cells) - 1
+        inp   = iter(inp)
+        ptr   = self.ptr
+        pc    = self.pc
+        steps = 0
+        state = BModel.LIMIT
+        while steps < max_steps:
+            if pc >= len(code):
+                state = BModel.TERMINATED
+                break
+            sym = code[pc]
+            steps = steps + 1
+            if sym == ">":
+                ptr = (ptr + 1) & mask
+            elif sym == "<":
+                ptr = (ptr - 1) & mask
+            elif sym == "+":
+                cells[ptr] = (cells[ptr] + 1) & 0xff
+            elif sym == "-":
+                cells[ptr] = (cells[ptr] - 1) & 0xff
+            elif sym == ".":
+                self.output.append(cells[ptr])
+            elif sym == ",":
+                val = next(inp,None)
+                if val is None:
+                    steps = steps - 1
+                    state = BModel.INPUT
+                    break
+                cells[ptr] = val
+            elif sym == "[":
+                if cells[ptr] == 0:
+                    pc = jumps[pc]
+            elif sym == "]":
+                if cells[ptr] != 0:
+                    pc = jumps[pc]
+            elif sym == "x":
+                state = BModel.TERMINATED
+                break
+            pc = pc + 1
+
+        self.ptr   = ptr
+        self.pc    = pc
+        self.steps = self.steps + steps
+        return state
+
+def check_equivalence(source,words,inp=b"",max_steps=10**7):
+    """
+    Run the source code and the translated program on the same input and compare the
+    output, the cell memory and the cell pointer
+
+    Parameters:
+        - source - opened source code (see BSourceModel)
+        - words - instruction words of the translated program (or BModel of the program)
+        - inp - input data (bytes)
+        - max_steps - step limit of the source code interpreter
+
+    The translated program is executed in the functional model (BModel semantics - one
+    input byte per executed ,). The cycle-accurate BPipelineModel follows bcore.bsv where
+    the , behind the pipeline flush (e.g. >,) takes one more input byte, such programs
+    pass the check but they behave differently on the BCPU.
+
+    Returns: Tuple (result, message) where result is True (equivalent), False (different)
+    or None (the source program doesn't stop in the step limit)
+    """
+    ref = BSourceModel(source)
+    ref_state = ref.run(inp,max_steps)
+    if ref_state == BModel.LIMIT:
+        return (None,"source program doesn't stop in {} steps".format(max_steps))
+
+    # Each source symbol is translated at most to one instruction with the jump padding,
+    # relaxation trampolines are added to long jumps
+    model = words if isinstance(words,BModel) else BModel(words)
+    state = model.run(inp,4*ref.steps + len(model.words) + 3)
+    if state != ref_state:
+        return (False,"final state differs - {} (expected {})".format(state,ref_state))
+    if model.output != ref.output:
+        return (False,"output differs")
+    if model.ptr != ref.ptr:
+        return (False,"cell pointer differs - 0x{:x} (expected 0x{:x})".format(model.ptr,ref.ptr))
+    if model.cells != ref.cells:
+        addr = next(i for i in range(len(ref.cells)) if model.cells[i] != ref.cells[i])
+        return (False,"cell 0x{:x} differs - 0x{:x} (expected 0x{:x})".format(addr,model.cells[addr],ref.cells[addr]))
+    return (True,"{} source steps, {} instructions executed".format(ref.steps,model.steps))
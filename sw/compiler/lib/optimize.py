@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+from .isa import BIsa
+
+class BOptimizer(object):
+    """
+    Optimization passes which are running over the stream of symbols between
+    the lexer and the BCPU code generation. Each symbol is a tuple (symbol, line, column)
+    as it is returned from the lexer.
+
+    Supported passes:
+        * cancel - remove adjacent +- and <> pairs (in any order)
+        * dead-loops - remove loops which can't be executed (the current cell is zero) -
+            loops at the beginning of the program and loops following another loop
+        * trailing-nops - remove no-operations (; and &) before the program termination
+
+    Brief usage:
+        * opt = BOptimizer(["cancel","dead-loops"],False)
+        * tokens = opt.run(lexer.tokens())
+        * for line in opt.report(): print(line)
+    """
+
+    # List of passes in the order of execution
+    PASSES = ["cancel","dead-loops","trailing-nops"]
+
+    # Pairs of symbols which are cancelling each other
+    INVERSE_SYMS = { "+" : "-", "-" : "+", ">" : "<", "<" : ">" }
+
+    # Symbols which don't have any effect to the program state
+    NOP_SYMS = [";","&"]
+
+    def __init__(self,passes,debug):
+        """
+        Initialization of the optimizer
+
+        Parameters:
+            - passes - list of enabled pass names (see PASSES)
+            - debug - debug is enabled (bool)
+        """
+        for name in passes:
+            if name not in BOptimizer.PASSES:
+                raise ValueError("Unknown optimization pass {} (available: {}).".format(name,", ".join(BOptimizer.PASSES)))
+
+        self.debug  = debug
+        self.passes = [name for name in BOptimizer.PASSES if name in passes]
+        self.pass_impl = {
+            "cancel"        : self.__cancel_pairs,
+            "dead-loops"    : self.__remove_dead_loops,
+            "trailing-nops" : self.__remove_trailing_nops
+        }
+        # Statistics - pass name -> [removed instructions, estimated cycles]
+        self.stats = { name : [0,0] for name in self.passes }
+
+    def strip_eof_nop(self):
+        """
+        Returns true iff the no-operation which is inserted by the translator
+        at the end of the program can be omitted
+        """
+        return "trailing-nops" in self.passes
+
+    def run(self,tokens):
+        """
+        Run all enabled passes, passes are repeated while any of them
+        changes the code.
+
+        Returns: Optimized list of tokens
+        """
+        tokens = list(tokens)
+        changed = True
+        while changed:
+            changed = False
+            for name in self.passes:
+                new_tokens = self.pass_impl[name](tokens)
+                if len(new_tokens) != len(tokens):
+                    changed = True
+                    if self.debug:
+                        print("Optimizer: pass {} removed {} symbols".format(name,len(tokens) - len(new_tokens)))
+                tokens = new_tokens
+
+        if self.strip_eof_nop():
+            self.__account("trailing-nops",*BOptimizer.sym_cost(";"))
+
+        return tokens
+
+    def report(self):
+        """
+        Return the list of lines with the optimization statistics
+        """
+        ret = []
+        total_inst   = 0
+        total_cycles = 0
+        for name in self.passes:
+            inst,cycles = self.stats[name]
+            total_inst   = total_inst + inst
+            total_cycles = total_cycles + cycles
+            ret.append(" * {} - removed {} instructions, ~{} cycles".format(name,inst,cycles))
+
+        ret.append(" * total - removed {} instructions, ~{} cycles (each removed instruction counted once)".format(total_inst,total_cycles))
+        return ret
+
+    @staticmethod
+    def sym_cost(sym,taken=False):
+        """
+        Return the number of instructions and estimated cycles of one executed
+        symbol. Jumps are translated to three instructions (two padding instructions
+        and the jump).
+
+        Returns: Tuple (instructions, cycles)
+        """
+        if BIsa.is_jump_instruction(sym):
+            return (3, BIsa.inst_cycles("&") + BIsa.inst_cycles(";") + BIsa.inst_cycles(sym,taken))
+
+        return (1, BIsa.inst_cycles(sym))
+
+    def __account(self,name,inst,cycles):
+        """
+        Add removed instructions and saved cycles into the pass statistics
+        """
+        stat = self.stats[name]
+        stat[0] = stat[0] + inst
+        stat[1] = stat[1] + cycles
+
+    def __cancel_pairs(self,tokens):
+        """
+        Remove adjacent pairs of symbols which are cancelling each other. The
+        output is used as the stack, therefore +<>- is also removed.
+        """
+        ret = []
+        for tok in tokens:
+            if len(ret) > 0 and BOptimizer.INVERSE_SYMS.get(tok[0]) == ret[-1][0]:
+                self.__account("cancel",*BOptimizer.sym_cost(ret.pop()[0]))
+                self.__account("cancel",*BOptimizer.sym_cost(tok[0]))
+                continue
+            ret.append(tok)
+
+        return ret
+
+    def __remove_dead_loops(self,tokens):
+        """
+        Remove loops which are never executed because the current cell is zero.
+        That is true at the beginning of the program (all cells are zero until
+        the first modification) and after the end of any loop.
+        """
+        # Find pairs of loops, unbalanced programs are left without changes (the
+        # translator reports the error)
+        match = {}
+        stack = []
+        for idx,tok in enumerate(tokens):
+            if BIsa.is_bjump(tok[0]):
+                stack.append(idx)
+            elif BIsa.is_ejump(tok[0]):
+                if len(stack) == 0:
+                    return tokens
+                match[stack.pop()] = idx
+
+        if len(stack) > 0:
+            return tokens
+
+        ret = []
+        cell_zero = True
+        all_zero  = True
+        idx = 0
+        while idx < len(tokens):
+            tok = tokens[idx]
+            sym = tok[0]
+            if BIsa.is_bjump(sym) and cell_zero:
+                # Only the [ is executed (and taken), the rest of the loop is skipped
+                end  = match[idx]
+                inst = sum(BOptimizer.sym_cost(t[0])[0] for t in tokens[idx:end+1])
+                self.__account("dead-loops",inst,BOptimizer.sym_cost(sym,True)[1])
+                idx = end + 1
+                continue
+
+            ret.append(tok)
+            idx = idx + 1
+            if sym in ["+","-",","]:
+                cell_zero = False
+                all_zero  = False
+            elif sym in [">","<"]:
+                cell_zero = all_zero
+            elif BIsa.is_bjump(sym):
+                cell_zero = False
+            elif BIsa.is_ejump(sym):
+                cell_zero = True
+
+        return ret
+
+    def __remove_trailing_nops(self,tokens):
+        """
+        Remove no-operations before the program termination (x symbol or
+        the end of the program)
+        """
+        ret = []
+        for tok in tokens:
+            if tok[0] == "x":
+                while len(ret) > 0 and ret[-1][0] in BOptimizer.NOP_SYMS:
+                    self.__account("trailing-nops",*BOptimizer.sym_cost(ret.pop()[0]))
+            ret.append(tok)
+
+        while len(ret) > 0 and ret[-1][0] in BOptimizer.NOP_SYMS:
+            self.__account("trailing-nops",*BOptimizer.sym_cost(ret.pop()[0]))
+
+        return ret
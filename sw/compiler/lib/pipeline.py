@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+from collections import deque
+from .isa import BIsa
+from .model import BModel
+
+class BPipelineModel(object):
+    """
+    Cycle-accurate model of the BCPU core (bsv/src/bcore.bsv) with instruction and cell
+    memories. Each call of the clock method is one clock cycle, rules of the core are
+    evaluated in the pipeline order and they see the state from the start of the cycle
+    (like registers and FIFOs in the Bluespec design):
+
+        * ST1 - instruction fetch. The fetch address is the PC or the redirect address
+            from the ST3 (the tag is incremented). The fetched word is visible in the ST2
+            after MEM_LATENCY cycles (BRAM latency + response FIFO).
+        * ST2 I/O barrier - I/O instructions are passed iff the ST3 FIFO is empty.
+        * ST2 decode - instructions with an old tag are dropped, the cell read of the
+            current cell pointer is issued (data are ready after MEM_LATENCY cycles).
+            Tag adjustments from the ST3 block the decode for one cycle.
+        * ST3 execution & write-back - the cell register (regCellData) holds the current
+            cell, it is written back to the cell memory and invalidated on the pointer
+            change (and the program termination). Pointer changes, I/O, preload (&) and
+            taken jumps redirect the fetch and increment the tag (the pipeline flush).
+            The ST3 is stalled while the core waits for input or output.
+
+    FIFOs between stages have FIFO_DEPTH items, input and output FIFOs have IO_FIFO_DEPTH
+    items. The core waits for the input if the input FIFO is empty during the decode of ,
+    and for the output if the output FIFO is full during the decode of . (the output wait
+    ends when the FIFO has a free item). Every enabled cycle is counted, cycles without
+    the executed instruction are counted as stalls (see STALLS).
+
+    The model keeps the I/O behaviour of bcore.bsv which differs from the Brainfuck
+    semantics: the input byte is taken during the decode of , and the I/O barrier checks
+    the ST3 FIFO only. The , directly behind the instruction which flushes the pipeline
+    (pointer change, I/O, preload or taken jump, e.g. >,) can pass the barrier and the
+    decode before that instruction is executed - it takes the input byte, it is squashed
+    in the ST3 and the fetched again , takes the next byte. Outputs of such programs differ
+    from BSourceModel and BModel, bytes taken by squashed reads are counted (lost_inputs).
+
+    Brief usage:
+        * model = BPipelineModel(image)
+        * state = model.run(b"input data") - states are the same as in BModel
+        * model.cycles, model.executed, model.stalls, model.output, model.cells ...
+    """
+
+    # Size of the instruction and cell memory (14-bit address)
+    MEM_SIZE = 2**14
+
+    # Number of cycles between the BRAM read request and data in the FIFO of the next stage
+    MEM_LATENCY = 3
+
+    # Depth of FIFOs between stages (mkFIFOF) and depth of I/O FIFOs (bCoreInoutSize)
+    FIFO_DEPTH    = 2
+    IO_FIFO_DEPTH = 1024
+
+    # Tag counters are 5-bit (BTagWidth)
+    TAG_MASK = 2**5 - 1
+
+    # Stall reasons - no instruction is ready in the ST3 (pipeline refill after the flush
+    # or limited fetch bandwidth), the ST3 dropped the instruction with an old tag, waiting
+    # for input, waiting for output
+    STALLS = ["bubble","squash","input","output"]
+
+    # Instruction opcodes (see BIsa.ISA_TABLE)
+    OP = { sym : code >> BIsa.ARG_WIDTH for sym,code in BIsa.ISA_TABLE.items() }
+
+    def __init__(self,image=b"",cells=None):
+        """
+        Initialization of the model
+
+        Parameters:
+            - image - binary image of the program (bytes, loaded from the address 0)
+            - cells - initial content of the cell memory (bytes, zeros by default)
+        """
+        self.inst  = bytearray(BPipelineModel.MEM_SIZE)
+        self.inst[:len(image)] = image
+        self.cells = bytearray(BPipelineModel.MEM_SIZE)
+        if cells is not None:
+            self.cells[:len(cells)] = cells
+        self.in_fifo  = deque()
+        self.out_fifo = deque()
+        self.output   = bytearray()
+        self.reset()
+
+    def reset(self):
+        """
+        Reset the core - registers and pipeline FIFOs (memories and I/O FIFOs are kept)
+        """
+        self.enabled    = False
+        self.terminated = False
+        self.invalid    = False
+        self.wait_in    = False
+        self.wait_out   = False
+        self.pc         = 0
+        self.cell       = 0
+        self.cell_reg   = None
+        self.mul        = 0
+        self.input_data = 0
+        self.st1_tag    = 0
+        self.st2_tag    = 0
+        self.st3_tag    = 0
+        # Pipeline FIFOs - fetched instructions (PC, tag, word, ready time), barrier output
+        # (PC, tag, word), decoded instructions (PC, tag, opcode, argument, ready time, cell
+        # data), redirect addresses and tag adjustments from the ST3
+        self.st2_fifo   = deque()
+        self.bar_fifo   = deque()
+        self.st3_fifo   = deque()
+        self.pc_fifo    = deque()
+        self.adj_fifo   = deque()
+        # Time (all cycles), enabled cycles, executed instructions and stall cycles
+        self.time       = 0
+        self.cycles     = 0
+        self.executed   = 0
+        self.stalls     = { reason : 0 for reason in BPipelineModel.STALLS }
+        # Input bytes taken by squashed , instructions
+        self.lost_inputs = 0
+
+    def flags(self):
+        """
+        Return flags of the core (bits 1 - 5 of the flag register, see sw/README.md)
+        """
+        return (int(len(self.in_fifo) >= BPipelineModel.IO_FIFO_DEPTH) << 1) | \
+            (int(len(self.out_fifo) >= BPipelineModel.IO_FIFO_DEPTH) << 2) | \
+            (int(self.invalid) << 3) | (int(self.terminated) << 4) | (int(self.wait_in) << 5)
+
+    def clock(self):
+        """
+        Run one clock cycle
+        """
+        now   = self.time
+        mask  = BPipelineModel.MEM_SIZE - 1
+        depth = BPipelineModel.FIFO_DEPTH
+        tmask = BPipelineModel.TAG_MASK
+        self.time = now + 1
+
+        # State from the start of the cycle
+        en     = self.enabled and not(self.terminated) and not(self.invalid)
+        w_in   = self.wait_in
+        w_out  = self.wait_out
+        n_st2  = len(self.st2_fifo)
+        n_bar  = len(self.bar_fifo)
+        n_st3  = len(self.st3_fifo)
+        n_pc   = len(self.pc_fifo)
+        n_adj  = len(self.adj_fifo)
+        # Enqueued items are visible in the next cycle
+        pend     = []
+        take_in  = False
+        take_out = False
+
+        # ST1 - instruction fetch
+        if en and n_st2 < depth:
+            if n_pc > 0:
+                addr = self.pc_fifo.popleft()
+                self.st1_tag = (self.st1_tag + 1) & tmask
+            else:
+                addr = self.pc
+            word = (self.inst[addr] << 8) | self.inst[(addr + 1) & mask]
+            pend.append((self.st2_fifo,(addr,self.st1_tag,word,now + BPipelineModel.MEM_LATENCY)))
+            self.pc = (addr + 2) & mask
+
+        # ST2 - I/O barrier
+        if n_st2 > 0 and self.st2_fifo[0][3] <= now and n_bar < depth:
+            op = self.st2_fifo[0][2] >> BIsa.ARG_WIDTH
+            if not(op == 0x5 or op == 0x6) or n_st3 == 0:
+                addr,tag,word,_ = self.st2_fifo.popleft()
+                pend.append((self.bar_fifo,(addr,tag,word)))
+
+        # ST2 - tag adjustment or decode
+        if n_adj > 0:
+            self.adj_fifo.popleft()
+            self.st2_tag = (self.st2_tag + 1) & tmask
+        elif en and n_bar > 0 and n_st3 < depth:
+            addr,tag,word = self.bar_fifo.popleft()
+            if tag == self.st2_tag:
+                op  = word >> BIsa.ARG_WIDTH
+                arg = word & BIsa.ARG_MAX
+                if op > 0xd:
+                    # Unknown instruction, the core stops in the next cycle
+                    self.invalid = True
+                    op = 0x0
+                take_out = op == 0x5
+                take_in  = op == 0x6
+                pend.append((self.st3_fifo,(addr,tag,op,arg,now + BPipelineModel.MEM_LATENCY,self.cells[self.cell])))
+
+        # ST3 - execution & write-back
+        executed = False
+        squashed = False
+        if en and n_pc < depth and n_adj < depth and not(w_in or w_out) and n_st3 > 0 and self.st3_fifo[0][4] <= now:
+            addr,tag,op,arg,_,mem = self.st3_fifo.popleft()
+            if tag != self.st3_tag:
+                squashed = True
+                if op == 0x6:
+                    self.lost_inputs = self.lost_inputs + 1
+            else:
+                executed = True
+                self.__execute(addr,op,arg,mem,pend)
+
+        # Input/output rules
+        if (w_in or take_in) and len(self.in_fifo) > 0:
+            self.input_data = self.in_fifo.popleft()
+            self.wait_in = False
+        elif not(w_in) and take_in:
+            self.wait_in = True
+
+        if not(w_out) and take_out and len(self.out_fifo) >= BPipelineModel.IO_FIFO_DEPTH:
+            self.wait_out = True
+        elif w_out and len(self.out_fifo) < BPipelineModel.IO_FIFO_DEPTH:
+            self.wait_out = False
+
+        for fifo,item in pend:
+            fifo.append(item)
+
+        # Statistics
+        if en:
+            self.cycles = self.cycles + 1
+            if executed:
+                self.executed = self.executed + 1
+            elif w_in:
+                self.stalls["input"] = self.stalls["input"] + 1
+            elif w_out:
+                self.stalls["output"] = self.stalls["output"] + 1
+            elif squashed:
+                self.stalls["squash"] = self.stalls["squash"] + 1
+            else:
+                self.stalls["bubble"] = self.stalls["bubble"] + 1
+
+    def __execute(self,addr,op,arg,mem,pend):
+        """
+        Execute the instruction in the ST3 (see st3_execution_and_writeback in the BCPU core)
+        """
+        mask = BPipelineModel.MEM_SIZE - 1
+        data = self.cell_reg if self.cell_reg is not None else mem
+        cell = self.cell
+        run  = arg if arg != 0 else 1
+        nxt  = (addr + 2) & mask
+        flush   = False
+        wb_done = False
+        wb_reg  = False
+
+        # Write-back of the cell on the pointer change and the termination
+        if op == 0x1 or op == 0x2 or op == 0x9:
+            self.cells[cell] = data
+            wb_done = True
+
+        if op == 0x1:
+            cell  = (cell + run) & mask
+            flush = True
+        elif op == 0x2:
+            cell  = (cell - run) & mask
+            flush = True
+        elif op == 0x3:
+            data   = (data + run) & 0xff
+            wb_reg = True
+        elif op == 0x4:
+            data   = (data - run) & 0xff
+            wb_reg = True
+        elif op == 0x5:
+            self.out_fifo.append(data)
+            flush = True
+        elif op == 0x6:
+            data   = self.input_data
+            wb_reg = True
+            flush  = True
+        elif op == 0x7:
+            if data == 0:
+                nxt   = (addr + arg) & mask
+                flush = True
+        elif op == 0x8:
+            if data != 0:
+                nxt   = (addr - arg) & mask
+                flush = True
+        elif op == 0x9:
+            self.terminated = True
+        elif op == 0xa:
+            wb_reg = True
+            flush  = True
+        elif op == 0xb:
+            data   = 0
+            wb_reg = True
+        elif op == 0xc:
+            self.mul = data
+        elif op == 0xd:
+            data   = (data + self.mul * run) & 0xff
+            wb_reg = True
+
+        if flush:
+            pend.append((self.pc_fifo,nxt))
+            pend.append((self.adj_fifo,True))
+            self.st3_tag = (self.st3_tag + 1) & BPipelineModel.TAG_MASK
+
+        self.cell = cell
+        if wb_done:
+            self.cell_reg = None
+        elif wb_reg:
+            self.cell_reg = data
+
+    def run(self,inp=b"",max_cycles=10**7):
+        """
+        Enable the core and run the program until it terminates, waits for the unavailable
+        input, detects the invalid instruction or the cycle limit is reached. Input data are
+        pushed to the input FIFO as soon as there is a free item, output data are collected
+        to the output attribute in each cycle.
+
+        Returns: Final state (see BModel states)
+        """
+        inp = iter(inp)
+        pending = next(inp,None)
+        self.enabled = True
+        while True:
+            while pending is not None and len(self.in_fifo) < BPipelineModel.IO_FIFO_DEPTH:
+                self.in_fifo.append(pending)
+                pending = next(inp,None)
+            if self.terminated:
+                return BModel.TERMINATED
+            if self.invalid:
+                return BModel.INVALID
+            if self.wait_in and pending is None and len(self.in_fifo) == 0:
+                return BModel.INPUT
+            if self.cycles >= max_cycles:
+                return BModel.LIMIT
+
+            self.clock()
+            while len(self.out_fifo) > 0:
+                self.output.append(self.out_fifo.popleft())
+
+    def report(self):
+        """
+        Return the list of lines with the cycle statistics
+        """
+        cpi = float(self.cycles) / self.executed if self.executed > 0 else 0.0
+        stalls = ", ".join("{} {}".format(reason,self.stalls[reason]) for reason in BPipelineModel.STALLS)
+        ret = ["Pipeline summary: {} cycles, {} instructions executed (CPI {:.2f}), stall cycles - {}".format(
+            self.cycles,self.executed,cpi,stalls)]
+        if self.lost_inputs > 0:
+            ret.append("Warning: {} input bytes were taken by squashed , instructions (see BPipelineModel)".format(self.lost_inputs))
+        return ret
+
+class BCpuModel(object):
+    """
+    Model of the BCPU address space (bsv/src/bcpu.bsv) around the pipeline model. The
+    memory and register layout is described in sw/README.md:
+
+        * 0x0000 - 0x3FFF - cell memory, 0x4000 - 0x7FFF - instruction memory (memories are
+            accessible iff the CPU is disabled, reads return 0 and writes are ignored otherwise)
+        * 0x8000 - command register (bit 0 - enable, bit 1 - one step)
+        * 0x8001/0x8002 - lower/upper half of the PC (the write of the upper half sets the PC)
+        * 0x8003 - flag register (bit 0 - output data available, other bits see BPipelineModel.flags)
+        * 0x8004 - read the output data/write the input data
+
+    Brief usage:
+        * cpu = BCpuModel()
+        * cpu.write(0x4000,0x30) ... cpu.write(0x8000,1)
+        * cpu.clock(1000); flags = cpu.read(0x8003)
+    """
+
+    # Base addresses of address spaces
+    CELL_BASE = 0x0000
+    INST_BASE = 0x4000
+    REG_BASE  = 0x8000
+
+    def __init__(self):
+        """
+        Initialization of the model (memories are empty)
+        """
+        self.core     = BPipelineModel()
+        self.cmd      = 0
+        self.pc_lsb   = 0
+        self.out_data = None
+
+    def __cpu_enabled(self):
+        return (self.cmd & 0x1) != 0
+
+    def read(self,addr):
+        """
+        Read one byte from the address space
+
+        Returns: Read value (int)
+        """
+        space = addr >> 14
+        off   = addr & (BPipelineModel.MEM_SIZE - 1)
+        core  = self.core
+        if space == 0 or space == 1:
+            if self.__cpu_enabled():
+                return 0
+            return core.cells[off] if space == 0 else core.inst[off]
+        if space == 2:
+            reg = addr & 0xf
+            if reg == 0x0:
+                return self.cmd
+            if reg == 0x1:
+                return core.pc & 0xff
+            if reg == 0x2:
+                return core.pc >> 8
+            if reg == 0x3:
+                return core.flags() | int(self.out_data is not None)
+            if reg == 0x4:
+                data = self.out_data if self.out_data is not None else 0
+                self.out_data = None
+                return data
+        return 0
+
+    def write(self,addr,data):
+        """
+        Write one byte to the address space
+        """
+        space = addr >> 14
+        off   = addr & (BPipelineModel.MEM_SIZE - 1)
+        core  = self.core
+        if space == 0 or space == 1:
+            if not(self.__cpu_enabled()):
+                if space == 0:
+                    core.cells[off] = data
+                else:
+                    core.inst[off] = data
+        elif space == 2:
+            reg = addr & 0xf
+            if reg == 0x0:
+                self.cmd = data
+            elif reg == 0x1:
+                self.pc_lsb = data
+            elif reg == 0x2:
+                core.pc = ((data << 8) | self.pc_lsb) & (BPipelineModel.MEM_SIZE - 1)
+            elif reg == 0x4 and len(core.in_fifo) < BPipelineModel.IO_FIFO_DEPTH:
+                core.in_fifo.append(data)
+
+    def clock(self,cycles=1):
+        """
+        Run the given number of clock cycles. The step bit of the command register enables
+        the core for one cycle.
+        """
+        core = self.core
+        for _ in range(cycles):
+            core.enabled = (self.cmd & 0x3) != 0
+            self.cmd = self.cmd & ~0x2
+            core.clock()
+            if self.out_data is None and len(core.out_fifo) > 0:
+                self.out_data = core.out_fifo.popleft()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import sys
+from array import array
+from .isa import BIsa
+
+class BProgram(object):
+    """
+    Translated BCPU program.
+
+    Instructions are stored as encoded 16-bit instruction words inside one
+    array('H'), the address of the instruction is implied by its position
+    (index * BIsa.INST_WIDTH). The instruction is encoded just once during the
+    translation and all output formats are generated from the same array.
+
+    Brief usage:
+        * prog = BProgram()
+        * idx = prog.append(BIsa.encode_inst("+"))
+        * prog[idx] = BIsa.encode_jump("[",8) - write back the encoded word
+        * prog.image() - binary image which is uploaded to the BCPU
+    """
+
+    def __init__(self):
+        """
+        Initialization of the empty program
+        """
+        self.words = array('H')
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self,idx):
+        return self.words[idx]
+
+    def __setitem__(self,idx,word):
+        self.words[idx] = word
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def append(self,word):
+        """
+        Append the encoded instruction word to the end of the program
+
+        Returns: Index of the instruction
+        """
+        self.words.append(word)
+        return len(self.words) - 1
+
+    @staticmethod
+    def address(idx):
+        """
+        Return the address of the instruction with the given index
+        """
+        return idx * BIsa.INST_WIDTH
+
+    def symbol(self,idx):
+        """
+        Return the symbol of the instruction with the given index
+        """
+        return BIsa.get_symbol(self.words[idx])
+
+    def argument(self,idx):
+        """
+        Return the argument of the instruction with the given index
+        """
+        return BIsa.get_word_argument(self.words[idx])
+
+    def size(self):
+        """
+        Return the size of the program in bytes
+        """
+        return len(self.words) * BIsa.INST_WIDTH
+
+    def image(self):
+        """
+        Return the binary image of the program (instruction words are stored
+        in the big-endian byte order). The returned object supports the buffer
+        protocol.
+
+        The image is a view of the instruction array on big-endian hosts. Little-endian
+        hosts need one byte-swapped copy of the array.
+        """
+        if sys.byteorder == 'big':
+            return memoryview(self.words).cast('B')
+
+        swapped = array('H',self.words)
+        swapped.byteswap()
+        return memoryview(swapped).cast('B')
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+from array import array
+from bisect import bisect_left, bisect_right
+from .isa import BIsa
+from .program import BProgram
+from .error import BTranslationError
+from .dbginfo import BDebugInfo
+
+class BJump(object):
+    """
+    Jump instruction which is handled by the branch relaxation - the original jump
+    from the program or the inserted trampoline.
+    """
+
+    def __init__(self,sym,target,line,col,src=None,padded=False,kind=None):
+        """
+        Parameters:
+            - sym - jump symbol ([ or ])
+            - target - index of the original instruction or the BJump (trampoline)
+            - line, col - position of the source code jump (used for errors)
+            - src - index of the original jump instruction (None for trampolines)
+            - padded - the trampoline is predecessed by the jump padding
+            - kind - type of the trampoline (guard, forward, backward)
+        """
+        self.sym    = sym
+        self.target = target
+        self.line   = line
+        self.col    = col
+        self.src    = src
+        self.padded = padded
+        self.kind   = kind
+        # Trampolines only - original instruction index the trampoline is inserted
+        # before and the index of the first trampoline instruction in the program
+        self.key    = None
+        self.pos    = 0
+
+    def size(self):
+        """
+        Return the number of instructions of the trampoline (including the padding)
+        """
+        return 3 if self.padded else 1
+
+class BRelaxer(object):
+    """
+    Branch relaxation of jumps which don't fit to the 12-bit argument (4095 B).
+
+    Jumps are conditional only, therefore the long jump is split into a chain of
+    trampolines which are executed iff the jump condition holds:
+
+        * [ (jump iff the cell is zero) - the island "[G [T" is inserted into the loop body.
+            The guard G jumps behind the island iff the cell is zero, otherwise both jumps
+            fall through. The long jump targets T which continues iff the cell is zero.
+        * ] (jump iff the cell is non-zero) - the trampoline "]U" is inserted behind the end
+            of any inner loop, the cell is always zero there and U falls through. The long jump
+            targets U which continues iff the cell is non-zero.
+
+    Jumps which fit to the argument keep the short encoding. Positions of islands are
+    estimated and the layout is checked again until all jumps fit.
+
+    Brief usage:
+        * relaxer = BRelaxer("conservative",False)
+        * prog = relaxer.relax(prog,loops)
+        * for line in relaxer.report(): print(line)
+    """
+
+    # Maximal jump distance in instructions
+    LIMIT = BIsa.ARG_MAX // BIsa.INST_WIDTH
+
+    # Reserve for trampolines inserted by other jump chains during the same iteration
+    MARGIN = 256
+
+    # Maximal number of layout iterations
+    MAX_ITERATIONS = 64
+
+    def __init__(self,padding,debug):
+        """
+        Initialization of the relaxer
+
+        Parameters:
+            - padding - jump padding mode (see BTranslate.PADDING_MODES)
+            - debug - debug is enabled (bool)
+        """
+        self.padding = padding
+        self.debug   = debug
+        # Inserted trampolines - original instruction index -> list of trampolines. Backward
+        # trampolines are stored at the beginning of the list (directly behind the inner loop).
+        self.inserts = {}
+        self.keys    = []
+        self.cum     = []
+        self.jumps   = []
+        self.trampolines = []
+
+    def relax(self,prog,loops,info=None):
+        """
+        Relax all jumps of the program
+
+        Parameters:
+            - prog - translated program (BProgram), jumps which don't fit can be unresolved
+            - loops - loop table, six items per loop - index of [, index of ], line and
+                column of [, line and column of ]
+            - info - debug information of the program (BDebugInfo), records of trampolines
+                are inserted into it (None if it is disabled)
+
+        Returns: New program with relaxed jumps (BProgram)
+        """
+        self.words = prog.words
+        self.info  = info
+        spots = []
+        for i in range(0,len(loops),6):
+            bIdx,eIdx,bLine,bCol,eLine,eCol = loops[i:i+6]
+            self.jumps.append(BJump("[",eIdx + 1,bLine,bCol,src=bIdx))
+            self.jumps.append(BJump("]",bIdx + 1,eLine,eCol,src=eIdx))
+            spots.append(eIdx + 1)
+        # The cell is zero behind every loop
+        self.spots = sorted(spots)
+        # Trampolines only make jumps longer, the input is rejected before any island is inserted
+        self.__check_backward()
+
+        for it in range(BRelaxer.MAX_ITERATIONS):
+            self.__layout()
+            long_jumps = [j for j in self.jumps + self.trampolines if self.__distance(j) > BRelaxer.LIMIT]
+            if self.debug:
+                print("Relaxation iteration {}: {} jumps are too long".format(it,len(long_jumps)))
+            if len(long_jumps) == 0:
+                return self.__emit()
+
+            for jump in long_jumps:
+                if BIsa.is_bjump(jump.sym):
+                    self.__relax_forward(jump)
+                else:
+                    self.__relax_backward(jump)
+
+        jump = long_jumps[0]
+        raise BTranslationError("Branch relaxation doesn't converge.",jump.line,jump.col)
+
+    def report(self):
+        """
+        Return the list of lines with the relaxation statistics
+        """
+        relaxed = [j for j in self.jumps if isinstance(j.target,BJump)]
+        added   = sum(t.size() for t in self.trampolines)
+        ret = ["Branch relaxation summary: {} jumps relaxed, {} trampolines inserted (+{} instructions)".format(
+            len(relaxed),len(self.trampolines),added)]
+
+        # Costs of taken relaxed jumps, each jump is listed in the debug mode
+        worst = (0,0)
+        for jump in relaxed:
+            hops   = 0
+            cycles = 0
+            tramp  = jump.target
+            while isinstance(tramp,BJump):
+                hops   = hops + 1
+                cycles = cycles + self.__pad_cycles(tramp) + BIsa.inst_cycles(tramp.sym,True)
+                tramp  = tramp.target
+            worst = max(worst,(cycles,hops))
+            if self.debug:
+                ret.append(" * {} at line {}, column {} - {} trampolines, ~{} extra cycles per taken jump".format(
+                    jump.sym,jump.line,jump.col,hops,cycles))
+
+        if len(relaxed) > 0:
+            ret.append(" * longest chain - {} trampolines, ~{} extra cycles per taken jump".format(worst[1],worst[0]))
+
+        # Costs of trampolines on the loop body path
+        guard = [t for t in self.trampolines if t.kind == "guard"]
+        if len(guard) > 0:
+            gcycles = max(self.__pad_cycles(t) for t in guard)
+            tcycles = max(self.__pad_cycles(t) for t in self.trampolines if t.kind == "forward")
+            ret.append(" * forward island passing costs ~{} cycles (~{} cycles if the cell is zero)".format(
+                gcycles + BIsa.inst_cycles("[") + tcycles + BIsa.inst_cycles("["),
+                gcycles + BIsa.inst_cycles("[",True)))
+        back = [t for t in self.trampolines if t.kind == "backward"]
+        if len(back) > 0:
+            ret.append(" * backward trampoline passing costs ~{} cycles".format(
+                max(self.__pad_cycles(t) for t in back) + BIsa.inst_cycles("]")))
+
+        return ret
+
+    @staticmethod
+    def __pad_cycles(tramp):
+        """
+        Return the number of cycles of the trampoline padding
+        """
+        if tramp.padded:
+            return BIsa.inst_cycles("&") + BIsa.inst_cycles(";")
+        return 0
+
+    def position(self,idx):
+        """
+        Return the index of the original instruction inside the relaxed program
+        """
+        return self.__pos(idx)
+
+    def __layout(self):
+        """
+        Compute positions of all trampolines
+        """
+        self.keys = sorted(self.inserts)
+        self.cum  = []
+        total = 0
+        for key in self.keys:
+            pos = key + total
+            for tramp in self.inserts[key]:
+                tramp.pos = pos
+                pos = pos + tramp.size()
+            total = pos - key
+            self.cum.append(total)
+
+    def __pos(self,idx):
+        """
+        Return the position of the original instruction in the relaxed program
+        """
+        n = bisect_right(self.keys,idx)
+        if n == 0:
+            return idx
+        return idx + self.cum[n - 1]
+
+    def __target_pos(self,target):
+        """
+        Return the position of the jump target
+        """
+        if isinstance(target,BJump):
+            return target.pos
+        return self.__pos(target)
+
+    def __jump_pos(self,jump):
+        """
+        Return the position of the jump instruction (behind the padding)
+        """
+        if jump.src is not None:
+            return self.__pos(jump.src)
+        return jump.pos + jump.size() - 1
+
+    def __distance(self,jump):
+        """
+        Return the jump distance in instructions
+        """
+        if BIsa.is_bjump(jump.sym):
+            return self.__target_pos(jump.target) - self.__jump_pos(jump)
+        return self.__jump_pos(jump) - self.__target_pos(jump.target)
+
+    def __entry(self,idx):
+        """
+        Return the position of the first instruction inserted in front of the original
+        instruction (the position of the instruction iff nothing is inserted there)
+        """
+        n = bisect_left(self.keys,idx)
+        if n == 0:
+            return idx
+        return idx + self.cum[n - 1]
+
+    def __group_start(self,idx):
+        """
+        Return the index of the padding start iff the instruction is a part of the jump
+        padding. Trampolines can't be inserted between the padding and the jump.
+        """
+        words = self.words
+        sym = BIsa.get_symbol(words[idx])
+        if BIsa.is_jump_instruction(sym) and idx >= 2 and BIsa.get_symbol(words[idx-2]) == "&" and BIsa.get_symbol(words[idx-1]) == ";":
+            return idx - 2
+        if sym == ";" and idx >= 1 and idx + 1 < len(words) and BIsa.get_symbol(words[idx-1]) == "&" and \
+            BIsa.is_jump_instruction(BIsa.get_symbol(words[idx+1])):
+            return idx - 1
+        return idx
+
+    def __cell_reg_valid(self,key):
+        """
+        Returns true iff the cell register is valid in front of the original instruction, the
+        scan is the same as in the translator (trampolines are jumps).
+        """
+        idx = key
+        while idx > 0:
+            if len(self.inserts.get(idx,[])) > 0:
+                return True
+            sym = BIsa.get_symbol(self.words[idx-1])
+            if sym in BIsa.CELL_REG_VALID or BIsa.is_jump_instruction(sym):
+                return True
+            if sym in BIsa.CELL_REG_INVALID:
+                return False
+            idx = idx - 1
+
+        return len(self.inserts.get(0,[])) > 0
+
+    def __insert(self,key,tramp,front=False):
+        """
+        Insert the trampoline in front of the original instruction
+        """
+        tramp.key = key
+        lst = self.inserts.setdefault(key,[])
+        if front:
+            lst.insert(0,tramp)
+        else:
+            lst.append(tramp)
+        self.trampolines.append(tramp)
+
+    def __relax_forward(self,jump):
+        """
+        Split the long [ jump into the chain of forward islands
+        """
+        budget = BRelaxer.LIMIT - BRelaxer.MARGIN
+        conservative = self.padding == "conservative"
+        if jump.src is not None:
+            lo = jump.src + 1
+        else:
+            lo = jump.key + 1
+
+        target = jump.target
+        hi = target.key - 1 if isinstance(target,BJump) else target
+        # Positions are taken from the current layout, the shift is the size of
+        # islands inserted by this chain
+        cur   = self.__jump_pos(jump)
+        tpos  = self.__target_pos(target)
+        shift = 0
+        prev  = jump
+        while tpos + shift - cur > BRelaxer.LIMIT and lo <= hi:
+            # Find the last instruction which allows to place the island into the budget
+            want = cur + budget - shift - 3
+            l,h = lo,hi
+            while l < h:
+                m = (l + h + 1) // 2
+                if self.__pos(m) <= want:
+                    l = m
+                else:
+                    h = m - 1
+            key = self.__group_start(l)
+            if key < lo:
+                # Move behind the jump padding
+                key = l + 2 if BIsa.get_symbol(self.words[l]) == ";" else l + 1
+                if key > hi:
+                    break
+
+            guard = BJump("[",key,jump.line,jump.col,padded=conservative or not(self.__cell_reg_valid(key)),kind="guard")
+            tramp = BJump("[",prev.target,jump.line,jump.col,padded=conservative,kind="forward")
+            self.__insert(key,guard)
+            self.__insert(key,tramp)
+            prev.target = tramp
+            prev  = tramp
+            cur   = self.__pos(key) + shift + guard.size() + tramp.size() - 1
+            shift = shift + guard.size() + tramp.size()
+            lo    = key + 1
+
+    @staticmethod
+    def __no_place(jump):
+        """
+        Raise the error of the ] jump which can't be split into trampolines
+        """
+        budget = BRelaxer.LIMIT - BRelaxer.MARGIN
+        raise BTranslationError("Jump is longer than {} B and no place for the trampoline was found (an inner loop is required at least every {} B).".format(
+            BIsa.ARG_MAX,budget*BIsa.INST_WIDTH),jump.line,jump.col)
+
+    def __check_backward(self):
+        """
+        Check that the chain of backward trampolines exists for every long ] jump. Positions
+        of the original program are used - inserted islands make distances longer only, the
+        jump which can't be relaxed now can't be relaxed later.
+        """
+        budget = BRelaxer.LIMIT - BRelaxer.MARGIN
+        spots  = self.spots
+        for jump in self.jumps:
+            if BIsa.is_bjump(jump.sym) or jump.src - jump.target <= BRelaxer.LIMIT:
+                continue
+
+            # Farthest spot inside the budget is taken (the same as in __relax_backward)
+            cur   = jump.src
+            first = bisect_right(spots,jump.target)
+            last  = bisect_right(spots,self.__group_start(jump.src))
+            while cur - jump.target > BRelaxer.LIMIT:
+                l = bisect_left(spots,cur - budget,first,last)
+                if l >= last or spots[l] >= cur:
+                    self.__no_place(jump)
+                cur  = spots[l]
+                last = l
+
+    def __relax_backward(self,jump):
+        """
+        Split the long ] jump into the chain of backward trampolines placed behind
+        inner loops
+        """
+        budget = BRelaxer.LIMIT - BRelaxer.MARGIN
+        conservative = self.padding == "conservative"
+        target = jump.target
+        lo = target.key + 1 if isinstance(target,BJump) else target + 1
+        if jump.src is not None:
+            hi = self.__group_start(jump.src)
+        else:
+            hi = jump.key - 1
+
+        cur  = self.__jump_pos(jump)
+        tpos = self.__target_pos(target)
+        prev = jump
+        while cur - tpos > BRelaxer.LIMIT:
+            # Find the farthest spot behind an inner loop inside the budget
+            want = cur - budget
+            first = bisect_right(self.spots,lo - 1)
+            last  = bisect_right(self.spots,hi)
+            l,h = first,last
+            while l < h:
+                m = (l + h) // 2
+                key = self.spots[m]
+                if self.__entry(key) < want:
+                    l = m + 1
+                else:
+                    h = m
+
+            if l >= last:
+                self.__no_place(jump)
+
+            key   = self.spots[l]
+            entry = self.__entry(key)
+            if entry >= cur:
+                self.__no_place(jump)
+
+            tramp = BJump("]",prev.target,jump.line,jump.col,padded=conservative,kind="backward")
+            self.__insert(key,tramp,front=True)
+            prev.target = tramp
+            prev = tramp
+            cur  = entry + tramp.size() - 1
+            hi   = key - 1
+
+    def __relocate_info(self):
+        """
+        Insert records of trampolines to the debug information, trampolines take the
+        source position of the relaxed jump
+        """
+        info  = self.info
+        old   = (info.lines,info.cols,info.kinds)
+        new   = (array('I'),array('I'),array('B'))
+        prev  = 0
+        for key in self.keys:
+            for o,n in zip(old,new):
+                n.extend(o[prev:key])
+            for tramp in self.inserts[key]:
+                recs = [BDebugInfo.PADDING,BDebugInfo.PADDING] if tramp.padded else []
+                for kind in recs + [BDebugInfo.TRAMPOLINE]:
+                    new[0].append(tramp.line)
+                    new[1].append(tramp.col)
+                    new[2].append(kind)
+            prev = key
+        for o,n in zip(old,new):
+            n.extend(o[prev:])
+        info.lines,info.cols,info.kinds = new
+
+    def __emit(self):
+        """
+        Create the relaxed program and encode all jumps
+        """
+        prog  = BProgram()
+        out   = prog.words
+        words = self.words
+        prev  = 0
+        for key in self.keys:
+            out.extend(words[prev:key])
+            for tramp in self.inserts[key]:
+                if tramp.padded:
+                    out.append(BIsa.encode_inst("&"))
+                    out.append(BIsa.encode_inst(";"))
+                out.append(BIsa.encode_jump(tramp.sym,0))
+            prev = key
+        out.extend(words[prev:])
+        if self.info is not None:
+            self.__relocate_info()
+
+        for jump in self.jumps + self.trampolines:
+            pos  = self.__jump_pos(jump)
+            dist = self.__distance(jump)
+            out[pos] = BIsa.encode_jump(jump.sym,dist * BIsa.INST_WIDTH)
+            if self.debug and jump.src is None:
+                print("Trampoline {} ({}) at 0x{:x}, jump value 0x{:x}".format(jump.sym,jump.kind,prog.address(pos),dist * BIsa.INST_WIDTH))
+
+        return prog
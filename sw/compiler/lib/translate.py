@@ -8,21 +8,29 @@
 #  WEBSITE: https://github.com/benycze/fpga-brainfuck/
 # -------------------------------------------------------------------------------
 
-import pdb
-import readline
-from lib.isa import BIsa
-from lib.template import *
-
-class BTranslationError(Exception):
+from array import array
+from .isa import BIsa
+from .lexer import BLexer
+from .program import BProgram
+from .optimize import BOptimizer
+from .relax import BRelaxer
+from .idiom import BIdioms
+from .emit import BEmitter
+from .dbginfo import BDebugInfo
+from .cost import BCostEstimator
+from .error import BTranslationError
+
+
+class BRunTable(dict):
     """
-    Error during the translation was detected
+    Table of instruction words indexed by symbols and runs of symbols (string of the repeated
+    symbol, e.g. "+++" or "**"). Words of runs are encoded on the first use.
     """
-    def __init__(self,message,line,column):
-        self.line = line
-        self.column = column
-        self.message = "Error {}:{} - {}".format(line,column,message)
-        super().__init__(self.message)
 
+    def __missing__(self,run):
+        word = BIsa.encode_run(run[0],len(run))
+        self[run] = word
+        return word
 
 class BTranslate(object):
     """
@@ -30,7 +38,17 @@ class BTranslate(object):
     code to the BCPU code.
     """
 
-    def __init__(self,in_file,debug,memory_map,addr_width,outfile):
+    # Version of the compiler (part of the compilation cache key)
+    VERSION = "1.1"
+
+    # Size of the output file buffer
+    WRITE_BUFFER = 2**20
+
+    # Jump padding modes - conservative (pad every jump) and hazard (pad the jump iff the
+    # cell register can hold a stale value)
+    PADDING_MODES = ["conservative","hazard"]
+
+    def __init__(self,in_file,debug,memory_map,addr_width,outfile,passes=[],padding="conservative",debug_info=False,rle=False,idioms=False,cost=False):
         """
         Initilization of the class which takes care of the 
         translation to the BCPU.
@@ -42,196 +60,212 @@ class BTranslate(object):
                 The output file will have the ${outfile}.mif
             -hex addr - required hexadecimal address width
             - Outfile - output file name (string)
+            - passes - list of enabled optimization passes (see BOptimizer.PASSES)
+            - padding - jump padding mode (see PADDING_MODES)
+            - debug_info - generate the debug information (bool). The output file
+                will have the ${outfile}.dbg
+            - rle - fold runs of pointer and data instructions to the run-length encoded
+                instruction (bool)
+            - idioms - lower simple loops to idiom instructions (bool, see BIdioms)
+            - cost - estimate the cost of the program (bool, see BCostEstimator). The output
+                file will have the ${outfile}.cost.json
         """
+        if padding not in BTranslate.PADDING_MODES:
+            raise ValueError("Unknown padding mode {} (available: {}).".format(padding,", ".join(BTranslate.PADDING_MODES)))
+
         self.in_file    = in_file
         self.debug      = debug
         self.memory_map = memory_map
         self.outfile    = outfile
         self.memory_map_name   = outfile + ".mif"
         self.memory_hmap_name  = outfile + ".hex"
+        self.debug_info_name   = outfile + ".dbg"
+        self.cost_name         = outfile + ".cost.json"
         self.memory_addr_width = addr_width
+        self.passes     = passes
+        self.padding    = padding
+        self.rle        = rle
+        self.idioms     = idioms
+        # Statistics of the run-length encoding - number of folded source symbols and
+        # number of emitted instructions
+        self.run_syms   = 0
+        self.run_insts  = 0
+        # Statistics of the jump padding - number of jumps and number of padded jumps
+        self.jumps      = 0
+        self.padded     = 0
+        # Loop table (six items per loop - index of [, index of ], line and column of [ and ])
+        # and the flag that any jump doesn't fit to the jump argument
+        self.loops      = array('q')
+        self.relax      = False
+        # Optimizer, idiom recognition and relaxer of the last compilation (used for the
+        # report) and the program size in instructions
+        self.optimizer  = None
+        self.idiom      = None
+        self.relaxer    = None
+        self.size       = 0
+        # Debug information of the last compilation (None if it is disabled)
+        self.debug_info = BDebugInfo() if debug_info else None
+        # Cost estimate of the last compilation (None if it is disabled)
+        self.cost       = cost
+        self.cost_est   = None
         # Helping variables - source code parsing
-        self.line_buf   = ''
-        self.line_cnt   = 0
-        self.char_cnt   = 0
-        self.last_sym   = ''
-        # Helping variables - memroy files
-        self.mem_pos    = 0
-
-    def __get_char(self):
-        """
-        Return a char from the input. The method
-        raises eof of the file if we are done.
-        """
-        # Read line if the buffer is empty
-        if self.line_buf == '':
-            self.line_cnt = self.line_cnt + 1
-            self.line_buf = self.inf.readline()
-            self.char_cnt = 0
-
-        if len(self.line_buf) == 0:
-            # Nothing else to read 
-            return ''
-        
-        # Extract one character
-        self.char_cnt = self.char_cnt + 1
-        char = self.line_buf[0]
-        self.line_buf = self.line_buf[1:]
-        return char
-
-    def __process_comment(self):
-        """
-        Process comment - read the comment from the input untill the newline is detected
+        self.tokens     = None
+        self.eof_nop    = True
+
+    def __add_inst(self,prog,sym,val=0,line=0,col=0,kind=BDebugInfo.SOURCE):
         """
-        comment = ""
-        while True:
-            ## Read the input untill the new line is detected
-            char = self.__get_char()
-            if (char is '\n') or (char is ''):
-                break
-            comment = comment + char
-        # End of the while
-        if(self.debug):
-            print("Lexer: Parsed comment => {}".format(comment))
-
-    def __get_symbol(self):
+        Encode the instruction and append it to the end of the program. The source
+        position and the kind of the instruction are stored to the debug information.
+
+        Returns: Index of the instruction inside the program
         """
-        Get the symbol from the input, skip comments
+        if BIsa.is_jump_instruction(sym):
+            word = BIsa.encode_jump(sym,val)
+        elif len(sym) > 1:
+            word = BIsa.encode_run(sym[0],len(sym))
+        else:
+            word = BIsa.encode_inst(sym)
+
+        idx = prog.append(word)
+        if self.debug_info is not None:
+            self.debug_info.append(line,col,kind)
+        if self.debug:
+            print("Dumping the instruction: {} (0x{:04x}) at 0x{:x}".format(sym,word,prog.address(idx)))
 
-        Comments are beginning with // and are on one line
+        return idx
 
-        The symbol is stored inside the variable self.last_sym
+    def __add_cycle_padding(self,prog,line,col):
         """
-        while True:
-            # Chek if we are not done, skip white spaces
-            char = self.__get_char()
-            if char == '':
-                # Nothing else to read
-                self.last_sym = ''
-                break
-
-            if char.isspace():
-                continue         
-
-            # Check if we are working with the comment
-            if char is "/":
-                char = self.__get_char()
-                if not(char is "/"):
-                    BTranslationError("Expecting / symbol",self.line_cnt,self.char_cnt)
-
-                # Process the commend and run the parsing again after you are done
-                self.__process_comment()
-                continue
+        Add the jump padding - two no-ops. The padding is omitted in the hazard mode
+        if the cell register is valid. The line and col is the position of the jump.
+        """
+        self.jumps = self.jumps + 1
+        if self.padding == "hazard" and self.__cell_reg_valid(prog):
+            if self.debug:
+                print("Cell register is valid, skipping the jump padding at 0x{:x}".format(prog.size()))
+            return
 
-            # Check if we are working with allowed
-            # symbol.
-            if not(BIsa.contains(char)):
-                raise BTranslationError("Uknown symbol was detected",self.line_cnt,self.char_cnt)          
+        self.padded = self.padded + 1
+        self.__add_inst(prog,"&",line=line,col=col,kind=BDebugInfo.PADDING)
+        self.__add_inst(prog,";",line=line,col=col,kind=BDebugInfo.PADDING)
 
-            # Yahoo ... we can return the symbol which is possible to translate
-            if self.debug:
-                print("Lexer: Parser symbol => {}".format(char))
+    def __cell_reg_valid(self,prog):
+        """
+        Returns true iff the cell register is valid before the next emitted instruction.
 
-            # Remember the symbol and escape from the function
-            self.last_sym = char
-            break
+        The state is given by the last instruction which changes the register (see BIsa.CELL_REG_VALID
+        and BIsa.CELL_REG_INVALID), no-operations and outputs are skipped. The register is invalid
+        at the program start. Every jump is scheduled to see the valid register and jumps don't change
+        it, therefore the register is also valid after the jump and on both jump targets.
 
-    def __translate_body(self):
+        The scan is stopped on the previous jump, each instruction is visited at most once.
+        """
+        idx = len(prog) - 1
+        while idx >= 0:
+            sym = prog.symbol(idx)
+            if sym in BIsa.CELL_REG_VALID or BIsa.is_jump_instruction(sym):
+                return True
+            if sym in BIsa.CELL_REG_INVALID:
+                return False
+            idx = idx - 1
+
+        return False
+
+    def __translate_program(self):
         """
-        Translate the body of the BCPU program
+        Translate the BCPU program in one pass
 
-        Returns: The translated code (human readable form - tuple (instruction,address)
+        Returns: The translated program (BProgram)
         """
-        # The body consits of non-jump instructions - if the instruction [ or ] is detected
-        # the following will happen:
-        # 1) The [ is translated as the pass to the __translate_cycle method
-        # 2) The ] is translated as the return from the method which means that the cycle
-        #    is being processed inside the __translate_cycle
-        #
-        inst_body = []        
-
-        # Get the symbol and analyze iff we are working with the JUMP instruction
-        while True:
-            self.__get_symbol()
-            # Check if we have something to process
-            if self.last_sym is '':
-                if self.debug:
-                    print("No other symbol to process, ending.")
-
-                # No other instruction, return nop
-                nop_inst = ((";",0),self.mem_pos)
-                self.mem_pos = self.mem_pos + BIsa.INST_WIDTH
-                inst_body.append(nop_inst)
-                break
-
-            # Check if we are working with any jump symbol, dump the body into the list
-            # and escape from the cycle
-            if BIsa.is_bjump(self.last_sym):
-                cycle_body = self.__translate_cycle()
-                inst_body.extend(cycle_body)
+        # The program is emitted into one instruction array. Opened cycles are stored on the stack
+        # and the jump offsets are written back when the corresponding ] is detected.
+        # Each item of the stack is a tuple (index of [, line, column).
+        prog  = BProgram()
+        stack = []
+        slow  = self.debug or self.debug_info is not None
+        emit  = prog.words.append
+        isa   = BRunTable(BIsa.ISA_TABLE) if self.rle or self.idioms else BIsa.ISA_TABLE
+        for sym,line,col in self.tokens:
+            # Each jump needs to be predecessed by the preload operation (to store data in the execution stage) and 
+            # one NOP instruction to have a fresh data in stage 2 (jump analysis)
+            if BIsa.is_bjump(sym):
+                self.__add_cycle_padding(prog,line,col)
+                bIdx = self.__add_inst(prog,"[",line=line,col=col)
+                stack.append((bIdx,line,col))
                 continue
 
-            if BIsa.is_ejump(self.last_sym):
-                # We have a closing parenthesis inside the body, end the processing there and return
-                # to the upper __translate cycle
-                break
+            if BIsa.is_ejump(sym):
+                if len(stack) == 0:
+                    raise BTranslationError("Cycle opening [ not found, detected {}.".format(sym), line, col)
 
-            # Check if we are working with a body instruction, we will return 
-            # the error if not
-            if not(BIsa.is_body_instruction(self.last_sym)):
-                raise BTranslationError("Unknown symbol {}.".format(self.last_sym), self.line_cnt, self.char_cnt)
+                self.__add_cycle_padding(prog,line,col)
+                bIdx,bLine,bCol = stack.pop()
+                eIdx = self.__add_inst(prog,"]",line=line,col=col)
+                self.loops.extend((bIdx,eIdx,bLine,bCol,line,col))
+                self.__resolve_cycle(prog,bIdx,eIdx,line,col)
+                continue
 
-            # So far so good, add it into the list and try next symbol
-            inst = ((self.last_sym,0), self.mem_pos)
-            if self.debug:
-                print("Dumping the instruction: {}".format(str(inst)))
+            # Body instruction, all symbols were checked by the lexer. This is the
+            # hot path, the instruction word is taken directly from the ISA table.
+            if slow:
+                self.__add_inst(prog,sym,line=line,col=col)
+            else:
+                emit(isa[sym])
 
-            inst_body.append(inst)
-            self.mem_pos = self.mem_pos + BIsa.INST_WIDTH
-        # We are out ... time to dump our code
-        return inst_body
+        if self.debug:
+            print("No other symbol to process, ending.")
 
-    def __add_cycle_padding(self):
+        # Check that all cycles are closed
+        if len(stack) > 0:
+            _,line,col = stack[-1]
+            raise BTranslationError("Cycle closing ] not found.", line, col)
+
+        # No other instruction, append the nop (iff it wasn't removed by the optimizer)
+        if self.eof_nop:
+            self.__add_inst(prog,";",kind=BDebugInfo.GENERATED)
+        return prog
+
+    def __fold_runs(self,tokens):
         """
-        Add the jump padding - two no-ops
+        Generator which folds runs of the same pointer or data symbol into one token. The symbol
+        of the folded token is the string of repeated symbols (at most BIsa.ARG_MAX symbols), the
+        position is the position of the first symbol.
         """
-        ret = []
-        ret.append((("&",0), self.mem_pos))
-        self.mem_pos = self.mem_pos + BIsa.INST_WIDTH
-        ret.append(((";",0), self.mem_pos))
-        self.mem_pos = self.mem_pos + BIsa.INST_WIDTH
-        return ret
+        run_sym = None
+        count   = 0
+        for tok in tokens:
+            sym = tok[0]
+            if sym == run_sym and count < BIsa.ARG_MAX:
+                count = count + 1
+                continue
 
-    def __translate_cycle(self):
+            if run_sym is not None:
+                self.run_syms  = self.run_syms + count
+                self.run_insts = self.run_insts + 1
+                yield (run_sym * count,line,col)
+                run_sym = None
+
+            if sym in BIsa.RUN_INSTRUCTIONS:
+                run_sym,line,col = tok
+                count = 1
+            else:
+                yield tok
+
+        if run_sym is not None:
+            self.run_syms  = self.run_syms + count
+            self.run_insts = self.run_insts + 1
+            yield (run_sym * count,line,col)
+
+    def __resolve_cycle(self,prog,bIdx,eIdx,line,col):
         """
-        Translate the BCPU cycle construction
+        Compute jump offsets of the closed cycle and write them back to the program.
+        The line and col is the position of the ] in the source code.
 
-        Returns: The translated code (human readable form) - tuple ((jump_instr,val),address)
+        Jumps which don't fit to the jump argument are left unresolved, they are
+        solved by the branch relaxation (BRelaxer) after the translation.
         """
-        inst_body = []
-
-        # The translate cycle should detect the opening symbol [ and 
-        # closing symbol ]
-        # Fine ... check if we have an opening symbol
-        if not(self.last_sym is '['):
-            raise BTranslationError("Cycle opening [ not found, detected {}.".format(self.last_sym), self.line_cnt, self.char_cnt)
-
-        # Remember the first address, translate the body, remember the return address and construct
-        # the jump instruction.
-
-        # Each jump needs to be predecessed by the preload operation (to store data in the execution stage) and 
-        # one NOP instruction to have a fresh data in stage 2 (jump analysis)
-        f_pad_jmpend = self.__add_cycle_padding()
-        bAddress = self.mem_pos
-        self.mem_pos = self.mem_pos + BIsa.INST_WIDTH
-        body_code = self.__translate_body()
-        f_pad_jmpbegin = self.__add_cycle_padding()
-        eAddress = self.mem_pos
-        self.mem_pos = self.mem_pos + BIsa.INST_WIDTH
-
-        # Check if we have a closing symbol
-        if not(self.last_sym is ']'):
-            raise BTranslationError("Cycle closing ] not found, detected {}.".format(self.last_sym), self.line_cnt, self.char_cnt) 
+        bAddress = prog.address(bIdx)
+        eAddress = prog.address(eIdx)
 
         # We are done ... everything is fine. Time to dump our functionality
             # Front jump -- we need to jump to the next address behind the ]
@@ -245,163 +279,149 @@ class BTranslate(object):
             print("fJump \"[\" value is 0x{:x}".format(fJumpOffset))
             print("bJump \"]\" value is 0x{:x}".format(bJumpOffset))
 
-        # Check that offsets are no longer than 255 bytes
-        max_jmp = 2 ** 12 - 1
+        # Check that offsets are no longer than 4095 bytes
+        max_jmp = BIsa.ARG_MAX
         if fJumpOffset > max_jmp  or bJumpOffset > max_jmp:
-            raise BTranslationError("Jump is longer than {} B.".format(max_jmp), self.line_cnt, self.char_cnt)
-
-        # Generate the [
-        inst_body.extend(f_pad_jmpend)
-        fJump = (("[",fJumpOffset), bAddress)
-        inst_body.append(fJump)
-        # Append body to the list
-        inst_body.extend(body_code)
-        # Generate the ] and return the body
-        inst_body.extend(f_pad_jmpbegin)
-        bJump = (("]",bJumpOffset), eAddress)
-        inst_body.append(bJump)
-        return inst_body
-
-    def __memory_map_to_bin(self, mem_map):
-        """
-        Covert the memroy map to a binary form.
+            if self.debug:
+                print("Jump is longer than {} B, branch relaxation is required.".format(max_jmp))
+            self.relax = True
+            return
 
-        Return: Byte form of the file uploaded to the BCPU
-        """
-        if(self.debug):
-            print("Dumping the memory map to its binary form")
-
-        ret = bytearray()
-        for m_elem,_ in mem_map:
-            # Check if we are working with symbol or 
-            # jump instruction. Each instruction is encoded as (inst, addr),
-            # where inst can be a symbol or jump tuple (jmp,val)
-            bF = None
-            if BIsa.is_jump_instruction(m_elem[0]):
-                bF = BIsa.translate_jump(m_elem[0],m_elem[1])
-            else:
-                bF = BIsa.translate_inst(m_elem[0])
-            
-            # Append the result of the conversion
-            ret.extend(bF)
+        prog[bIdx] = BIsa.encode_jump("[",fJumpOffset)
+        prog[eIdx] = BIsa.encode_jump("]",bJumpOffset)
 
-        return ret
-
-    def __dump_inst(self,m_elem):
+    def compile(self,inf):
         """
-        Translate one memory element whichis a tuple of instruction
-        and data (inst, data)
+        Translate the source code to the BCPU program. No file is opened and nothing
+        is printed (with the exception of debug messages), summaries of optimizations
+        are available via the report method.
 
-        Return: Translated instruction
-        """
-        # Prepare data - m_elem is not a tuple iff we are not working
-        # with a jump instruction
-        bData   = 0
-        sym     = m_elem[0]
-        if BIsa.is_jump_instruction(sym):
-            # It is a jump instruction
-            bData = BIsa.translate_jump(m_elem[0],m_elem[1])
-        else:
-            # It is an instruction
-            bData = BIsa.translate_inst(sym)
+        Parameters:
+            - inf - opened input (any object with the read(size) method returning a string)
 
-        return bData
+        Returns: The translated program (BProgram)
 
-    def __dump_mem_map(self,mem_map):
+        Raises: BTranslationError if the source code can't be translated
         """
-        Store the memory map into the file. The format of the 
-        file is MIF (https://www.intel.com/content/www/us/en/programmable/quartushelp/13.0/mergedProjects/reference/glossary/def_mif.htm)
-
-        All tempaltes are defined in the template.py file.
+        # The program is parsed in one pass and all instructions are stored inside
+        # one array. Jump values are not known when the [ is detected, therefore they
+        # are written back after the corresponding ] is processed.
+        #
+        # That is the plan - let's rock!!
+        self.tokens = BLexer(inf,self.debug).tokens()
+        # Run the optimization passes over the stream of symbols
+        if len(self.passes) > 0:
+            self.optimizer = BOptimizer(self.passes,self.debug)
+            self.tokens = self.optimizer.run(self.tokens)
+            self.eof_nop = not(self.optimizer.strip_eof_nop())
+        # Lower simple loops to idiom instructions
+        if self.idioms:
+            self.idiom = BIdioms(self.debug)
+            self.tokens = self.idiom.run(self.tokens)
+        # Fold runs of pointer and data instructions
+        if self.rle:
+            self.tokens = self.__fold_runs(self.tokens)
+        # Translate the program to the array of encoded instructions
+        bprogram = self.__translate_program()
+        # Add the program termination symbol
+        self.__add_inst(bprogram,"x",kind=BDebugInfo.GENERATED)
+        # Relax jumps which are longer than the jump argument
+        if self.relax:
+            self.relaxer = BRelaxer(self.padding,self.debug)
+            bprogram = self.relaxer.relax(bprogram,self.loops,self.debug_info)
+        self.size = len(bprogram)
+        if self.debug_info is not None:
+            self.debug_info.set_loops((bprogram.address(b),bprogram.address(e)) for b,e in self.loop_table())
+        if self.cost:
+            self.cost_est = BCostEstimator().estimate(bprogram,self.loop_table())
+        return bprogram
+
+    def loop_table(self):
         """
-        ret = mif_hdr_template.format(self.outfile, len(mem_map) * BIsa.INST_WIDTH, 8)
-        # Length of dumped data is the number of programm instructions times the instruction
-        # size
-
-        # Dump the memory layout
-        for m_elem,addr in mem_map:
-            bData = self.__dump_inst(m_elem)
-            # Each line starts with a comment, after that we need to dump 
-            # address : data
-            i_arg = BIsa.get_instruction_argument(bData) # Try to decode it back
-            ret += "-- Translated instruction ==> {} (parameter = 0x{} )\n".format(m_elem[0],i_arg)
-            ret += mif_line_template.format(addr,bData[0])
-            ret += mif_line_template.format(addr+1,bData[1])
-
-        # End the file 
-        ret += mif_end_template
-        return ret
-
-    def __dump_mem_hmap(self,mem_map):
+        Return the list of (index of [, index of ]) pairs of all loops in the final program
+        of the last compilation
         """
-        Store the memory map in the hexadecimal format (one line per 2 bytes).
+        pos = self.relaxer.position if self.relaxer is not None else (lambda idx: idx)
+        loops = self.loops
+        return [(pos(loops[i]),pos(loops[i+1])) for i in range(0,len(loops),6)]
 
-        The total number of bytes is 2**self.memory_addr_width
+    def report(self):
         """
-        # Process the memory, dump it to the file
-        ret = ""
-        cell_addrs = 2**self.memory_addr_width
-        for m_elem,_ in mem_map:
-            bData = self.__dump_inst(m_elem)
-            ret   += hex_line_template.format(*bData)
-            cell_addrs = cell_addrs - 2
-
-        # Fill the rest of the file with zeros
-        while(cell_addrs > 0):
-            ret += hex_line_template.format(0,0)
-            cell_addrs = cell_addrs - 2
-
+        Return the list of lines with the summary of the last compilation (branch
+        relaxation, optimization passes, idioms, run-length encoding, the cost estimate and
+        jump padding)
+        """
+        ret = []
+        if self.relaxer is not None:
+            ret.extend(self.relaxer.report())
+        if self.optimizer is not None:
+            ret.append("Optimization summary (program size is {} instructions):".format(self.size))
+            ret.extend(self.optimizer.report())
+        if self.idiom is not None:
+            ret.extend(self.idiom.report())
+        if self.rle:
+            ret.append("Run-length summary: {} pointer/data symbols folded to {} instructions (removed {} instructions)".format(
+                self.run_syms,self.run_insts,self.run_syms - self.run_insts))
+        if self.cost_est is not None:
+            ret.extend(BCostEstimator.report(self.cost_est))
+        if self.padding == "hazard":
+            cycles = BIsa.inst_cycles("&") + BIsa.inst_cycles(";")
+            ret.append("Jump padding summary: {} of {} jumps padded, removed {} instructions (~{} cycles per execution of each unpadded jump)".format(
+                self.padded,self.jumps,2*(self.jumps - self.padded),cycles))
         return ret
 
-
     def translate(self):
         """
         Run the translation of the source code
+
+        Returns: True iff the translation was successful
         """
+        success = False
+        self.inf = None
         try:
-            # Open the file and process the input body
-            # 
-            # The program is firstly parsed and constructed to the tree 
-            # where the program body is stored inside the list. After we process the whole
-            # program we dump the body of the program as the as the last step of each function
-            # because what we need is to resolve jump vaues (which are known after the translation.
-            #
-            # That is the plan - let's rock!!
-
             self.inf = open(self.in_file,'r')
-            # Get the memory map and covert it to the binary form
-            bprogram = self.__translate_body()
-            # Add the program termination symbol
-            iTerminate = (("x",0), self.mem_pos)
-            bprogram.append(iTerminate)
-            # Write the memory map if it is required
-            if self.memory_map:
-                print("Dumping the memory map to file {}".format(self.memory_map_name))
-                mem_map_content = self.__dump_mem_map(bprogram)
-                mem_map_file = open(self.memory_map_name,'w')
-                mem_map_file.write(mem_map_content)
-                mem_map_file.close()
-
-                print("Dumping the memory map to file {}".format(self.memory_hmap_name))
-                mem_hmap_content = self.__dump_mem_hmap(bprogram)
-                mem_hmap_content_file = open(self.memory_hmap_name,'w')
-                mem_hmap_content_file.write(mem_hmap_content)
-                mem_hmap_content_file.close()
-
-            # Convert the memory map (human readable to the binary form)
-            bin_form = self.__memory_map_to_bin(bprogram)
-            out_file = open(self.outfile,'wb')
-            out_file.write(bin_form)
-            out_file.close()
+            bprogram = self.compile(self.inf)
+            for line in self.report():
+                print(line)
+
+            # Write all output files in one pass
+            mif_file = None
+            hex_file = None
+            try:
+                if self.memory_map:
+                    print("Dumping the memory map to file {}".format(self.memory_map_name))
+                    mif_file = open(self.memory_map_name,'w',buffering=BTranslate.WRITE_BUFFER)
+                    print("Dumping the memory map to file {}".format(self.memory_hmap_name))
+                    hex_file = open(self.memory_hmap_name,'w',buffering=BTranslate.WRITE_BUFFER)
+
+                with open(self.outfile,'wb',buffering=BTranslate.WRITE_BUFFER) as out_file:
+                    BEmitter(self.outfile,self.memory_addr_width).emit(bprogram,out_file,mif_file,hex_file)
+                if self.debug_info is not None:
+                    print("Dumping the debug information to file {}".format(self.debug_info_name))
+                    with open(self.debug_info_name,'wb') as dbg_file:
+                        self.debug_info.write(dbg_file)
+                if self.cost_est is not None:
+                    print("Dumping the cost estimate to file {}".format(self.cost_name))
+                    with open(self.cost_name,'w') as cost_file:
+                        cost_file.write(BCostEstimator.to_json(self.cost_est))
+            finally:
+                if mif_file is not None:
+                    mif_file.close()
+                if hex_file is not None:
+                    hex_file.close()
+
             if self.debug:
                 print("Dumping the binary code into the file {}.".format(self.outfile))
+            success = True
 
         except IOError as e:
             print("Error during the file reading/writing operation.")
         except BTranslationError as e:
             print(str(e))
         finally:
-             # Close the file
-            self.inf.close()
+            # Close the file
+            if self.inf is not None:
+                self.inf.close()
 
         print("Translation done!")
+        return success
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import argparse
+import sys
+import os
+import glob
+import time
+import lib.api as api
+import lib.optimize as optimize
+import lib.translate as translate
+import lib.model as model
+import lib.fastmodel as fastmodel
+import lib.pipeline as pipeline
+from lib.isa import BIsa
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    parser = argparse.ArgumentParser(description='Simulator of the BCPU - runs Brainfuck sources, binary images or test directories\n'
+        '(bsv/tests/data/*) in the cycle-accurate model of the BCPU pipeline.'.format(prgname),formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument('--fast',action='store_true',help='Use the fast functional model (pre-decoded program), cycles are not counted.')
+    parser.add_argument('--input',type=str,help='File with input data of the program (raw bytes). Test directories use the in.data file.')
+    parser.add_argument('--max-cycles',type=int,default=10**7,help='Maximal number of cycles (instructions in the fast mode) of one run (default is 10000000).')
+    parser.add_argument('--cell-dump',type=str,help='Store the final cell memory into the file (one hexadecimal value per line, the\n'
+        'same format as cell_mem.hex). Allowed for one input only.')
+    parser.add_argument('--quiet',action='store_true',help='Print failures and the summary only.')
+    parser.add_argument('-O',dest='optimize',action='store_true',help='Translate sources with all optimization passes ({}).'.format(', '.join(optimize.BOptimizer.PASSES)))
+    parser.add_argument('--padding',type=str,choices=translate.BTranslate.PADDING_MODES,default='conservative',help='Jump padding mode of translated sources (default is conservative).')
+    parser.add_argument('--rle',action='store_true',help='Translate sources with run-length encoded instructions.')
+    parser.add_argument('--idioms',action='store_true',help='Translate sources with idiom instructions.')
+    parser.add_argument('input_files',nargs='+',metavar='input',help='Brainfuck sources (.b), binary images or test directories (or glob patterns)')
+    return parser.parse_args(args)
+
+def read_hex_file(path):
+    """
+    Read the file with one hexadecimal value per line
+
+    Returns: Bytes object with values
+    """
+    with open(path,'r') as f:
+        return bytes(int(line,16) for line in f.read().split())
+
+def expected_output(path,image,exp_out):
+    """
+    Return the expected output of the job. The out.data file of the test directory can't be
+    empty - it contains one zero line if the program doesn't send any data (the image doesn't
+    contain the output instruction), such jobs expect no output.
+    """
+    if exp_out is None or not(os.path.isdir(path)) or any(exp_out):
+        return exp_out
+    # Instruction words are stored MSB first, the opcode is above the argument
+    op_out = BIsa.ISA_TABLE["."] >> BIsa.ARG_WIDTH
+    if any((image[i] >> (BIsa.ARG_WIDTH - 8)) == op_out for i in range(0,len(image) - 1,2)):
+        return exp_out
+    return b""
+
+def load_job(path,args):
+    """
+    Prepare the program to run. The test directory contains the Brainfuck source (*.b), input
+    data (in.data), expected output data (out.data) and the expected cell memory (cell_mem.hex).
+
+    Returns: Tuple (image, input data, expected output, expected cell memory), expected values
+    are None if they aren't known (see expected_output for the expected output)
+    """
+    inp = b""
+    exp_out = None
+    exp_cells = None
+    src = path
+    if os.path.isdir(path):
+        sources = sorted(glob.glob(os.path.join(path,"*.b")))
+        if len(sources) != 1:
+            raise ValueError("Test directory {} has to contain exactly one source file".format(path))
+        src = sources[0]
+        if os.path.exists(os.path.join(path,"in.data")):
+            inp = read_hex_file(os.path.join(path,"in.data"))
+        if os.path.exists(os.path.join(path,"out.data")):
+            exp_out = read_hex_file(os.path.join(path,"out.data"))
+        if os.path.exists(os.path.join(path,"cell_mem.hex")):
+            exp_cells = read_hex_file(os.path.join(path,"cell_mem.hex"))
+    elif args.input is not None:
+        with open(args.input,'rb') as f:
+            inp = f.read()
+
+    if src.endswith(".b"):
+        passes = optimize.BOptimizer.PASSES if args.optimize else []
+        with open(src,'rb') as f:
+            res = api.compile_program(f.read(),os.path.basename(src),passes=passes,padding=args.padding,rle=args.rle,idioms=args.idioms)
+        image = res.image.tobytes()
+    else:
+        with open(src,'rb') as f:
+            image = f.read()
+
+    return (image,inp,expected_output(path,image,exp_out),exp_cells)
+
+def run_job(path,args):
+    """
+    Run one program and compare results with expected values. The output has to match the
+    expected output exactly.
+
+    Returns: Tuple (success, message, final cell memory)
+    """
+    image,inp,exp_out,exp_cells = load_job(path,args)
+
+    if args.fast:
+        sim = fastmodel.BFastModel.from_image(image)
+        state = sim.run(inp,args.max_cycles)
+        summary = "{} instructions executed".format(sim.steps)
+    else:
+        sim = pipeline.BPipelineModel(image)
+        state = sim.run(inp,args.max_cycles)
+        summary = "; ".join(sim.report())
+
+    errors = []
+    if state != model.BModel.TERMINATED:
+        errors.append("program stopped in the {} state".format(state))
+    if exp_out is not None and bytes(sim.output) != exp_out:
+        errors.append("output data {} don't match expected data {}".format(list(sim.output),list(exp_out)))
+    if exp_cells is not None:
+        diff = [addr for addr in range(len(exp_cells)) if sim.cells[addr] != exp_cells[addr]]
+        if len(diff) > 0:
+            errors.append("{} cells don't match the expected cell memory (the first one is 0x{:x})".format(len(diff),diff[0]))
+
+    msg = summary if len(errors) == 0 else "; ".join(errors)
+    return (len(errors) == 0,msg,sim.cells)
+
+def get_inputs(args):
+    """
+    Return the list of inputs, glob patterns are expanded
+    """
+    inputs = []
+    for pattern in args.input_files:
+        matches = sorted(glob.glob(pattern))
+        if len(matches) == 0:
+            raise ValueError("No input matches {}".format(pattern))
+        inputs.extend(matches)
+    return inputs
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+
+    failed = 0
+    try:
+        inputs = get_inputs(args)
+        if args.cell_dump is not None and len(inputs) != 1:
+            raise ValueError("The cell dump is allowed for one input only")
+
+        start = time.time()
+        for path in inputs:
+            try:
+                success,msg,cells = run_job(path,args)
+            except Exception as e:
+                success,msg,cells = False,str(e),None
+
+            if not(success):
+                failed = failed + 1
+            if not(success) or not(args.quiet):
+                print("{} {} - {}".format("PASS" if success else "FAIL",path,msg))
+            if args.cell_dump is not None and cells is not None:
+                with open(args.cell_dump,'w') as f:
+                    f.write("".join("{:02x}\n".format(val) for val in cells))
+
+        print("Simulation summary: {} of {} programs passed in {:.2f} s".format(len(inputs) - failed,len(inputs),time.time() - start))
+    except Exception as e:
+        print("Error detected during the simulation: ",str(e))
+        failed = 1
+
+    if failed > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
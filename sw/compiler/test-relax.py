@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import argparse
+import sys
+import io
+import time
+import lib.translate as translate
+from lib.error import BTranslationError
+from bench_lexer import generate_nest
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    parser = argparse.ArgumentParser(description='Regression run of the branch relaxation - deep nests "+[[[...-]]]" (no inner loop\n'
+        'is closed in front of the innermost one, long ] jumps can\'t be relaxed) have to be rejected with the translation\n'
+        'error, the nest of 341 loops (the deepest one which fits) and the long loop with inner loops have to be compiled.\n'
+        'Each compilation has to finish in the time limit.\n\n'
+        '   * Default depths - {0} \n'
+        '   * Depth 100000, 5 seconds limit - {0} --time-limit 5 100000 \n'.format(prgname),formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument('--time-limit',type=float,default=2.0,help='Time limit of one compilation in seconds (default is 2.0).')
+    parser.add_argument('depths',type=int,nargs='*',default=[2000,8000,32000],help='Nesting depths (default is 2000 8000 32000).')
+    return parser.parse_args(args)
+
+def compile_source(source):
+    """
+    Compile the source code (no file is written)
+
+    Returns: Tuple (time in seconds, number of instructions or None, error message or None)
+    """
+    bt = translate.BTranslate("test.b",False,False,14,"test.out")
+    start = time.perf_counter()
+    try:
+        prog = bt.compile(io.StringIO(source))
+        return (time.perf_counter() - start,len(prog),None)
+    except BTranslationError as e:
+        return (time.perf_counter() - start,None,str(e))
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+    # Test name, source code, the compilation has to pass (bool)
+    tests = [("nest {}".format(depth),generate_nest(depth),False) for depth in args.depths]
+    tests.append(("nest 341",generate_nest(341),True))
+    tests.append(("long loop",'+[' + '>+[-]' * 3000 + ']\n',True))
+
+    failed = 0
+    for name,source,success in tests:
+        elapsed,insts,msg = compile_source(source)
+        ok = (insts is not None) == success and elapsed <= args.time_limit
+        if not(ok):
+            failed = failed + 1
+        result = "{} instructions".format(insts) if insts is not None else msg
+        print("{} {} - {:.3f} s, {}".format("PASS" if ok else "FAIL",name,elapsed,result))
+
+    print("Regression run {}".format("FAILED" if failed > 0 else "passed"))
+    if failed > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
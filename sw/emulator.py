@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import sys
+import os
+import argparse
+import select
+import signal
+import time
+import tty
+from collections import deque
+
+# The BCPU model is a part of the compiler library
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"compiler"))
+import lib.pipeline as pipeline
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    parser = argparse.ArgumentParser(description='Emulator of the FPGA board - the UART end-point and the BCPU are emulated behind the\n'
+        'pseudo-terminal. Pass the printed device path to host tools (--device argument).'.format(prgname),formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--baudrate',type=int,default=0,help='Emulated baudrate - each transferred byte takes 10 bit periods (8N1 frame). The value\n'
+        '0 disables the latency (default).')
+    parser.add_argument('--byte-latency',type=float,help='Latency of one transferred byte in microseconds (overrides the --baudrate).')
+    parser.add_argument('--cycles',type=int,default=BEmulator.CYCLES_PER_POLL,help='Number of BCPU cycles between two checks of the serial line (default is {}).'.format(BEmulator.CYCLES_PER_POLL))
+    parser.add_argument('--link',type=str,help='Create the symbolic link to the pseudo-terminal (stable device path).')
+    parser.add_argument('--load',type=str,help='Binary image to load into the instruction memory before the start.')
+    parser.add_argument('--debug',action='store_true',help='Print all processed transactions.')
+    return parser.parse_args(args)
+
+class BEmulator(object):
+    """
+    Emulator of the FPGA board behind the pseudo-terminal. The emulator implements the
+    protocol of the UART end-point (board/rtl/uart_stream_sync.vhd, see sw/README.md) and
+    the BCPU address space (BCpuModel with the cycle-accurate pipeline model):
+
+        * CMD_WRITE, 3 address bytes (LSB first), data byte - the emulator returns CMD_ACK
+        * CMD_READ, 3 address bytes (LSB first) - the emulator returns the read byte
+        * CMD_WRITE_BURST, 3 address bytes, 2 length bytes (LSB first, 0 means 65536), data
+            bytes - the emulator returns CMD_ACK after the last byte
+        * CMD_READ_BURST, 3 address bytes, 2 length bytes - the emulator returns read bytes
+        * other command bytes are ignored
+
+    The top level passes 16 bits of the address to the BCPU (0x0 - 0xBFFF address map), reads
+    of the unused address space return 0. The BCPU runs between received bytes if it is
+    enabled (and it isn't stopped or waiting for the host).
+
+    Each received and sent byte takes byte_latency seconds. Both directions of the line
+    are modeled independently (full duplex) with deadlines - the received byte is processed
+    when its transfer ends, responses are delivered after their transfer and the CPU runs
+    in the meantime. The throughput of host tools is therefore limited in the same way as
+    with the real UART.
+
+    The SIGUSR1 signal emulates the reset button of the board - the BCPU core, the command
+    register, I/O FIFOs and the protocol state are reset, memories are kept. The reset is the
+    only way how to clear the termination (invalid opcode) flag.
+
+    Brief usage:
+        * emu = BEmulator(10.0/115200)
+        * print(emu.device)
+        * emu.serve()
+    """
+
+    # UART end-point commands (see BrainfuckIO)
+    CMD_WRITE   = 0x00
+    CMD_READ    = 0x01
+    CMD_ACK     = 0x02
+    CMD_WRITE_BURST = 0x03
+    CMD_READ_BURST  = 0x04
+
+    # Number of address (length) bytes and the address mask (16-bit address of the BCPU)
+    ADDR_BYTES  = 3
+    LEN_BYTES   = 2
+    ADDR_MASK   = 2**16 - 1
+
+    # Default number of BCPU cycles between two checks of the serial line
+    CYCLES_PER_POLL = 1024
+
+    def __init__(self,byte_latency=0.0,cycles_per_poll=CYCLES_PER_POLL,debug=False):
+        """
+        Initialization of the emulator, the pseudo-terminal is opened
+
+        Parameters:
+            - byte_latency - latency of one transferred byte in seconds
+            - cycles_per_poll - number of BCPU cycles between two checks of the serial line
+            - debug - print processed transactions (bool)
+        """
+        self.byte_latency    = byte_latency
+        self.cycles_per_poll = cycles_per_poll
+        self.debug           = debug
+        self.cpu             = pipeline.BCpuModel()
+        # The slave side is kept open - the terminal is alive between two connections of the host
+        self.master,self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        # Protocol state - current command (None if we wait for the command), header bytes
+        # (address and length), current address and the number of remaining data bytes
+        self.cmd      = None
+        self.header   = []
+        self.addr     = 0
+        self.remain   = 0
+        # Time when the last received (sent) byte is transferred, queue of bytes which are
+        # being sent (tuples (delivery time, data))
+        self.rx_time  = 0.0
+        self.tx_time  = 0.0
+        self.tx_queue = deque()
+        # Statistics - reads, writes, transferred bytes, BCPU cycles and resets
+        self.reads    = 0
+        self.writes   = 0
+        self.bytes    = 0
+        self.cycles   = 0
+        self.resets   = 0
+        # The reset request is set by the signal handler, the pipe wakes up the serving loop
+        self.reset_req = False
+        self.reset_r,self.reset_w = os.pipe()
+        signal.signal(signal.SIGUSR1,self.__on_signal)
+
+    def load(self,data,base=0x4000):
+        """
+        Load data into the address space (used to preload the program)
+        """
+        for i,val in enumerate(data):
+            self.cpu.write(base + i,val)
+
+    def close(self):
+        """
+        Close the pseudo-terminal
+        """
+        os.close(self.master)
+        os.close(self.slave)
+        os.close(self.reset_r)
+        os.close(self.reset_w)
+
+    def __on_signal(self,sig,frame):
+        """
+        Handler of the reset signal
+        """
+        self.reset_req = True
+        os.write(self.reset_w,b"r")
+
+    def __check_reset(self):
+        """
+        Process the requested reset (the signal can be handled after data were received, the
+        request is therefore checked before each received byte too)
+        """
+        if self.reset_req:
+            self.reset_req = False
+            self.reset()
+
+    def reset(self):
+        """
+        Reset the board (the reset button) - memories are kept
+        """
+        core = self.cpu.core
+        core.reset()
+        core.in_fifo.clear()
+        core.out_fifo.clear()
+        self.cpu.cmd      = 0
+        self.cpu.pc_lsb   = 0
+        self.cpu.out_data = None
+        self.cmd          = None
+        self.resets       = self.resets + 1
+        if self.debug:
+            print("Emulator: Reset of the board")
+
+    def __cpu_running(self):
+        """
+        Check if the BCPU has something to do (it is enabled and it doesn't wait for the host)
+        """
+        core = self.cpu.core
+        if self.cpu.out_data is None and len(core.out_fifo) > 0:
+            # The output register is filled from the output FIFO
+            return True
+        if (self.cpu.cmd & 0x3) == 0 or core.terminated or core.invalid:
+            return False
+        if core.wait_in and len(core.in_fifo) == 0:
+            return False
+        if core.wait_out and self.cpu.out_data is not None:
+            return False
+        return True
+
+    def __run_cpu(self,cycles):
+        """
+        Run the given number of BCPU cycles
+        """
+        self.cpu.clock(cycles)
+        self.cycles = self.cycles + cycles
+
+    def __deliver(self,now):
+        """
+        Write sent bytes whose transfer has ended to the pseudo-terminal
+
+        Returns: Delivery time of the next byte in the queue (None if the queue is empty)
+        """
+        data = bytearray()
+        while len(self.tx_queue) > 0 and self.tx_queue[0][0] <= now:
+            data.append(self.tx_queue.popleft()[1])
+        if len(data) > 0:
+            os.write(self.master,data)
+        return self.tx_queue[0][0] if len(self.tx_queue) > 0 else None
+
+    def __wait(self,deadline):
+        """
+        Wait until the given time, the BCPU runs and sent bytes are delivered in the meantime
+        """
+        while True:
+            now = time.perf_counter()
+            nxt = self.__deliver(now)
+            if now >= deadline:
+                return
+            if self.__cpu_running():
+                self.__run_cpu(self.cycles_per_poll)
+            else:
+                time.sleep(min(deadline,nxt) - now if nxt is not None else deadline - now)
+
+    def __send(self,val):
+        """
+        Send one byte to the host (the transfer starts when the received byte is processed
+        and the previous byte is sent)
+        """
+        self.bytes = self.bytes + 1
+        if self.byte_latency <= 0:
+            os.write(self.master,bytes([val]))
+            return
+        self.tx_time = max(self.tx_time,self.rx_time) + self.byte_latency
+        self.tx_queue.append((self.tx_time,val))
+
+    def __receive(self,val,now):
+        """
+        Process one byte received from the host (the transfer of the byte started at the
+        given time or behind the previous byte)
+        """
+        self.bytes = self.bytes + 1
+        self.__check_reset()
+        if self.byte_latency > 0:
+            self.rx_time = max(self.rx_time,now) + self.byte_latency
+            self.__wait(self.rx_time)
+            self.__check_reset()
+        if self.cmd is None:
+            if val in (BEmulator.CMD_READ,BEmulator.CMD_WRITE,BEmulator.CMD_READ_BURST,BEmulator.CMD_WRITE_BURST):
+                self.cmd    = val
+                self.header = []
+            elif self.debug:
+                print("Emulator: Unknown command 0x{:02x} was ignored".format(val))
+            return
+
+        burst = self.cmd == BEmulator.CMD_READ_BURST or self.cmd == BEmulator.CMD_WRITE_BURST
+        header_len = BEmulator.ADDR_BYTES + (BEmulator.LEN_BYTES if burst else 0)
+        if len(self.header) < header_len:
+            self.header.append(val)
+            if len(self.header) < header_len:
+                return
+            # Header is complete
+            self.addr   = int.from_bytes(bytes(self.header[:BEmulator.ADDR_BYTES]),byteorder='little')
+            self.remain = 1
+            if burst:
+                self.remain = int.from_bytes(bytes(self.header[BEmulator.ADDR_BYTES:]),byteorder='little')
+                if self.remain == 0:
+                    self.remain = 2**(8 * BEmulator.LEN_BYTES)
+            if self.cmd == BEmulator.CMD_READ or self.cmd == BEmulator.CMD_READ_BURST:
+                self.__read()
+            return
+
+        # Data byte of the write command
+        addr = self.addr & BEmulator.ADDR_MASK
+        self.cpu.write(addr,val)
+        self.writes = self.writes + 1
+        if self.debug:
+            print("Emulator: Write 0x{:04x} <- 0x{:02x}".format(addr,val))
+        self.addr   = self.addr + 1
+        self.remain = self.remain - 1
+        if self.remain == 0:
+            self.cmd = None
+            self.__send(BEmulator.CMD_ACK)
+
+    def __read(self):
+        """
+        Process the read command (all bytes of the burst are read at once)
+        """
+        for i in range(self.remain):
+            addr = (self.addr + i) & BEmulator.ADDR_MASK
+            data = self.cpu.read(addr)
+            if self.debug:
+                print("Emulator: Read 0x{:04x} -> 0x{:02x}".format(addr,data))
+            self.__send(data)
+        self.reads = self.reads + self.remain
+        self.cmd = None
+
+    def serve(self):
+        """
+        Process the communication with the host until the process is interrupted
+        """
+        while True:
+            now = time.perf_counter()
+            nxt = self.__deliver(now)
+            running = self.__cpu_running()
+            timeout = None
+            if running:
+                timeout = 0
+            elif nxt is not None:
+                timeout = max(0,nxt - now)
+            ready,_,_ = select.select([self.reset_r,self.master],[],[],timeout)
+            if self.reset_r in ready:
+                os.read(self.reset_r,64)
+            self.__check_reset()
+            if self.master in ready:
+                data = os.read(self.master,4096)
+                now = time.perf_counter()
+                for val in data:
+                    self.__receive(val,now)
+            elif running:
+                self.__run_cpu(self.cycles_per_poll)
+
+    def report(self):
+        """
+        Return the list of lines with the emulator statistics
+        """
+        return ["Emulator summary: {} reads, {} writes, {} transferred bytes, {} BCPU cycles, {} resets".format(
+            self.reads,self.writes,self.bytes,self.cycles,self.resets)]
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+
+    latency = 0.0
+    if args.byte_latency is not None:
+        latency = args.byte_latency / 10**6
+    elif args.baudrate > 0:
+        latency = 10.0 / args.baudrate
+
+    emu = BEmulator(latency,args.cycles,args.debug)
+    try:
+        if args.load is not None:
+            with open(args.load,'rb') as f:
+                emu.load(f.read())
+        device = emu.device
+        if args.link is not None:
+            if os.path.islink(args.link):
+                os.remove(args.link)
+            os.symlink(emu.device,args.link)
+            device = args.link
+        print("Emulator is listening on {} (byte latency {:.1f} us)".format(device,latency * 10**6),flush=True)
+        emu.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.link is not None and os.path.islink(args.link):
+            os.remove(args.link)
+        for line in emu.report():
+            print(line)
+        emu.close()
+
+if __name__ == "__main__":
+    main()
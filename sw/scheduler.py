@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import sys
+import os
+import argparse
+import asyncio
+import time
+from collections import deque
+
+# Jobs are loaded in the same way as in the simulator (compiler library)
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),"compiler"))
+import simulator
+import lib.optimize as optimize
+import lib.translate as translate
+from brainfuck_io.aio import BrainfuckAsyncIO
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    int_conv = lambda x: int(x,0)
+    parser = argparse.ArgumentParser(description='Scheduler of jobs on more boards - runs Brainfuck sources, binary images or test directories\n'
+        '(bsv/tests/data/*) on the pool of boards and checks the output. Example:\n\n'
+        '   {0} --device /dev/ttyUSB0 --device /dev/ttyUSB1 --reset-cmd "./reset-board.sh {{device}}" tests/*/'.format(prgname),formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument('--device',type=str,action='append',help='Path to the device of one board (repeat the argument for more boards).')
+    parser.add_argument('--reset-cmd',type=str,help='Shell command which resets the board ({device} is replaced by the device path). The BCPU\n'
+        'termination flag is cleared by the board reset only (it can\'t be cleared through registers) - each board\n'
+        'can run one job without the command, more jobs than boards are rejected.')
+    parser.add_argument('--retries',type=int,default=2,help='Number of job retries after the board failure (default is 2).')
+    parser.add_argument('--max-failures',type=int,default=3,help='Number of consecutive failures after which the board is removed from the pool (default is 3).')
+    parser.add_argument('--timeout',type=float,default=1.0,help='Timeout of one bus operation in seconds (default is 1.0).')
+    parser.add_argument('--job-timeout',type=float,default=60.0,help='Maximal runtime of one job in seconds (default is 60.0).')
+    parser.add_argument('--cells',type=int_conv,default=BScheduler.CELLS,help='Number of cells cleared before the job starts (default is 0x{:x}).'.format(BScheduler.CELLS))
+    parser.add_argument('--repeat',type=int,default=1,help='Run each job the given number of times (benchmarking).')
+    parser.add_argument('--input',type=str,help='File with input data of jobs (raw bytes). Test directories use the in.data file.')
+    parser.add_argument('--quiet',action='store_true',help='Print failures and the summary only.')
+    parser.add_argument('-O',dest='optimize',action='store_true',help='Translate sources with all optimization passes ({}).'.format(', '.join(optimize.BOptimizer.PASSES)))
+    parser.add_argument('--padding',type=str,choices=translate.BTranslate.PADDING_MODES,default='conservative',help='Jump padding mode of translated sources (default is conservative).')
+    parser.add_argument('--rle',action='store_true',help='Translate sources with run-length encoded instructions.')
+    parser.add_argument('--idioms',action='store_true',help='Translate sources with idiom instructions.')
+    parser.add_argument('input_files',nargs='+',metavar='input',help='Brainfuck sources (.b), binary images or test directories (or glob patterns)')
+    return parser.parse_args(args)
+
+class BJob(object):
+    """
+    One job of the scheduler - the binary image, input data and the expected output
+    """
+
+    def __init__(self,name,image,inp=b"",exp_out=None):
+        """
+        Initialization of the job
+
+        Parameters:
+            - name - name of the job (printed in reports)
+            - image - binary image of the program
+            - inp - input data of the program
+            - exp_out - expected output data (None if it isn't checked)
+        """
+        self.name     = name
+        self.image    = bytes(image)
+        self.inp      = bytes(inp)
+        self.exp_out  = exp_out
+        # Results - success flag, message, output data, number of attempts and times of the
+        # submission, the start of the last attempt and the end
+        self.success  = False
+        self.msg      = None
+        self.output   = bytearray()
+        self.attempts = 0
+        self.submit   = None
+        self.start    = None
+        self.end      = None
+        self.board    = None
+
+class BBoard(object):
+    """
+    One board of the pool - the connection and statistics
+    """
+
+    def __init__(self,device):
+        self.device   = device
+        self.dev      = None
+        # Image which is stored in the instruction memory (the upload is skipped if the
+        # next job uses the same image)
+        self.image    = None
+        self.jobs     = 0
+        self.busy     = 0.0
+        self.failures = 0
+        self.errors   = 0
+        self.resets   = 0
+        self.retired  = None
+
+class BoardNotReady(Exception):
+    """
+    The board can't start the job (it needs the reset)
+    """
+    pass
+
+class BScheduler(object):
+    """
+    Scheduler of jobs on the pool of boards. Each board is driven by its own task of the
+    asyncio loop (BrainfuckAsyncIO connections), idle boards take jobs from the shared
+    queue. The job is processed in following steps:
+
+        * the board is reset (the reset command) if the termination/invalid flag is set
+        * the image is uploaded (skipped if the board has the same image) and cells are cleared
+        * the PC is set to 0 and the BCPU is enabled
+        * input data are written and output data are read until the program terminates
+        * the output is compared with the expected output (data have to be the same)
+
+    The termination flag can't be cleared through registers - the scheduler without the
+    reset command rejects more jobs than boards.
+
+    Bus errors and timeouts are board failures - the connection is reopened and the job is
+    returned to the queue (up to retries times). The board is removed from the pool after
+    max_failures consecutive failures.
+
+    Brief usage:
+        * sched = BScheduler(["/dev/ttyUSB0","/dev/ttyUSB1"],reset_cmd="./reset.sh {device}")
+        * jobs = asyncio.run(sched.run([BJob("test",image,b"input",b"output")]))
+        * print("\\n".join(sched.report()))
+    """
+
+    # Address space of the BCPU (see sw/README.md)
+    CELL_BASE   = 0x0000
+    INST_BASE   = 0x4000
+    REG_CMD     = 0x8000
+    REG_PC_LSB  = 0x8001
+    REG_PC_MSB  = 0x8002
+    REG_FLAGS   = 0x8003
+    REG_IO      = 0x8004
+
+    # Bits of the flag register
+    FLAG_OUT        = 0x01
+    FLAG_IN_FULL    = 0x02
+    FLAG_INVALID    = 0x08
+    FLAG_TERMINATED = 0x10
+    FLAG_WAIT_IN    = 0x20
+
+    # Size of the cell memory
+    CELLS = 0x4000
+
+    # Time in seconds for which output data are collected behind the termination flag (the
+    # output register is refilled from the output FIFO after each read)
+    DRAIN_TIME = 0.1
+
+    def __init__(self,devices,reset_cmd=None,retries=2,max_failures=3,timeout=1.0,job_timeout=60.0,cells=CELLS):
+        """
+        Initialization of the scheduler
+
+        Parameters:
+            - devices - list of device paths
+            - reset_cmd - shell command which resets the board ({device} is replaced), None
+                if boards can't be reset
+            - retries - number of job retries after the board failure
+            - max_failures - number of consecutive failures after which the board is removed
+            - timeout - timeout of one bus operation in seconds
+            - job_timeout - maximal runtime of one job in seconds
+            - cells - number of cells cleared before the job
+        """
+        if len(devices) == 0:
+            raise ValueError("At least one device has to be passed")
+        self.boards       = [BBoard(device) for device in devices]
+        self.reset_cmd    = reset_cmd
+        self.retries      = retries
+        self.max_failures = max_failures
+        self.timeout      = timeout
+        self.job_timeout  = job_timeout
+        self.cells        = cells
+        self.jobs         = []
+        self.queue        = None
+        self.wakeup       = None
+        self.remaining    = 0
+        self.retried      = 0
+        self.start        = None
+        self.stop         = None
+
+    async def run(self,jobs):
+        """
+        Run all jobs on the pool of boards
+
+        Returns: List of finished jobs (see job results)
+        """
+        if self.reset_cmd is None and len(jobs) > len(self.boards):
+            raise ValueError("{} jobs can't run on {} boards without the reset command - the termination flag is cleared by "
+                "the board reset only (pass the reset command)".format(len(jobs),len(self.boards)))
+        self.jobs      = list(jobs)
+        self.queue     = deque(self.jobs)
+        self.remaining = len(self.jobs)
+        self.wakeup    = asyncio.Event()
+        self.start     = time.perf_counter()
+        for job in self.jobs:
+            job.submit = self.start
+
+        await asyncio.gather(*[self.__worker(board) for board in self.boards])
+        self.stop = time.perf_counter()
+        return self.jobs
+
+    async def __worker(self,board):
+        """
+        Process jobs on one board until the queue is empty or the board is removed
+        """
+        while self.remaining > 0 and board.retired is None:
+            if len(self.queue) == 0:
+                # Jobs are running on other boards, they can be returned to the queue
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            job = self.queue.popleft()
+            job.attempts = job.attempts + 1
+            job.board    = board.device
+            job.start    = time.perf_counter()
+            busy_start   = job.start
+            try:
+                if board.dev is None:
+                    board.dev = BrainfuckAsyncIO(board.device,timeout=self.timeout)
+                await asyncio.wait_for(self.__run_job(board,job),self.job_timeout)
+                board.failures = 0
+                job.end = time.perf_counter()
+                self.__finish(job)
+            except BoardNotReady as e:
+                # The job wasn't started, it is returned to the queue
+                job.attempts = job.attempts - 1
+                self.queue.appendleft(job)
+                board.retired = str(e)
+            except Exception as e:
+                msg = str(e) if str(e) != "" else type(e).__name__
+                board.failures = board.failures + 1
+                board.errors   = board.errors + 1
+                if board.dev is not None:
+                    board.dev.close()
+                    board.dev = None
+                if board.failures >= self.max_failures:
+                    board.retired = "{} consecutive failures (last: {})".format(board.failures,msg)
+                if job.attempts <= self.retries:
+                    self.retried = self.retried + 1
+                    self.queue.append(job)
+                else:
+                    job.end = time.perf_counter()
+                    job.msg = "board {} failed: {}".format(board.device,msg)
+                    self.__finish(job)
+            board.busy = board.busy + time.perf_counter() - busy_start
+            self.wakeup.set()
+
+        if board.dev is not None:
+            board.dev.close()
+            board.dev = None
+        if board.retired is not None and all(b.retired is not None for b in self.boards):
+            # Nobody can run remaining jobs
+            while len(self.queue) > 0:
+                job = self.queue.popleft()
+                job.msg = "no board is available"
+                self.__finish(job)
+            self.wakeup.set()
+
+    def __finish(self,job):
+        """
+        Mark the job as finished
+        """
+        self.remaining = self.remaining - 1
+        if self.remaining == 0:
+            self.wakeup.set()
+
+    async def __reset(self,board):
+        """
+        Reset the board with the reset command
+        """
+        if self.reset_cmd is None:
+            raise BoardNotReady("the board has to be reset (pass the reset command)")
+        proc = await asyncio.create_subprocess_shell(self.reset_cmd.format(device=board.device))
+        if await proc.wait() != 0:
+            raise RuntimeError("Reset command of the board {} failed".format(board.device))
+        board.resets = board.resets + 1
+
+    async def __run_job(self,board,job):
+        """
+        Run the job on the board and check the result
+        """
+        dev = board.dev
+        # 1) The termination (invalid) flag is cleared by the board reset only
+        flags = (await dev.read(BScheduler.REG_FLAGS))[0]
+        if flags & (BScheduler.FLAG_TERMINATED | BScheduler.FLAG_INVALID):
+            await self.__reset(board)
+            flags = (await dev.read(BScheduler.REG_FLAGS))[0]
+            if flags & (BScheduler.FLAG_TERMINATED | BScheduler.FLAG_INVALID):
+                raise RuntimeError("the board wasn't reset")
+
+        # 2) Upload the image, clear cells and start the program
+        await dev.write(BScheduler.REG_CMD,b"\x00")
+        if board.image != job.image:
+            board.image = None
+            await dev.write_block(BScheduler.INST_BASE,job.image)
+            board.image = job.image
+        await dev.write_block(BScheduler.CELL_BASE,bytes(self.cells))
+        await dev.write(BScheduler.REG_PC_LSB,b"\x00")
+        await dev.write(BScheduler.REG_PC_MSB,b"\x00")
+        await dev.write(BScheduler.REG_CMD,b"\x01")
+
+        # 3) Write input data and read output data until the program terminates. Output data
+        # can be read behind the termination flag - the program is finished if all expected
+        # output data were read (and the flag register shows no output data twice) or no output
+        # data were available for DRAIN_TIME seconds.
+        out = job.output
+        out.clear()
+        pos = 0
+        empty = 0
+        drain = None
+        while True:
+            flags = (await dev.read(BScheduler.REG_FLAGS))[0]
+            if flags & BScheduler.FLAG_OUT:
+                out += await dev.read(BScheduler.REG_IO)
+                empty = 0
+                drain = None
+                continue
+            if flags & BScheduler.FLAG_INVALID:
+                msg = "invalid opcode was detected"
+                break
+            if flags & BScheduler.FLAG_TERMINATED:
+                now = time.perf_counter()
+                empty = empty + 1
+                if drain is None:
+                    drain = now + BScheduler.DRAIN_TIME
+                if (job.exp_out is not None and len(out) >= len(job.exp_out) and empty >= 2) or now >= drain:
+                    msg = None
+                    break
+                continue
+            if pos < len(job.inp) and not(flags & BScheduler.FLAG_IN_FULL):
+                await dev.write(BScheduler.REG_IO,job.inp[pos:pos + 1])
+                pos = pos + 1
+                continue
+            if pos == len(job.inp) and flags & BScheduler.FLAG_WAIT_IN:
+                msg = "program waits for more input data"
+                break
+        await dev.write(BScheduler.REG_CMD,b"\x00")
+        board.jobs = board.jobs + 1
+
+        # 4) Check the output
+        if msg is None and job.exp_out is not None and bytes(out) != job.exp_out:
+            msg = "output data {} don't match expected data {}".format(list(out),list(job.exp_out))
+        job.success = msg is None
+        job.msg = msg if msg is not None else "{} output bytes, {:.3f} s".format(len(out),time.perf_counter() - job.start)
+
+    def report(self):
+        """
+        Return the list of lines with the scheduler statistics
+        """
+        total   = self.stop - self.start
+        passed  = sum(1 for job in self.jobs if job.success)
+        started = [job.start - job.submit for job in self.jobs if job.start is not None]
+        lines = ["Scheduler summary: {} of {} jobs passed in {:.2f} s ({:.2f} jobs/s), {} retries".format(
+            passed,len(self.jobs),total,len(self.jobs) / total if total > 0 else 0.0,self.retried)]
+        if len(started) > 0:
+            lines.append("Queue latency: average {:.3f} s, maximum {:.3f} s".format(sum(started) / len(started),max(started)))
+        for board in self.boards:
+            line = "Board {}: {} jobs, utilisation {:.1f} %, {} errors, {} resets".format(board.device,board.jobs,
+                100.0 * board.busy / total if total > 0 else 0.0,board.errors,board.resets)
+            if board.retired is not None:
+                line = line + ", removed from the pool - " + board.retired
+            lines.append(line)
+        return lines
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+
+    failed = 0
+    try:
+        if args.device is None:
+            raise ValueError("At least one device has to be passed (--device)")
+        jobs = []
+        for path in simulator.get_inputs(args):
+            image,inp,exp_out,_ = simulator.load_job(path,args)
+            jobs.extend(BJob(path,image,inp,exp_out) for _ in range(args.repeat))
+
+        sched = BScheduler(args.device,args.reset_cmd,args.retries,args.max_failures,args.timeout,args.job_timeout,args.cells)
+        asyncio.run(sched.run(jobs))
+        for job in jobs:
+            if not(job.success):
+                failed = failed + 1
+            if not(job.success) or not(args.quiet):
+                print("{} {} - {} (board {})".format("PASS" if job.success else "FAIL",job.name,job.msg,job.board))
+        for line in sched.report():
+            print(line)
+    except Exception as e:
+        print("Error detected during the scheduling: ",str(e))
+        failed = 1
+
+    if failed > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# -------------------------------------------------------------------------------
+#  PROJECT: FPGA Brainfuck
+# -------------------------------------------------------------------------------
+#  AUTHORS: Pavel Benacek <pavel.benacek@gmail.com>
+#  LICENSE: The MIT License (MIT), please read LICENSE file
+#  WEBSITE: https://github.com/benycze/fpga-brainfuck/
+# -------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import signal
+import argparse
+import asyncio
+import tempfile
+import subprocess
+import scheduler
+import simulator
+
+# Directory of the script and the default test (test directory of Bluespec testbenches)
+SW_DIR       = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TEST = os.path.join(SW_DIR,"..","bsv","tests","data","hello_world")
+
+def get_parser(args):
+    """
+    Return the parser of arguments
+
+    Parameters:
+        - args - arguments to parse
+    """
+    # Remove the leading app path
+    prgname = args[0]
+    args = args[1:]
+
+    parser = argparse.ArgumentParser(description='Regression run of the job scheduler against the board emulator - one job is repeated\n'
+        'on the emulated board (the board is reset between jobs) and each run has to return the whole expected output.\n\n'
+        '   * Default run (hello_world, 10 runs) - {0} \n'
+        '   * All test directories, 3 runs of each - {0} --repeat 3 ../bsv/tests/data/*/ \n'.format(prgname),formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument('--repeat',type=int,default=10,help='Number of runs of each job (default is 10).')
+    parser.add_argument('--byte-latency',type=float,default=1.0,help='Latency of one byte of the emulated line in microseconds (default is 1.0).')
+    parser.add_argument('--timeout',type=float,default=5.0,help='Timeout of one bus operation in seconds (default is 5.0).')
+    parser.add_argument('input_files',nargs='*',metavar='input',default=[DEFAULT_TEST],help='Test directories (or glob patterns, hello_world by default).')
+    return parser.parse_args(args)
+
+def start_emulator(link,byte_latency):
+    """
+    Start the board emulator and wait until its device is ready
+
+    Returns: Emulator process
+    """
+    cmd = [sys.executable,os.path.join(SW_DIR,"emulator.py"),"--link",link,"--byte-latency",str(byte_latency)]
+    proc = subprocess.Popen(cmd,stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while not(os.path.exists(link)):
+        if proc.poll() is not None or time.time() > deadline:
+            proc.kill()
+            raise RuntimeError("The emulator wasn't started")
+        time.sleep(0.05)
+    return proc
+
+def main():
+    """
+    Main entry function
+    """
+    args = get_parser(sys.argv)
+    # Arguments of the job loading (sources are translated without options)
+    args.input   = None
+    args.optimize = False
+    args.padding = "conservative"
+    args.rle     = False
+    args.idioms  = False
+
+    failed = 0
+    emu = None
+    tmp = tempfile.mkdtemp(prefix="test-scheduler-")
+    link = os.path.join(tmp,"ttyBCPU")
+    try:
+        jobs = []
+        for path in simulator.get_inputs(args):
+            image,inp,exp_out,_ = simulator.load_job(path,args)
+            if exp_out is None:
+                raise ValueError("Test {} doesn't define the expected output".format(path))
+            jobs.extend(scheduler.BJob(path,image,inp,exp_out) for _ in range(args.repeat))
+
+        emu = start_emulator(link,args.byte_latency)
+        sched = scheduler.BScheduler([link],"kill -USR1 {}".format(emu.pid),retries=0,max_failures=1,timeout=args.timeout)
+        asyncio.run(sched.run(jobs))
+
+        for job in jobs:
+            if not(job.success) or bytes(job.output) != job.exp_out:
+                failed = failed + 1
+                print("FAIL {} - {}".format(job.name,job.msg))
+        board = sched.boards[0]
+        if board.resets < len(jobs) - 1:
+            failed = failed + 1
+            print("FAIL - the board was reset {} times ({} jobs)".format(board.resets,len(jobs)))
+        for line in sched.report():
+            print(line)
+    except Exception as e:
+        print("Error detected during the regression run: ",str(e))
+        failed = failed + 1
+    finally:
+        if emu is not None:
+            emu.send_signal(signal.SIGINT)
+            emu.wait()
+        if os.path.lexists(link):
+            os.remove(link)
+        os.rmdir(tmp)
+
+    print("Regression run {}".format("FAILED" if failed > 0 else "passed"))
+    if failed > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,121 @@
 
 import brainfuck_io.io as bio
 import pdb
+import os
 import sys
+import json
+import hashlib
 import argparse
 from decimal import Decimal
 
+# Number of bytes written between two progress updates
+CHUNK_SIZE = 1024
+
+# Default size of the manifest block (hashes are computed per block)
+BLOCK_SIZE = 64
+
+# Start of the instruction memory - cells are changed by the BCPU, they are always written
+INSTR_BASE = 0x4000
+
+class BUploadManifest(object):
+    """
+    Manifest of the last image uploaded to the device. The manifest keeps hashes of
+    uploaded blocks of the instruction memory (the key is the block address and length),
+    blocks with the same hash don't have to be written again. Cells aren't stored because
+    they are changed by the BCPU. One JSON file is stored per device path.
+
+    The manifest is stale if the board memory was changed without the upload tool (the
+    board was reconfigured, another tool wrote the memory or another board is connected).
+    Blocks are therefore verified by reading them back in that case (see main()).
+
+    Brief usage:
+        * manifest = BUploadManifest(BUploadManifest.default_dir(),"/dev/ttyUSB0")
+        * if not manifest.matches(addr,block): write the block
+        * manifest.drop(addr,end) before the write, manifest.update(addr,block) after it
+        * manifest.save()
+    """
+
+    def __init__(self,path,device):
+        """
+        Initialization of the manifest, the stored manifest is loaded if it exists (the
+        broken manifest is ignored)
+
+        Parameters:
+            - path - manifest directory (created if it doesn't exist)
+            - device - path to the device
+        """
+        self.device = os.path.abspath(device)
+        self.file   = os.path.join(path,self.device.strip(os.sep).replace(os.sep,"_") + ".json")
+        self.blocks = {}
+        os.makedirs(path,exist_ok=True)
+        try:
+            with open(self.file,"r") as f:
+                content = json.load(f)
+            if content["device"] == self.device:
+                for key,digest in content["blocks"].items():
+                    addr,n = key.split(":")
+                    self.blocks[(int(addr),int(n))] = digest
+        except (OSError,ValueError,KeyError,AttributeError):
+            self.blocks = {}
+
+    @staticmethod
+    def default_dir():
+        """
+        Return the default manifest directory - the BUPLOAD_MANIFEST_DIR environment
+        variable or the directory inside the user cache
+        """
+        if "BUPLOAD_MANIFEST_DIR" in os.environ:
+            return os.environ["BUPLOAD_MANIFEST_DIR"]
+        base = os.environ.get("XDG_CACHE_HOME",os.path.join(os.path.expanduser("~"),".cache"))
+        return os.path.join(base,"fpga-brainfuck","upload")
+
+    @staticmethod
+    def digest(data):
+        """
+        Return the hash of the block data
+        """
+        return hashlib.sha256(data).hexdigest()
+
+    def matches(self,addr,data):
+        """
+        Return True if the block with the same data was uploaded to the address
+        """
+        digest = self.blocks.get((addr,len(data)))
+        return digest is not None and digest == BUploadManifest.digest(data)
+
+    def drop(self,start,end):
+        """
+        Remove blocks which overlap the address range [start,end)
+        """
+        self.blocks = {(addr,n):digest for (addr,n),digest in self.blocks.items()
+            if addr + n <= start or end <= addr}
+
+    def update(self,addr,data):
+        """
+        Remember the uploaded block (overlapping blocks are removed)
+        """
+        self.drop(addr,addr + len(data))
+        self.blocks[(addr,len(data))] = BUploadManifest.digest(data)
+
+    def clear(self):
+        """
+        Forget all uploaded blocks
+        """
+        self.blocks = {}
+
+    def save(self):
+        """
+        Store the manifest (the file is replaced atomically)
+        """
+        content = {
+            "device" : self.device,
+            "blocks" : {"{}:{}".format(addr,n):digest for (addr,n),digest in sorted(self.blocks.items())}
+        }
+        tmp = self.file + ".tmp"
+        with open(tmp,"w") as f:
+            json.dump(content,f,indent=1)
+        os.replace(tmp,self.file)
+
 def get_parser(args):
     """
     Return the parser of arguments
@@ -27,10 +138,17 @@ def get_parser(args):
 
     int_conv = lambda x: int(x,0)
     parser = argparse.ArgumentParser(description='Upload the compiled program to the BCPU.'.format(prgname),formatter_class=argparse.RawTextHelpFormatter)
-    parser.add_argument('--device',type=str,nargs=1,help='Specify the path to the device.',default='/dev/ttyUSB0')
+    parser.add_argument('--device',type=str,help='Specify the path to the device.',default='/dev/ttyUSB0')
     parser.add_argument("--base",type=int_conv,nargs=1,help='Base address used for the uploading. Default value is 0x4000.',default=[0x4000])
     parser.add_argument("--erase",action='store_true',help="Erase the device - initialize with zeros the program and instruction memory.")
     parser.add_argument("--erase-last-address",type=int_conv,nargs=1,help="Last address of the erased address space. Default is 0x7FFF.",default=[0x7FFF])
+    parser.add_argument("--no-burst",action='store_true',help="Use single write frames instead of burst commands (bitstreams without burst commands).")
+    parser.add_argument("--full",action='store_true',help="Write all blocks (the manifest of the last upload is ignored and refreshed).")
+    parser.add_argument("--verify",action='store_true',help="Read back all blocks which are skipped by the manifest (use it if the board memory\n"
+        "could be changed without this tool). Only the first and the last skipped block are checked by default.")
+    parser.add_argument("--manifest-dir",type=str,help="Directory with manifests of uploaded images. Default is the BUPLOAD_MANIFEST_DIR\n"
+        "environment variable or ~/.cache/fpga-brainfuck/upload.",default=None)
+    parser.add_argument("--block-size",type=int_conv,help="Size of the manifest block (power of two). Default is {} B.".format(BLOCK_SIZE),default=BLOCK_SIZE)
     parser.add_argument("input",nargs=1,help="File to upload.")
     return parser.parse_args(args)
 
@@ -54,46 +172,140 @@ def print_proc(act_val,max_val,last):
     print("\t -> {:.2f} %\r".format(proc),end="")
     return proc
 
-def upload_file(dev,data,base):
+def write_chunk(dev,addr,data,burst):
+    """
+    Write the chunk of data with the burst command (or with pipelined single write frames)
+    """
+    if burst:
+        dev.write_block(addr,data)
+    else:
+        dev.write_pipelined(addr,data)
+
+def build_image(data,base,erase,erase_max_addr):
     """
-    Upload data to the BCPU via the IO line, with given base address
-    and data.
+    Return the tuple (start address, data) of the uploaded address range - the image and
+    zeros of the erased range (the image overwrites erased addresses)
     """
     # Check the data size (it cannot be longer than max_len)
     max_len = 0x3FFF
     if len(data) > max_len:
         raise ValueError("The passed data file is longer than {} B! Cannot upload.".format(max_len))
+    if not(erase):
+        return (base,data)
+
+    mem = bytearray(max(erase_max_addr + 1,base + len(data)))
+    mem[base:base + len(data)] = data
+    return (0,mem)
+
+def split_blocks(start,n,block_size):
+    """
+    Split the address range to blocks aligned to the block size
+
+    Return: List of blocks (address, end address)
+    """
+    blocks  = []
+    addr    = start
+    end     = start + n
+    while addr < end:
+        block_end = min(end,(addr // block_size + 1) * block_size)
+        blocks.append((addr,block_end))
+        addr = block_end
+    return blocks
+
+def join_blocks(blocks):
+    """
+    Join consecutive blocks to address ranges
+
+    Return: List of address ranges (address, end address)
+    """
+    spans = []
+    for addr,end in blocks:
+        if len(spans) > 0 and spans[-1][1] == addr:
+            spans[-1] = (spans[-1][0],end)
+        else:
+            spans.append((addr,end))
+    return spans
+
+def verify_blocks(dev,data,start,blocks,burst=True):
+    """
+    Read blocks back from the board (in one transaction) and compare them with data
+
+    Return: List of blocks which are different
+    """
+    futs = []
+    with dev.transaction() as tr:
+        for addr,end in join_blocks(blocks):
+            if burst:
+                futs.append((addr,tr.read_block(addr,end - addr)))
+            else:
+                futs.extend([(a,tr.read(a)) for a in range(addr,end)])
+
+    board = bytearray(len(data))
+    for addr,fut in futs:
+        read = fut.result()
+        board[addr - start:addr - start + len(read)] = read
+    return [(addr,end) for addr,end in blocks if board[addr - start:end - start] != data[addr - start:end - start]]
+
+def write_blocks(dev,data,start,spans,burst=True):
+    """
+    Write address ranges of data to the board (the progress is printed)
+    """
+    view    = memoryview(data)
+    total   = sum([end - addr for addr,end in spans])
+    written = 0
+    proc    = print_proc(0,total,None)
+    for addr,end in spans:
+        for chunk_addr in range(addr,end,CHUNK_SIZE):
+            chunk = view[chunk_addr - start:min(end,chunk_addr + CHUNK_SIZE) - start]
+            write_chunk(dev,chunk_addr,chunk,burst)
+            written = written + len(chunk)
+            proc = print_proc(written,total,proc)
+
+def upload_file(dev,data,start,manifest=None,block_size=BLOCK_SIZE,burst=True,verify=False):
+    """
+    Upload data to the BCPU via the IO line, with given start address and data. Blocks of
+    the instruction memory which are stored in the manifest aren't written. The first and
+    the last skipped block are read back (all skipped blocks if verify is set) - all skipped
+    blocks are verified if the check fails (the manifest is stale).
 
+    Return: Number of written bytes
+    """
     print("File size has been checked. Let's rock! \n")
-    # Uploading is done in byte-related manner
-    data_ptr    = 0
-    data_len    = len(data)
-    proc        = None
-    for d in data:
-        # Upload data
-        tmp_addr = base + data_ptr
-        tmp_d = bytes([d])
-        dev.write(tmp_addr, tmp_d)
-        data_ptr = data_ptr + 1
-        # Print the progress
-        proc = print_proc(data_ptr,data_len,proc)
-
-    print("\nUploading has been finished.\n")
-
-def erase(dev,top_addr):
-    """
-    Erase the device from 0 to top_addr
-    """
-    print("Erasing the device from address 0x{:x} to 0x{:x}.".format(0,top_addr))
-    addr = 0
-    proc = None
-    while addr <= top_addr:
-        # Write the address and inform the user
-        dev.write(addr,b'\x00')
-        proc = print_proc(addr,top_addr,proc)
-        addr = addr + 1
-
-    print("\nErasing done.\n")
+    blocks  = split_blocks(start,len(data),block_size)
+    skipped = []
+    if manifest is not None:
+        skipped = [(addr,end) for addr,end in blocks if addr >= INSTR_BASE and
+            manifest.matches(addr,data[addr - start:end - start])]
+
+    stale = []
+    if len(skipped) > 0:
+        checked = skipped if verify else sorted(set([skipped[0],skipped[-1]]))
+        stale = verify_blocks(dev,data,start,checked,burst)
+        if len(stale) > 0 and not(verify):
+            print("The manifest of the device is stale, verifying all skipped blocks.")
+            stale = verify_blocks(dev,data,start,skipped,burst)
+    skipped = set(skipped) - set(stale)
+    changed = [block for block in blocks if block not in skipped]
+    spans   = join_blocks(changed)
+
+    # Written ranges are removed from the manifest first (the upload can fail)
+    if manifest is not None:
+        for addr,end in spans:
+            manifest.drop(addr,end)
+        manifest.save()
+
+    write_blocks(dev,data,start,spans,burst)
+
+    if manifest is not None:
+        for addr,end in changed:
+            if addr >= INSTR_BASE:
+                manifest.update(addr,data[addr - start:end - start])
+        manifest.save()
+
+    written = sum([end - addr for addr,end in spans])
+    print("\nUploading has been finished - {} of {} B written ({} of {} blocks changed, {} stale).\n".format(
+        written,len(data),len(changed),len(blocks),len(stale)))
+    return written
 
 def main():  
 
@@ -119,10 +331,20 @@ def main():
         print("Uploading the file: {}".format(in_file_path))
         print("Using the IO: {}".format(str(dev)))
 
-        if args.erase:
-            erase(dev,erase_max_addr)
+        if args.block_size <= 0 or INSTR_BASE % args.block_size != 0:
+            raise ValueError("The block size has to be a power of two up to 0x{:x}.".format(INSTR_BASE))
+
+        # Load the manifest of the last upload (it is refreshed during the full upload)
+        manifest_dir = args.manifest_dir if args.manifest_dir is not None else BUploadManifest.default_dir()
+        manifest = BUploadManifest(manifest_dir,device_path)
+        if args.full:
+            manifest.clear()
 
-        upload_file(dev,data,base)
+        # Erased addresses are uploaded together with the image
+        if args.erase:
+            print("Erasing the device from address 0x{:x} to 0x{:x}.".format(0,erase_max_addr))
+        start,image = build_image(data,base,args.erase,erase_max_addr)
+        upload_file(dev,image,start,manifest,args.block_size,not(args.no_burst),args.verify)
 
     except IOError as e:
         print("Error during the IO operation!")